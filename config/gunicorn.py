@@ -0,0 +1,104 @@
+"""
+Gunicorn configuration: `gunicorn -c config/gunicorn.py`
+
+Everything is driven by environment variables so the same file serves
+every deployment:
+
+    GUNICORN_WORKER_CLASS   sync | gthread (default) | uvicorn
+    GUNICORN_WORKERS        defaults to a count derived from the CPUs
+    GUNICORN_THREADS        threads per gthread worker (default 4)
+    GUNICORN_BIND           default 0.0.0.0:8000
+    GUNICORN_PRELOAD        import the app once in the master (default on)
+    GUNICORN_MAX_REQUESTS   recycle workers after this many requests (default 1000, 0 = never)
+    GUNICORN_TIMEOUT        seconds (default 30)
+
+The uvicorn worker serves config.asgi instead of config.wsgi and turns on
+the async read-only API views (DJANGO_ASYNC_API). Persistent connections
+are off under it (DJANGO_CONN_MAX_AGE=0): async views run their queries on
+short-lived threads, so use DJANGO_DATABASE_POOL there instead.
+"""
+
+import multiprocessing
+import os
+
+from environs import Env
+
+env = Env()
+env.read_env()
+
+cpu_count = multiprocessing.cpu_count()
+
+worker_kind = env('GUNICORN_WORKER_CLASS', default='gthread')
+if worker_kind not in ('sync', 'gthread', 'uvicorn'):
+    raise ValueError(f'GUNICORN_WORKER_CLASS must be sync, gthread or uvicorn, not {worker_kind!r}')
+
+if worker_kind == 'uvicorn':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'config.asgi:application'
+    # قبل از بارگذاری settings جنگو، تا view های async فقط زیر ASGI فعال بشن
+    os.environ.setdefault('DJANGO_ASYNC_API', 'true')
+    os.environ.setdefault('DJANGO_CONN_MAX_AGE', '0')
+    default_workers = cpu_count
+else:
+    worker_class = worker_kind
+    wsgi_app = 'config.wsgi:application'
+    # worker های sync موقع انتظار برای دیتابیس بیکار می‌مونن، پس بیشتر از تعداد CPU
+    default_workers = cpu_count * 2 + 1 if worker_kind == 'sync' else cpu_count + 1
+
+workers = env.int('GUNICORN_WORKERS', default=default_workers)
+threads = env.int('GUNICORN_THREADS', default=4) if worker_kind == 'gthread' else 1
+bind = env('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# کد یک بار توی master بارگذاری میشه و worker ها با fork حافظه رو به اشتراک می‌ذارن
+preload_app = env.bool('GUNICORN_PRELOAD', default=True)
+# worker ها بعد از چند هزار درخواست عوض میشن؛ jitter نمی‌ذاره همه با هم restart بشن
+max_requests = env.int('GUNICORN_MAX_REQUESTS', default=1000)
+max_requests_jitter = env.int('GUNICORN_MAX_REQUESTS_JITTER', default=max(max_requests // 10, 0))
+
+timeout = env.int('GUNICORN_TIMEOUT', default=30)
+graceful_timeout = env.int('GUNICORN_GRACEFUL_TIMEOUT', default=30)
+keepalive = env.int('GUNICORN_KEEPALIVE', default=5)
+
+# empty → no access log
+accesslog = env('GUNICORN_ACCESS_LOG', default='-') or None
+errorlog = '-'
+loglevel = env('GUNICORN_LOG_LEVEL', default='info')
+
+# heartbeat فایل‌های موقت worker روی دیسک کانتینر کند میشه
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def on_starting(server):
+    # با locmem هر worker کش خودش رو داره و بالا رفتن version ها به بقیه نمی‌رسه
+    if server.cfg.workers <= 1:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    from django.conf import settings
+
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('LocMemCache'):
+        raise RuntimeError(
+            f'{backend} is per process; set DJANGO_CACHE_BACKEND=redis or memcached '
+            f'to run {server.cfg.workers} workers'
+        )
+    if backend.endswith('FileBasedCache'):
+        # add() فایلی بین process ها اتمیک نیست، پس قفل بازسازی صفحه‌ها (store.page_cache) کار نمی‌کنه
+        server.log.warning(
+            '%s has no atomic add(); several of the %d workers may re-render the same page at once. '
+            'Use DJANGO_CACHE_BACKEND=redis or memcached in production.',
+            backend, server.cfg.workers,
+        )
+
+
+def post_fork(server, worker):
+    # connection هایی که موقع preload در master باز شدن نباید بین worker ها مشترک بشن
+    if not server.cfg.preload_app:
+        return
+    from django.db import connections
+
+    connections.close_all()
+    # pool و thread هاش بعد از fork قابل استفاده نیستن، هر worker pool خودش رو می‌سازه
+    for connection in connections.all(initialized_only=True):
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from environs import Env
 
 # for enviroment variables
@@ -30,7 +31,7 @@ SECRET_KEY = env("DJANGO_SECRET_KEY")
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DJANGO_DEBUG")
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = env.list('DJANGO_ALLOWED_HOSTS', default=[])
 
 
 # Application definition
@@ -65,6 +66,9 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    # اول از همه، تا کوئری‌های بقیه‌ی middleware ها هم شمرده بشن
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -95,7 +99,9 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'django.template.context_processors.i18n',
                 'store.context_processors.cart',
+                'store.context_processors.page_cache',
                 # 'store.context_processors.category_menu',
             ],
         },
@@ -116,9 +122,80 @@ DATABASES = {
         'PASSWORD': env('POSTGRES_PASSWORD'),
         'HOST': env('DJANGO_DATABASE_HOST'),
         'PORT': env('DJANGO_DATABASE_PORT', default='5432'),
+        'TEST': {
+            # sqlite: a file instead of the shared in-memory db, so threaded tests can write concurrently
+            'NAME': env('DJANGO_TEST_DATABASE_NAME', default=None),
+        },
+        # connection های باز بین درخواست‌ها نگه داشته میشن و قبل از استفاده‌ی دوباره بررسی میشن
+        'CONN_MAX_AGE': env.int('DJANGO_CONN_MAX_AGE', default=60),
+        'CONN_HEALTH_CHECKS': env.bool('DJANGO_CONN_HEALTH_CHECKS', default=True),
     }
 }
 
+# psycopg 3 connection pool per process instead of persistent connections (postgres only)
+if env.bool('DJANGO_DATABASE_POOL', default=False):
+    if 'postgresql' not in DATABASES['default']['ENGINE']:
+        raise ImproperlyConfigured('DJANGO_DATABASE_POOL needs the postgresql database engine')
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DJANGO_DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DJANGO_DATABASE_POOL_MAX_SIZE', default=10),
+            'timeout': env.int('DJANGO_DATABASE_POOL_TIMEOUT', default=10),
+        },
+    }
+
+# read replica for catalogue reads (core.routers.ReplicaRouter); same credentials as default
+# two sqlite files work too: DJANGO_REPLICA_DATABASE_NAME=/path/to/copy.sqlite3
+if env('DJANGO_REPLICA_DATABASE_HOST', default='') or env('DJANGO_REPLICA_DATABASE_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': env('DJANGO_REPLICA_DATABASE_NAME', default=DATABASES['default']['NAME']),
+        'HOST': env('DJANGO_REPLICA_DATABASE_HOST', default=DATABASES['default']['HOST']),
+        'PORT': env('DJANGO_REPLICA_DATABASE_PORT', default=DATABASES['default']['PORT']),
+        # تست ها روی همون دیتابیس default اجرا میشن
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem, file, redis (needs the `redis` package) or memcached (needs `pymemcache`).
+# Caches are invalidated by bumping versions in this cache, so every process
+# (gunicorn workers, task workers, management commands) must share it: locmem
+# is only the DEBUG default. With several workers use redis or memcached
+# (docker-compose runs redis): only their add() is atomic across processes,
+# which store.page_cache relies on to let one worker re-render a page. The
+# file backend is a single-host fallback: it works, but that lock does not
+# hold and every write lists the cache directory to cull it.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHE_BACKEND = env('DJANGO_CACHE_BACKEND', default='locmem' if DEBUG else 'file')
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': 'delvaan',
+    'file': str(BASE_DIR.joinpath('.cache')),
+    'redis': 'redis://127.0.0.1:6379/1',
+    'memcached': '127.0.0.1:11211',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': env('DJANGO_CACHE_LOCATION', default=CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]),
+        'KEY_PREFIX': 'delvaan',
+    }
+}
+if CACHE_BACKEND in ('locmem', 'file'):
+    # صفحه‌ها به ازای آدرس × زبان × سبد × version کش میشن؛ پیش‌فرض ۳۰۰ تایی جنگو همون اول پر میشه
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': env.int('DJANGO_CACHE_MAX_ENTRIES', default=50_000),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -143,7 +220,45 @@ AUTHENTICATION_BACKENDS = [
     # django allauth
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# emails are queued as background tasks and sent by `manage.py run_workers`
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+CORE_TASKS_EMAIL_BACKEND = env('DJANGO_EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+# run tasks inline after commit instead of queueing them (no worker needed)
+CORE_TASKS_EAGER = env.bool('DJANGO_TASKS_EAGER', default=DEBUG)
+# query count and DB time of every request go to the `core.queries` logger
+CORE_SERVER_TIMING = env.bool('DJANGO_SERVER_TIMING', default=DEBUG)
+# the same SQL shape this many times in one request is logged as a possible N+1
+CORE_QUERY_REPEAT_THRESHOLD = 5
+# most queries a view may run (by URL name); enforced by core.testing.QueryBudgetMixin in tests
+CORE_QUERY_BUDGETS = {
+    'home_page': 5,
+    'category_list': 4,
+    'category_detail': 8,
+    'product_list': 8,
+    'product_detail': 10,
+    'search_results': 12,
+    'cart_detail': 4,
+    'product-list': 5,
+    'product-detail': 4,
+    'category-list': 2,
+    'category-detail': 1,
+    'admin:store_category_changelist': 10,
+    'admin:store_order_changelist': 7,
+    'admin:store_orderitem_changelist': 7,
+}
+# catalogue models read from the replica on GET/HEAD requests; None when there is no replica
+CORE_REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+CORE_REPLICA_MODELS = {
+    'store.category',
+    'store.product',
+    'store.product_categories',
+    'store.product_discounts',
+    'store.productcategoryclosure',
+    'store.discount',
+    'store.comment',
+}
+# after a POST (etc.) that browser reads from the primary for this long, so it sees its own writes
+CORE_REPLICA_PIN_SECONDS = env.int('DJANGO_REPLICA_PIN_SECONDS', default=10)
 
 # Internationalization
 # https://docs.djangoproject.com/en /5.2/topics/i18n/
@@ -226,5 +341,32 @@ MEDIA_ROOT = str(BASE_DIR.joinpath('media'))
 
 
 
+# store search backend; empty → postgres full-text search on postgres, in-memory index otherwise
+STORE_SEARCH_BACKEND = env('DJANGO_SEARCH_BACKEND', default='')
+
+# seconds an anonymous page stays fresh in store.page_cache
+STORE_PAGE_CACHE_TIMEOUT = env.int('DJANGO_PAGE_CACHE_TIMEOUT', default=60 * 5)
+# sitemap.xml and product feeds: written by `manage.py build_feeds`, served from /sitemap.xml and /feeds/
+STORE_FEED_ROOT = env('DJANGO_FEED_ROOT', default=str(BASE_DIR.joinpath('feeds')))
+STORE_FEED_TITLE = env('DJANGO_FEED_TITLE', default='Delvaan')
+# absolute URLs in the sitemap and feeds
+STORE_SITE_URL = env('DJANGO_SITE_URL', default='http://127.0.0.1:8000')
+# X-Accel-Redirect (nginx, with an internal location at STORE_FEED_SENDFILE_PREFIX) or X-Sendfile (apache);
+# empty → Django streams the file itself
+STORE_FEED_SENDFILE_HEADER = env('DJANGO_FEED_SENDFILE_HEADER', default='')
+STORE_FEED_SENDFILE_PREFIX = env('DJANGO_FEED_SENDFILE_PREFIX', default='/internal/feeds/')
+# GET endpoints of the cart API as async views; config/gunicorn.py turns this on for uvicorn workers
+STORE_ASYNC_API = env.bool('DJANGO_ASYNC_API', default=False)
+
+
+REST_FRAMEWORK = {
+    # orjson وقتی نصب باشه؛ خروجی همون JSONRenderer خود DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'store.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
 MPTT_ADMIN_LEVEL_INDENT = 20  # یا عدد دلخواه برای میزان تو رفتگی هر سطح در ادمین
 
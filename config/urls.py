@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.conf import settings
 from django.urls import include, path
 from django.conf.urls.static import static
-from store.views import HomeView
+from store.views import HomeView, feed_file_view
 
 
 
@@ -27,6 +27,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path('store/', include('store.urls')),
+    # ساخته‌شده توسط `manage.py build_feeds`
+    path('sitemap.xml', feed_file_view, {'name': 'sitemap.xml'}, name='sitemap'),
+    path('feeds/<str:name>', feed_file_view, name='feed_file'),
     path("__debug__/", include("debug_toolbar.urls")),
     
     # Rosetta (i18n)
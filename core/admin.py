@@ -2,10 +2,20 @@ from django.contrib import admin
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from .models.task import Task
+
 
 User = get_user_model()
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ['username', ]
-    
\ No newline at end of file
+    
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'run_at', 'started_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    ordering = ['-id']
+    readonly_fields = ['started_at', 'finished_at', 'locked_by', 'last_error']
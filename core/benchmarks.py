@@ -0,0 +1,105 @@
+import json
+import math
+import os
+import platform
+import statistics
+import time
+
+import django
+from django.db import connection
+
+from .instrumentation import QueryRecorder
+
+
+def percentile(sorted_samples, fraction):
+    """
+    Nearest-rank percentile of already sorted samples
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_samples)), 1)
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples):
+    """
+    Latency summary in milliseconds of samples in seconds
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'min_ms': round(samples[0] * 1000, 3),
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(samples, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def measure(func, repeat=20, warmup=2, setup=None):
+    """
+    Call `func` `repeat` times (after `warmup` untimed calls) and return
+    its latency summary and query counts. `setup` runs untimed before
+    every call, e.g. to clear caches for a cold measurement.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    samples = []
+    queries = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with QueryRecorder() as recorder:
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        queries.append(recorder.count)
+    return {
+        **summarize(samples),
+        'queries': max(queries) if queries else 0,
+        'queries_min': min(queries) if queries else 0,
+    }
+
+
+def get_environment():
+    """
+    Where a run happened, so results from different machines are not mixed up
+    """
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_report(report, path=None, stdout=None):
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if path:
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(data)
+    elif stdout is not None:
+        stdout.write(data)
+
+
+def compare_reports(previous, current, metric='p50_ms'):
+    """
+    Rows of (name, previous, current, ratio) for results present in both reports
+    """
+    before = {result['name']: result for result in previous.get('results', [])}
+    rows = []
+    for result in current.get('results', []):
+        old = before.get(result['name'])
+        if old is None or metric not in old or metric not in result:
+            continue
+        ratio = result[metric] / old[metric] if old[metric] else None
+        rows.append((result['name'], old[metric], result[metric], ratio))
+    return rows
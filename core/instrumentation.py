@@ -0,0 +1,55 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+
+# طول لیست IN با تعداد آیتم‌ها عوض میشه ولی شکل کوئری همونه
+IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:\s*,\s*(?:%s|\?))*\)', re.IGNORECASE)
+
+
+def get_query_shape(sql):
+    """
+    SQL with its parameters already out of the way (Django sends them
+    separately) and IN (...) lists of any length folded together
+    """
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """
+    Count queries, database time and repeated SQL shapes on every
+    connection while active. Only the shape is kept, not the SQL of each
+    query, so it is cheap enough to leave on in production.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[get_query_shape(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def get_repeated(self, threshold):
+        """
+        SQL shapes run at least `threshold` times: the N+1 signature
+        """
+        return {shape: count for shape, count in self.shapes.most_common() if count >= threshold}
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Queue outgoing email (allauth confirmations, password resets, ...) as
+    tasks instead of talking to the mail server inside the request.
+    The task sends it through CORE_TASKS_EMAIL_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        from .tasks import send_email
+
+        sent = 0
+        for message in email_messages:
+            if message.attachments:
+                # پیوست‌ها قابل ذخیره در JSON نیستن؛ مستقیم فرستاده میشن
+                sent += get_connection(settings.CORE_TASKS_EMAIL_BACKEND).send_messages([message])
+                continue
+            send_email.delay({
+                'subject': message.subject,
+                'body': message.body,
+                'from_email': message.from_email,
+                'to': message.to,
+                'cc': message.cc,
+                'bcc': message.bcc,
+                'reply_to': message.reply_to,
+                'headers': message.extra_headers,
+                'alternatives': [list(alternative) for alternative in getattr(message, 'alternatives', [])],
+                'content_subtype': message.content_subtype,
+            })
+            sent += 1
+        return sent
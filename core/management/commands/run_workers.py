@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+
+from core import tasks
+
+
+logger = logging.getLogger('core.tasks')
+
+def work(worker_id, stop, batch_size, poll_interval, once):
+    """
+    Claim and run tasks until `stop` is set (or the queue is empty with --once)
+    """
+    last_requeue = 0
+    try:
+        while not stop.is_set():
+            if time.monotonic() - last_requeue > 60:
+                tasks.requeue_stale_tasks()
+                last_requeue = time.monotonic()
+
+            try:
+                claimed = tasks.claim_tasks(worker_id, batch_size)
+            except DatabaseError:
+                # مثلاً قفل sqlite یا قطع شدن postgres؛ worker نباید بمیره
+                logger.exception('worker %s could not claim tasks', worker_id)
+                connection.close()
+                stop.wait(poll_interval)
+                continue
+            if not claimed:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for task_row in claimed:
+                tasks.run_task(task_row)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run background task workers on the database queue (core.tasks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='worker threads (per process)')
+        parser.add_argument('--processes', type=int, default=0, help='worker processes; 0 runs threads in this process')
+        parser.add_argument('--batch-size', type=int, default=1, help='tasks claimed per query')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to sleep when the queue is empty')
+        parser.add_argument('--metrics-interval', type=float, default=60.0, help='seconds between metrics reports, 0 to disable')
+        parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['processes']:
+            # process های فرزند connection خودشون رو باز می‌کنن
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            workers = [
+                context.Process(target=self.run_threads, args=(f'{socket.gethostname()}:{index}', stop), daemon=True)
+                for index in range(options['processes'])
+            ]
+        else:
+            stop = threading.Event()
+            workers = [threading.Thread(target=self.run_threads, args=(f'{socket.gethostname()}:{os.getpid()}', stop))]
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping workers after their current task...')
+            stop.set()
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        for worker in workers:
+            worker.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(workers)} process(es) × {options["threads"]} thread(s) running'
+        ))
+
+        last_report = time.monotonic()
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=1)
+            interval = options['metrics_interval']
+            if interval and time.monotonic() - last_report >= interval:
+                self.report_metrics()
+                last_report = time.monotonic()
+        self.report_metrics()
+
+    def run_threads(self, name, stop):
+        options = self.options
+        threads = [
+            threading.Thread(
+                target=work,
+                args=(f'{name}:{index}', stop, options['batch_size'], options['poll_interval'], options['once']),
+            )
+            for index in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def report_metrics(self):
+        self.stdout.write(f'queue depth: {tasks.get_queue_depth()}')
+        for row in tasks.get_metrics():
+            self.stdout.write(
+                f'{row["name"]}: {row["done"]} done, {row["failed"]} failed, '
+                f'wait avg {row["avg_wait"]} max {row["max_wait"]}, run avg {row["avg_duration"]}'
+            )
+        connection.close()
@@ -0,0 +1,118 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import QueryRecorder
+from .routers import replica_reads
+
+
+logger = logging.getLogger('core.queries')
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count queries and database time per request, log them per view name
+    and warn about N+1 patterns and views over their CORE_QUERY_BUDGETS.
+    With CORE_SERVER_TIMING the numbers also go out as a Server-Timing
+    header, which browser dev tools show next to the request.
+    Queries run while a streaming response is consumed are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budgets = getattr(settings, 'CORE_QUERY_BUDGETS', {})
+        self.repeat_threshold = getattr(settings, 'CORE_QUERY_REPEAT_THRESHOLD', 5)
+        self.server_timing = getattr(settings, 'CORE_SERVER_TIMING', False)
+        # زیر ASGI بدون پرش بین thread ها اجرا میشه
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    def report(self, request, response, recorder, duration):
+        match = request.resolver_match
+        view_name = match.view_name if match else ''
+        stats = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(duration * 1000, 2),
+        }
+        logger.info(
+            '%(method)s %(path)s view=%(view)s status=%(status)s queries=%(queries)s '
+            'db_ms=%(db_ms)s total_ms=%(total_ms)s', stats, extra={'query_stats': stats},
+        )
+        for shape, count in recorder.get_repeated(self.repeat_threshold).items():
+            logger.warning('possible N+1 in %s: %s queries of the same shape: %s', view_name or request.path, count, shape,
+                           extra={'query_stats': stats})
+        budget = self.budgets.get(view_name)
+        if budget is not None and recorder.count > budget:
+            logger.warning('%s ran %s queries, over its budget of %s', view_name, recorder.count, budget,
+                           extra={'query_stats': stats})
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats["db_ms"]};desc="{recorder.count} queries", app;dur={stats["total_ms"]}'
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    GET and HEAD requests read the catalogue from the replica (see
+    core.routers.ReplicaRouter). Any other request pins that browser to
+    the primary for CORE_REPLICA_PIN_SECONDS with a cookie, so the page it
+    is redirected to shows its own changes despite replication lag.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'primary_db'
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CORE_REPLICA_DATABASE', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'CORE_REPLICA_PIN_SECONDS', 10)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    def use_replica(self, request):
+        return request.method in self.safe_methods and self.cookie_name not in request.COOKIES
+
+    def pin(self, request, response):
+        if request.method not in self.safe_methods:
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -1 +1,2 @@
 from .import user
+from .import task
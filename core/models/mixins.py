@@ -1,4 +1,6 @@
-from django.db import models
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, models, transaction
 from django.utils.text import slugify
 
 
@@ -6,33 +8,95 @@ class GenerateSlugMixin(models.Model):
     slug_field_name = 'slug'
     source_field_name = 'name'
     parent_field_name = 'parent'
+    # چند بار بعد از برخورد با unique constraint دوباره اسلاگ بسازیم
+    slug_save_attempts = 5
+    # برای نام‌هایی که slugify چیزی ازشون باقی نمی‌ذاره (مثلاً فقط علامت)
+    slug_fallback = 'item'
 
     class Meta:
         abstract = True
 
-    def save(self, *args, **kwargs):
-        slug_value = getattr(self, self.slug_field_name, None)
-        source_value = getattr(self, self.source_field_name, None)
+    @classmethod
+    def _get_slug_scope_field(cls):
+        """
+        attname of the field slugs are unique within (e.g. `parent_id`), or None
+        """
+        try:
+            return cls._meta.get_field(cls.parent_field_name).attname
+        except FieldDoesNotExist:
+            return None
 
-        if not slug_value and source_value:
-            base_slug = slugify(source_value, allow_unicode=True)
-            unique_slug = base_slug
-            counter = 1
-            ModelClass = self.__class__
+    @classmethod
+    def generate_slugs(cls, objs):
+        """
+        Give every object in `objs` without a slug a unique one, using one query
+        per distinct base slug (and parent) for the whole batch.
+        Slugs already set on objects in the batch count as taken, so the
+        result can go straight to `bulk_create`.
+        """
+        scope_field = cls._get_slug_scope_field()
 
-            filter_kwargs = {}
-            if hasattr(self, self.parent_field_name):
-                filter_kwargs[self.parent_field_name] = getattr(self, self.parent_field_name)
+        def get_scope(obj):
+            return getattr(obj, scope_field) if scope_field else None
 
+        taken = {}
+        pending = {}
+        for obj in objs:
+            slug_value = getattr(obj, cls.slug_field_name, None)
+            if slug_value:
+                taken.setdefault(get_scope(obj), set()).add(slug_value)
+                continue
+            source_value = getattr(obj, cls.source_field_name, None)
+            if source_value:
+                base_slug = slugify(source_value, allow_unicode=True) or cls.slug_fallback
+                pending.setdefault((get_scope(obj), base_slug), []).append(obj)
+
+        for (scope, base_slug), group in pending.items():
+            filter_kwargs = {f'{cls.slug_field_name}__startswith': base_slug}
+            if scope_field:
+                filter_kwargs[scope_field] = scope
             existing_slugs = set(
-                ModelClass.objects.filter(**filter_kwargs, **{f"{self.slug_field_name}__startswith": base_slug})
-                .exclude(pk=self.pk)
-                .values_list(self.slug_field_name, flat=True)
+                cls._default_manager.filter(**filter_kwargs)
+                .exclude(pk__in=[obj.pk for obj in group if obj.pk is not None])
+                .values_list(cls.slug_field_name, flat=True)
             )
-            while unique_slug in existing_slugs:
+            used = taken.setdefault(scope, set())
+
+            unique_slug = base_slug
+            counter = 1
+            for obj in group:
+                while unique_slug in existing_slugs or unique_slug in used:
+                    unique_slug = f"{base_slug}-{counter}"
+                    counter += 1
+                used.add(unique_slug)
+                setattr(obj, cls.slug_field_name, unique_slug)
+        return objs
+
+    def _is_slug_taken(self):
+        slug_value = getattr(self, self.slug_field_name)
+        if not slug_value:
+            return False
+        filter_kwargs = {self.slug_field_name: slug_value}
+        scope_field = self._get_slug_scope_field()
+        if scope_field:
+            filter_kwargs[scope_field] = getattr(self, scope_field)
+        return type(self)._default_manager.filter(**filter_kwargs).exclude(pk=self.pk).exists()
+
+    def save(self, *args, **kwargs):
+        slug_value = getattr(self, self.slug_field_name, None)
+        source_value = getattr(self, self.source_field_name, None)
+
+        if slug_value or not source_value:
+            return super().save(*args, **kwargs)
 
-                # while ModelClass.objects.filter(**{self.slug_field_name: unique_slug}).exclude(pk=self.pk).exists():
-                unique_slug = f"{base_slug}-{counter}"
-                counter += 1
-            setattr(self, self.slug_field_name, unique_slug)
-        super().save(*args,**kwargs)
+        # اسلاگ رو خودمون می‌سازیم؛ اگه یه ذخیره‌ی همزمان همون اسلاگ رو گرفت دوباره امتحان می‌کنیم
+        for attempt in range(self.slug_save_attempts):
+            self.generate_slugs([self])
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                # فقط برخورد اسلاگ دوباره امتحان میشه؛ خطاهای دیگه (NOT NULL، FK و ...) همون‌جا بالا میرن
+                if attempt == self.slug_save_attempts - 1 or not self._is_slug_taken():
+                    raise
+                setattr(self, self.slug_field_name, '')
@@ -0,0 +1,60 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# فقط داخل درخواست‌های GET/HEAD روشن میشه (ReplicaRoutingMiddleware)
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Let catalogue reads in this block go to the replica
+    """
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Catalogue models (CORE_REPLICA_MODELS) are read from
+    CORE_REPLICA_DATABASE inside replica_reads(); everything else, every
+    write and every read inside a transaction goes to the primary.
+    Management commands, tasks and tests never see the replica, so they
+    always read their own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(settings, 'CORE_REPLICA_DATABASE', None)
+        if (
+            replica and _replica_reads.get()
+            and model._meta.label_lower in settings.CORE_REPLICA_MODELS
+            # داخل transaction باید همون داده‌ای خونده بشه که قراره نوشته بشه
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return replica
+        # بدون این، Django دیتابیس instance رو برمی‌گردونه (مثلاً product.cart_items روی replica)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # حتی برای object هایی که از replica خونده شدن
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica کپی همون دیتابیسه
+        databases = {DEFAULT_DB_ALIAS, getattr(settings, 'CORE_REPLICA_DATABASE', None)}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replica از روی primary تکثیر میشه
+        if db == getattr(settings, 'CORE_REPLICA_DATABASE', None):
+            return False
+        return None
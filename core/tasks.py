@@ -0,0 +1,188 @@
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models.task import Task
+
+
+logger = logging.getLogger(__name__)
+
+# تأخیر تلاش دوباره: RETRY_DELAY * 2^(تلاش-1) ثانیه، حداکثر MAX_RETRY_DELAY
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 60 * 60
+# کار running که بیشتر از این مونده یعنی worker اش مرده
+STALE_AFTER = timedelta(minutes=15)
+
+
+class TaskFunction:
+    """
+    A function that can also be queued: `func.delay(*args, **kwargs)`.
+    Arguments must be JSON serializable.
+    """
+
+    def __init__(self, func, priority=0, max_attempts=3):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+        self.__module__ = func.__module__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, priority=None, run_at=None):
+        if getattr(settings, 'CORE_TASKS_EAGER', False):
+            # بدون worker (توسعه/تست): بعد از commit همین‌جا اجرا میشه
+            transaction.on_commit(lambda: self.func(*args, **(kwargs or {})))
+            return None
+        # ردیف صف توی همون transaction درخواست ساخته میشه، پس با rollback اون هم حذف میشه
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=run_at or timezone.now(),
+        )
+
+
+def task(func=None, *, priority=0, max_attempts=3):
+    """
+    Decorator registering a module-level function as a queueable task
+    """
+    if func is None:
+        return lambda func: TaskFunction(func, priority=priority, max_attempts=max_attempts)
+    return TaskFunction(func, priority=priority, max_attempts=max_attempts)
+
+
+def claim_tasks(worker_id, limit=1):
+    """
+    Lock up to `limit` due tasks for this worker. Postgres skips rows other
+    workers hold with FOR UPDATE SKIP LOCKED; the conditional UPDATE keeps
+    databases without row locks (sqlite) from handing a task out twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = Task.objects.filter(status=Task.STATUS_QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        task_ids = list(due.values_list('id', flat=True)[:limit])
+        if not task_ids:
+            return []
+        Task.objects.filter(pk__in=task_ids, status=Task.STATUS_QUEUED).update(
+            status=Task.STATUS_RUNNING,
+            locked_by=worker_id,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.filter(
+        pk__in=task_ids, status=Task.STATUS_RUNNING, locked_by=worker_id, started_at=now,
+    ).order_by('-priority', 'run_at', 'id'))
+
+
+def get_retry_delay(attempts):
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    # jitter تا کارهای شکست‌خورده همه با هم برنگردن
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run_task(task_row):
+    """
+    Run a claimed task and record the outcome; failures are retried with
+    exponential backoff until `max_attempts` is reached
+    """
+    started = time.monotonic()
+    try:
+        func = import_string(task_row.name)
+        func(*task_row.args, **task_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        update = {'last_error': error, 'locked_by': ''}
+        if task_row.attempts < task_row.max_attempts:
+            update.update(status=Task.STATUS_QUEUED, run_at=timezone.now() + get_retry_delay(task_row.attempts))
+        else:
+            update.update(status=Task.STATUS_FAILED, finished_at=timezone.now())
+        Task.objects.filter(pk=task_row.pk).update(**update)
+        logger.warning('task %s #%s failed (attempt %s/%s)', task_row.name, task_row.pk,
+                       task_row.attempts, task_row.max_attempts, exc_info=True)
+        return False
+
+    Task.objects.filter(pk=task_row.pk).update(status=Task.STATUS_DONE, finished_at=timezone.now(), locked_by='')
+    logger.info('task %s #%s done: waited %.3fs, ran %.3fs', task_row.name, task_row.pk,
+                (task_row.started_at - task_row.run_at).total_seconds(), time.monotonic() - started)
+    return True
+
+
+def requeue_stale_tasks(stale_after=STALE_AFTER):
+    """
+    Put tasks back in the queue whose worker died while running them, or
+    fail them once they have used up their attempts
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.STATUS_RUNNING, started_at__lt=now - stale_after)
+    # کاری که هر بار worker رو می‌کشه نباید تا ابد دوباره اجرا بشه
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.STATUS_FAILED, finished_at=now, locked_by='',
+        last_error='worker died while running the task',
+    )
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(status=Task.STATUS_QUEUED, locked_by='')
+    return requeued + failed
+
+
+def get_metrics(since=None):
+    """
+    Per task name: counts, queue latency (run_at → started_at) and run time,
+    over tasks finished since `since` (default: the last hour)
+    """
+    since = since or timezone.now() - timedelta(hours=1)
+    wait = ExpressionWrapper(F('started_at') - F('run_at'), output_field=DurationField())
+    duration = ExpressionWrapper(F('finished_at') - F('started_at'), output_field=DurationField())
+    return list(
+        Task.objects.filter(finished_at__gte=since).values('name').annotate(
+            done=Count('id', filter=Q(status=Task.STATUS_DONE)),
+            failed=Count('id', filter=Q(status=Task.STATUS_FAILED)),
+            avg_wait=Avg(wait),
+            max_wait=Max(wait),
+            avg_duration=Avg(duration),
+        ).order_by('name')
+    )
+
+
+def get_queue_depth():
+    return Task.objects.filter(status=Task.STATUS_QUEUED, run_at__lte=timezone.now()).count()
+
+
+@task(priority=10, max_attempts=5)
+def send_email(message):
+    """
+    Send an email queued by core.mail.QueuedEmailBackend through the real backend
+    """
+    from django.core.mail import EmailMultiAlternatives, get_connection
+
+    email = EmailMultiAlternatives(
+        subject=message['subject'],
+        body=message['body'],
+        from_email=message['from_email'],
+        to=message['to'],
+        cc=message['cc'],
+        bcc=message['bcc'],
+        reply_to=message['reply_to'],
+        headers=message['headers'],
+        alternatives=[tuple(alternative) for alternative in message['alternatives']],
+        connection=get_connection(settings.CORE_TASKS_EMAIL_BACKEND),
+    )
+    email.content_subtype = message['content_subtype']
+    email.send()
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.urls import reverse
+
+from .instrumentation import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin: `assertQueryBudget('product_list')` fails when the page
+    runs more queries than settings.CORE_QUERY_BUDGETS allows for that URL
+    name, or repeats one SQL shape often enough to be an N+1
+    """
+
+    def assertQueryBudget(self, url_name, args=None, kwargs=None, data=None, budget=None, repeat_threshold=None):
+        if budget is None:
+            budget = settings.CORE_QUERY_BUDGETS[url_name]
+        if repeat_threshold is None:
+            repeat_threshold = settings.CORE_QUERY_REPEAT_THRESHOLD
+
+        with QueryRecorder() as recorder:
+            response = self.client.get(reverse(url_name, args=args, kwargs=kwargs), data)
+        self.assertEqual(response.status_code, 200)
+
+        shapes = '\n'.join(f'{count}× {shape}' for shape, count in recorder.shapes.most_common())
+        self.assertLessEqual(
+            recorder.count, budget,
+            f'{url_name} ran {recorder.count} queries, budget is {budget}:\n{shapes}',
+        )
+        repeated = recorder.get_repeated(repeat_threshold)
+        self.assertFalse(repeated, f'{url_name} repeats queries (N+1):\n{shapes}')
+        return response
@@ -1,3 +1,132 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import router, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 
-# Create your tests here.
+from .middleware import QueryInstrumentationMiddleware, ReplicaRoutingMiddleware
+from .models.task import Task
+from .tasks import STALE_AFTER, claim_tasks, requeue_stale_tasks, run_task, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise ValueError('boom')
+
+
+@override_settings(CORE_TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claims_by_priority_and_never_twice(self):
+        record.delay('low')
+        record.enqueue(['high'], priority=5)
+
+        first = claim_tasks('worker-1', limit=1)
+        second = claim_tasks('worker-2', limit=5)
+        self.assertEqual([row.args for row in first], [['high']])
+        self.assertEqual([row.args for row in second], [['low']])
+        self.assertEqual(claim_tasks('worker-3', limit=5), [])
+
+        for row in first + second:
+            self.assertTrue(run_task(row))
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Task.objects.filter(status=Task.STATUS_DONE).count(), 2)
+
+    def test_failures_back_off_then_fail(self):
+        always_fails.delay()
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_task(claim_tasks('worker')[0])
+        retry = Task.objects.get()
+        self.assertEqual((retry.status, retry.attempts), (Task.STATUS_QUEUED, 1))
+        self.assertGreater(retry.run_at, retry.started_at)
+        # هنوز زمان تلاش دوباره نرسیده
+        self.assertEqual(claim_tasks('worker'), [])
+
+        Task.objects.update(run_at=retry.started_at)
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_task(claim_tasks('worker')[0])
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.STATUS_FAILED, 2))
+        self.assertIn('ValueError: boom', failed.last_error)
+
+    def test_stale_tasks_are_requeued_until_attempts_run_out(self):
+        always_fails.delay()
+        for attempt in (1, 2):
+            claim_tasks('dead-worker')
+            Task.objects.update(started_at=F('started_at') - STALE_AFTER * 2)
+            self.assertEqual(requeue_stale_tasks(), 1)
+        task_row = Task.objects.get()
+        self.assertEqual((task_row.status, task_row.attempts), (Task.STATUS_FAILED, 2))
+        self.assertEqual(claim_tasks('worker'), [])
+
+    @override_settings(
+        EMAIL_BACKEND='core.mail.QueuedEmailBackend',
+        CORE_TASKS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_email_is_sent_by_the_worker(self):
+        mail.send_mail('subject', 'body', 'shop@example.com', ['customer@example.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+        run_task(claim_tasks('worker')[0])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['customer@example.com'])
+
+
+@override_settings(CORE_SERVER_TIMING=True, CORE_QUERY_REPEAT_THRESHOLD=3)
+class QueryInstrumentationTests(TestCase):
+    def test_repeated_query_shapes_are_reported(self):
+        def view(request):
+            for size in range(1, 5):
+                list(Task.objects.filter(pk__in=range(size)))
+            return HttpResponse()
+
+        with self.assertLogs('core.queries', 'INFO') as logs:
+            response = QueryInstrumentationMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertTrue(response.headers['Server-Timing'].startswith('db;dur='))
+        self.assertIn('desc="4 queries"', response.headers['Server-Timing'])
+        warnings = [record for record in logs.records if record.levelname == 'WARNING']
+        self.assertEqual(len(warnings), 1)
+        self.assertIn('4 queries of the same shape', warnings[0].getMessage())
+
+
+@override_settings(CORE_REPLICA_DATABASE='replica', CORE_REPLICA_MODELS={'core.task'})
+class ReplicaRoutingTests(TransactionTestCase):
+    # TestCase همه چیز رو داخل transaction اجرا می‌کنه
+    def route(self, request):
+        def view(request):
+            return HttpResponse(f'{router.db_for_read(Task)} {router.db_for_read(get_user_model())} {router.db_for_write(Task)}')
+
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_and_writes(self):
+        factory = RequestFactory()
+        self.assertEqual(self.route(factory.get('/')).content, b'replica default default')
+        response = self.route(factory.post('/'))
+        self.assertEqual(response.content, b'default default default')
+        self.assertEqual(response.cookies['primary_db']['max-age'], 10)
+
+        # بعد از POST، تا چند ثانیه همه چیز از primary
+        pinned = factory.get('/')
+        pinned.COOKIES['primary_db'] = '1'
+        self.assertEqual(self.route(pinned).content, b'default default default')
+        # خارج از درخواست (دستورات مدیریتی، task ها) هم همینطور
+        self.assertEqual(router.db_for_read(Task), 'default')
+
+    def test_transactions_read_from_primary(self):
+        def view(request):
+            with transaction.atomic():
+                return HttpResponse(router.db_for_read(Task))
+
+        self.assertEqual(ReplicaRoutingMiddleware(view)(RequestFactory().get('/')).content, b'default')
@@ -3,7 +3,7 @@ from mptt.admin import MPTTModelAdmin, TreeRelatedFieldListFilter
 from django.db.models.query import QuerySet
 from django.http import HttpRequest
 
-from . import models
+from . import comments, models, page_cache
 
 
 class CommentsInline(admin.TabularInline):
@@ -29,17 +29,13 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(models.Category)
 class CategoryAdmin(MPTTModelAdmin):
     mptt_level_indent = 40
-    list_display = ['id', 'get_full_path', 'title', 'parent', 'top_product', 'slug']
+    list_display = ['id', 'full_path', 'title', 'parent', 'top_product', 'slug']
     search_fields = ['title']
     prepopulated_fields = {'slug': ('title', )}
     list_select_related = ['top_product', 'parent']
     list_filter = (('parent', TreeRelatedFieldListFilter), )
     list_per_page = 10
     
-    @admin.display(description='Full Path')
-    def get_full_path(self, obj):
-        return obj.get_full_path
-    
 
     
 @admin.register(models.Comment)
@@ -49,12 +45,31 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ['name', 'product__name', 'body']
     ordering = ['-id']
     list_select_related = ['product']
+    actions = ['approve_comments', 'reject_comments']
     
     
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
         return queryset.select_related('product')
     
+    def set_status(self, queryset, status):
+        product_ids = set(queryset.values_list('product_id', flat=True))
+        updated = queryset.update(status=status)
+        # update() سیگنال نمی‌فرسته
+        comments.refresh_products(product_ids)
+        page_cache.bump_version()
+        return updated
+    
+    @admin.action(description='Approve selected comments')
+    def approve_comments(self, request, queryset):
+        updated = self.set_status(queryset, models.Comment.COMMENT_STATUS_APPROVED)
+        self.message_user(request, f'{updated} comments approved')
+    
+    @admin.action(description='Reject selected comments')
+    def reject_comments(self, request, queryset):
+        updated = self.set_status(queryset, models.Comment.COMMENT_STATUS_NOT_APPROVED)
+        self.message_user(request, f'{updated} comments rejected')
+    
     
     @admin.display(description='Body')
     def short_body(self, obj):
@@ -95,6 +110,8 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(models.OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'unit_price', ]
+    # Order.__str__ نام مشتری رو از customer.user می‌خونه
+    list_select_related = ['order__customer__user', 'product']
     
 @admin.register(models.Customer)
 class CustomerAdmin(admin.ModelAdmin):
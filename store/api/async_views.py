@@ -0,0 +1,99 @@
+"""
+Async versions of the read-only cart API endpoints, used under ASGI
+(STORE_ASYNC_API). They return the same JSON as the DRF viewsets; other
+HTTP methods on the same URLs still go to DRF.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import re_path
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from store.models import Cart, CartItem
+from store.pricing import with_cart_totals, with_item_totals
+
+from .pagination import KeysetPagination
+from .renderers import encode
+from .serializers import CartItemSerializer, CartSerializer
+from .values import CartItemValuesSerializer
+
+
+def json_response(data, status=200):
+    # همون بایت‌های FastJSONRenderer نسخه‌ی DRF
+    return HttpResponse(encode(data), status=status, content_type='application/json')
+
+
+def not_found(detail=None):
+    return json_response({'detail': detail or NotFound.default_detail}, status=404)
+
+
+async def cart_detail(request, pk):
+    cart = await with_cart_totals(Cart.objects.filter(pk=pk)).afirst()
+    if cart is None:
+        return not_found()
+    return json_response(CartSerializer(cart).data)
+
+
+async def cart_item_list(request, cart_pk):
+    def get_page():
+        # همون صفحه‌بندی keyset نسخه‌ی DRF
+        paginator = KeysetPagination()
+        view = type('CartItemView', (), {'cursor_ordering': ('id', )})
+        serializer = CartItemValuesSerializer()
+        queryset = serializer.values(with_item_totals(CartItem.objects.filter(cart_id=cart_pk)), 'id')
+        items = paginator.paginate_queryset(queryset, Request(request), view)
+        return paginator.get_paginated_response(serializer.serialize(items)).data
+
+    try:
+        data = await sync_to_async(get_page)()
+    except NotFound as exc:
+        return not_found(exc.detail)
+    return json_response(data)
+
+
+async def cart_item_detail(request, cart_pk, pk):
+    item = None
+    if pk.isdigit():
+        item = await with_item_totals(CartItem.objects.filter(cart_id=cart_pk, pk=pk)).afirst()
+    if item is None:
+        return not_found()
+    return json_response(CartItemSerializer(item).data)
+
+
+ASYNC_READ_VIEWS = {
+    'cart-detail': cart_detail,
+    'cart-item-list': cart_item_list,
+    'cart-item-detail': cart_item_detail,
+}
+
+
+def read_async(async_view, view):
+    """
+    GET/HEAD go to `async_view`; everything else to the original DRF view
+    """
+    async def dispatch(request, *args, **kwargs):
+        if request.method == 'GET':
+            return await async_view(request, *args, **kwargs)
+        if request.method == 'HEAD':
+            response = await async_view(request, *args, **kwargs)
+            # همون header های GET، بدون بدنه
+            response['Content-Length'] = str(len(response.content))
+            response.content = b''
+            return response
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    # DRF خودش CSRF رو برای session auth بررسی می‌کنه
+    return csrf_exempt(dispatch)
+
+
+def with_async_reads(urlpatterns):
+    """
+    Swap in the async read views for the router's routes (but not their
+    `.json`-style format suffix variants)
+    """
+    return [
+        re_path(pattern.pattern.regex.pattern, read_async(ASYNC_READ_VIEWS[pattern.name], pattern.callback), name=pattern.name)
+        if pattern.name in ASYNC_READ_VIEWS and 'format' not in pattern.pattern.regex.groupindex else pattern
+        for pattern in urlpatterns
+    ]
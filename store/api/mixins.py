@@ -0,0 +1,139 @@
+import hashlib
+
+from django.db.models import ManyToManyField, Prefetch
+from django.http import Http404
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+class SparseFieldsetViewMixin:
+    """
+    `?fields=id,name` limits the serializer (see serializers.SparseFieldsetMixin)
+    and the SQL: only those columns are selected and only the requested
+    many-to-many fields are prefetched. Without it the list action leaves
+    out `list_exclude_fields`.
+    """
+    fields_query_param = 'fields'
+    list_exclude_fields = ()
+
+    def get_fields(self):
+        available = self.get_serializer_class().Meta.fields
+        requested = self.request.query_params.get(self.fields_query_param)
+        if not requested:
+            if self.action == 'list':
+                return [name for name in available if name not in self.list_exclude_fields]
+            return list(available)
+
+        names = {name.strip() for name in requested.split(',') if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({self.fields_query_param: [f'Unknown fields: {", ".join(sorted(unknown))}']})
+        return [name for name in available if name in names]
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def select_fields(self, queryset):
+        model_meta = queryset.model._meta
+        columns = {'pk', *(name.lstrip('-') for name in getattr(self, 'cursor_ordering', ()))}
+        for name in self.get_fields():
+            field = model_meta.get_field(name)
+            if isinstance(field, ManyToManyField):
+                # فقط id ها سریالایز میشن
+                queryset = queryset.prefetch_related(Prefetch(name, queryset=field.related_model.objects.only('pk')))
+            elif field.concrete:
+                columns.add(name)
+        return queryset.only(*columns)
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags on list and retrieve. A matching If-None-Match is answered
+    with 304 before the page is fetched or serialized, so a polling client
+    costs one cheap query. Views return a value that changes whenever the
+    response would from get_list_version() and get_object_version() (None
+    means the object does not exist).
+    """
+
+    def get_list_version(self):
+        raise NotImplementedError
+
+    def get_object_version(self):
+        raise NotImplementedError
+
+    def get_etag(self, version):
+        # نسخه‌ی JSON و browsable، یا صفحه‌ها و fields متفاوت، ETag جدا دارن
+        key = repr((version, self.request.get_full_path(), self.request.accepted_media_type))
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def conditional_response(self, version, handler, request, *args, **kwargs):
+        etag = self.get_etag(version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.get_list_version(), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        version = self.get_object_version()
+        if version is None:
+            raise Http404
+        return self.conditional_response(version, super().retrieve, request, *args, **kwargs)
+
+
+class ContentETagMixin(ConditionalGetMixin):
+    """
+    ConditionalGetMixin for views without a cheap version to check first:
+    the ETag is a digest of the data actually served, so it always matches
+    the body, whichever database (primary or replica) it was read from.
+    The page is still read and serialized, only the body is saved.
+    """
+
+    def content_conditional_response(self, handler, request, *args, **kwargs):
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        etag = self.get_etag(response.data)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.content_conditional_response(super(ConditionalGetMixin, self).list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.content_conditional_response(super(ConditionalGetMixin, self).retrieve, request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """
+    list() through `values_serializer_class` (values.ValuesSerializer)
+    instead of the ModelSerializer, honouring SparseFieldsetViewMixin's
+    fields. Detail views and writes keep the regular serializer.
+    """
+    values_serializer_class = None
+
+    def get_values_queryset(self):
+        return self.get_queryset()
+
+    def get_values_serializer(self):
+        fields = self.get_fields() if hasattr(self, 'get_fields') else None
+        return self.values_serializer_class(fields=fields)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_values_serializer()
+        # مقدار فیلدهای مرتب‌سازی برای ساختن cursor لازمه
+        ordering = [name.lstrip('-') for name in getattr(self, 'cursor_ordering', ())]
+        queryset = serializer.values(self.filter_queryset(self.get_values_queryset()), *ordering)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
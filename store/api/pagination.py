@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from store.pagination import CursorPaginator, InvalidCursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Same keyset cursors as the HTML listings (store.pagination.CursorPaginator).
+    The view can override `cursor_ordering`; `count` is an estimate unless
+    `exact_count` is set, and is left out entirely when `include_count` is off.
+    """
+    page_size = 20
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-datetime_created', '-id')
+    exact_count = False
+    include_count = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        self.paginator = CursorPaginator(queryset, ordering, self.page_size, exact_count=self.exact_count)
+        try:
+            self.page = self.paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.include_count:
+            response['count'] = self.paginator.count
+        response['next'] = self.get_link(self.page.next_cursor)
+        response['previous'] = self.get_link(self.page.previous_cursor)
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        properties = {
+            'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+            'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+            'results': schema,
+        }
+        if self.include_count:
+            properties['count'] = {'type': 'integer'}
+        return {'type': 'object', 'required': ['results'], 'properties': properties}
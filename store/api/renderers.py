@@ -0,0 +1,45 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # بدون orjson همون JSONRenderer خود DRF
+    orjson = None
+
+
+# datetime ها رو orjson جور دیگه‌ای می‌نویسه؛ به encoder خود DRF سپرده میشن
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+_default = JSONEncoder().default
+
+
+def encode(data):
+    """
+    Compact JSON bytes, identical to DRF's JSONRenderer output, encoded by
+    orjson when it is installed
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+    # مثل DRF، تا خروجی زیرمجموعه‌ی معتبر جاوااسکریپت باشه
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on top of `encode`. Indented output (`Accept:
+    application/json; indent=4`) and non-default JSON settings still use
+    the stdlib path.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return encode(data)
@@ -3,14 +3,27 @@ from rest_framework import serializers
 from django.utils.text import slugify
 
 
+from store.cart import add_cart_items
 from store.models import Cart, CartItem, Order, OrderItem, Product, Category, Customer, Address
 
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    `fields=[...]` keeps only those of the serializer's fields
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ['id', 'name', 'category', 'slug', 'unit_price', 'description', 'short_description', 'inventory', 'discounts', 'is_active', ]
+        fields = ['id', 'name', 'categories', 'slug', 'unit_price', 'effective_price', 'description', 'short_description',
+                  'inventory', 'discounts', 'is_active', 'datetime_modified', ]
     
     def create(self, validated_data):
         product = Product(**validated_data)
@@ -26,10 +39,10 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', ]
         
         
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'title', 'description', 'top_product', ]
+        fields = ['id', 'title', 'slug', 'description', 'parent', 'top_product', ]
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -60,10 +73,18 @@ class UpdateCartItemSerializer(serializers.ModelSerializer):
         fields = ['quantity']    
         
             
+class AddCartItemListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        # همه‌ی خط‌ها با یک دستور upsert اضافه میشن
+        cart_id = self.context['cart_pk']
+        return add_cart_items(cart_id, [(item['product'].id, item['quantity']) for item in validated_data])
+    
+    
 class AddCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'quantity', ]
+        list_serializer_class = AddCartItemListSerializer
         
     def create(self, validated_data):
         cart_id = self.context['cart_pk']
@@ -71,12 +92,7 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         product = validated_data.get('product')
         quantity = validated_data.get('quantity')
         
-        try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product.id)
-            cart_item.quantity += quantity 
-            cart_item.save() 
-        except CartItem.DoesNotExist:
-            cart_item = CartItem.objects.create(cart_id=cart_id, **validated_data)
+        [cart_item] = add_cart_items(cart_id, [(product.id, quantity)])
             
         self.instance = cart_item
         return cart_item
@@ -84,13 +100,12 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         
 class CartItemSerializer(serializers.ModelSerializer):
     product = CartProductSerializers()
-    item_total = serializers.SerializerMethodField()
+    # annotate شده توسط store.pricing.with_item_totals
+    unit_price_after_discount = serializers.IntegerField(read_only=True)
+    item_total = serializers.IntegerField(read_only=True)
     class Meta:
         model = CartItem
-        fields = ['id','product', 'quantity', 'item_total', ]
-    
-    def get_item_total(self, cart_item):
-        return cart_item.quantity * cart_item.product.unit_price
+        fields = ['id','product', 'quantity', 'unit_price_after_discount', 'item_total', ]
         
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -101,5 +116,6 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', ]
         
     def get_total_price(self, cart):
-        return sum([item.quantity * item.product.unit_price for item in cart.items.all()])
+        # annotate شده توسط store.pricing.with_cart_totals؛ سبد تازه ساخته‌شده آیتمی نداره
+        return getattr(cart, 'total_price', 0)
     
\ No newline at end of file
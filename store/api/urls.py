@@ -1,13 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
 from rest_framework_nested import routers
 
 from . import views
+from .async_views import with_async_reads
 
 
 router = DefaultRouter()
 router.register('carts', views.CartViewSet)
+router.register('products', views.ProductViewSet, basename='product')
+router.register('categories', views.CategoryViewSet, basename='category')
 
 cart_items_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
 cart_items_router.register('items', views.CartItemViewSet, basename='cart-item')
@@ -20,3 +24,6 @@ html_urlpatterns = [
 
 
 urlpatterns = router.urls + cart_items_router.urls + html_urlpatterns
+
+if settings.STORE_ASYNC_API:
+    urlpatterns = with_async_reads(urlpatterns)
@@ -0,0 +1,147 @@
+"""
+Read-only serializers that build the same dicts as the ModelSerializers in
+serializers.py straight from `.values()` rows: no model instances and no
+DRF field objects per row. Used by list endpoints (ValuesListMixin).
+"""
+from collections import defaultdict
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+
+from store.models import CartItem, Product
+
+from .renderers import encode
+
+
+# همون تبدیل‌هایی که فیلدهای DRF انجام میدن؛ بقیه‌ی نوع‌ها بدون تغییر
+CONVERTERS = {
+    models.DateTimeField: serializers.DateTimeField().to_representation,
+    models.DateField: serializers.DateField().to_representation,
+    models.UUIDField: str,
+}
+
+
+def get_converter(field):
+    for field_class, convert in CONVERTERS.items():
+        if isinstance(field, field_class):
+            return convert
+    if isinstance(field, (models.DecimalField, models.FileField)):
+        raise TypeError(f'{field} is not supported by ValuesSerializer')
+    return None
+
+
+class ValuesSerializer:
+    """
+    `fields` are output names in order: model fields, foreign keys (as
+    their pk), many-to-many fields (as lists of pks, one extra query per
+    batch) or queryset annotations. `nested` maps a foreign key name to the
+    ValuesSerializer of its related object. Every field is compiled once
+    into a (name, extractor) pair.
+    """
+    model = None
+    fields = ()
+    nested = {}
+
+    def __init__(self, fields=None, prefix=''):
+        self.prefix = prefix
+        self.lookups = []
+        self.many_to_many = []
+        self.extractors = [
+            (name, self.compile(name))
+            for name in self.fields if fields is None or name in fields
+        ]
+
+    def compile(self, name):
+        lookup = self.prefix + name
+        if name in self.nested:
+            child = self.nested[name](prefix=f'{lookup}__')
+            self.lookups += child.lookups
+            return child.to_representation
+
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None  # annotation
+        if isinstance(field, models.ManyToManyField):
+            # بعد از خوندن ردیف‌ها توسط fill_many_to_many پر میشه
+            self.many_to_many.append(field)
+            self.lookups.append(self.prefix + self.model._meta.pk.attname)
+            return itemgetter(lookup)
+
+        self.lookups.append(lookup)
+        convert = get_converter(field) if field is not None else None
+        if convert is None:
+            return itemgetter(lookup)
+        return lambda row: None if row[lookup] is None else convert(row[lookup])
+
+    def values(self, queryset, *extra):
+        """
+        `queryset.values()` with every column this serializer needs, plus `extra`
+        """
+        return queryset.values(*dict.fromkeys([*self.lookups, *extra]))
+
+    def fill_many_to_many(self, rows):
+        pk_name = self.prefix + self.model._meta.pk.attname
+        pks = [row[pk_name] for row in rows]
+        for field in self.many_to_many:
+            # مرتب‌سازی manager مدل مقصد (مثلاً ترتیب درخت دسته‌ها) مثل .all() در DRF
+            related_name = field.related_query_name()
+            pairs = field.related_model._default_manager.filter(
+                **{f'{related_name}__in': pks},
+            ).values_list(related_name, 'pk')
+            related = defaultdict(list)
+            for pk, related_pk in pairs:
+                related[pk].append(related_pk)
+            for row in rows:
+                row[self.prefix + field.name] = related[row[pk_name]]
+
+    def to_representation(self, row):
+        return {name: extract(row) for name, extract in self.extractors}
+
+    def serialize(self, rows):
+        rows = list(rows)
+        if self.many_to_many and rows:
+            self.fill_many_to_many(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+def stream_json(serializer, queryset, chunk_size=500):
+    """
+    Every row of `queryset` (from `serializer.values()`) as one JSON
+    array, fetched, serialized and encoded `chunk_size` rows at a time
+    """
+    yield b'['
+    separator = b''
+    batch = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) == chunk_size:
+            yield separator + encode(serializer.serialize(batch))[1:-1]
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + encode(serializer.serialize(batch))[1:-1]
+    yield b']'
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    model = Product
+    # همون serializers.ProductSerializer
+    fields = ['id', 'name', 'categories', 'slug', 'unit_price', 'effective_price', 'description', 'short_description',
+              'inventory', 'discounts', 'is_active', 'datetime_modified', ]
+
+
+class CartProductValuesSerializer(ValuesSerializer):
+    model = Product
+    fields = ['id', 'name', 'unit_price', ]
+
+
+class CartItemValuesSerializer(ValuesSerializer):
+    """
+    serializers.CartItemSerializer for querysets from store.pricing.with_item_totals
+    """
+    model = CartItem
+    fields = ['id', 'product', 'quantity', 'unit_price_after_discount', 'item_total', ]
+    nested = {'product': CartProductValuesSerializer}
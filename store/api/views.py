@@ -1,21 +1,33 @@
 from urllib import request
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ReadOnlyModelViewSet
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
 from django.views.generic import TemplateView
 
-from .serializers import AddCartItemSerializer, CartItemSerializer, CartSerializer, UpdateCartItemSerializer
+from .mixins import ConditionalGetMixin, ContentETagMixin, SparseFieldsetViewMixin, ValuesListMixin
+from .pagination import KeysetPagination
+from .serializers import (AddCartItemSerializer, CartItemSerializer, CartSerializer, CategorySerializer, ProductSerializer,
+                          UpdateCartItemSerializer)
+from .values import CartItemValuesSerializer, ProductValuesSerializer, stream_json
 
-from store.models import Cart, CartItem
+from store.models import Cart, CartItem, Category, Product
+from store.pricing import with_cart_totals, with_item_totals
 
 class CartPageview(TemplateView):
     template_name = 'cart_detail.html'
     
-class CartItemViewSet(ModelViewSet):
+class CartItemViewSet(ValuesListMixin, ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', ]
+    pagination_class = KeysetPagination
+    values_serializer_class = CartItemValuesSerializer
+    cursor_ordering = ('id', )
     
     def get_queryset(self): # type: ignore
         cart_pk = self.kwargs['cart_pk']
-        return CartItem.objects.select_related('product').filter(cart_id=cart_pk).all()   
+        return with_item_totals(CartItem.objects.filter(cart_id=cart_pk))
     
     def get_serializer_class(self): # type: ignore
         if self.request.method == 'POST':
@@ -25,6 +37,12 @@ class CartItemViewSet(ModelViewSet):
         
         return CartItemSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        # یک لیست از خط‌ها → افزودن گروهی در یک درخواست
+        if self.request.method == 'POST' and isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+    
     def get_serializer_context(self):
         return {'cart_pk': self.kwargs['cart_pk']}
     
@@ -34,8 +52,67 @@ class CartViewSet(CreateModelMixin,
                   GenericViewSet):
     
     serializer_class = CartSerializer
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    queryset = with_cart_totals(Cart.objects.all())
     lookup_value_regex = ('[0-9a-fA-F]{8}\\-[0-9a-fA-F]{4}\\-[0-9a-fA-F]{4}\\-[0-9a-fA-F]{4}\\-[0-9a-fA-F]{12}') # type: ignore
-    
 
-    
+
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, ValuesListMixin, ReadOnlyModelViewSet):
+    """
+    Active products, newest first. `?category=<id>` includes subcategories.
+    """
+    serializer_class = ProductSerializer
+    values_serializer_class = ProductValuesSerializer
+    pagination_class = KeysetPagination
+    lookup_value_regex = '[0-9]+'
+    cursor_ordering = ('-datetime_created', '-id')
+    # توضیحات HTML حجیم‌ترین ستونه؛ فقط در صفحه‌ی محصول یا با fields=description
+    list_exclude_fields = ('description', )
+
+    def get_base_queryset(self):
+        queryset = Product.objects.filter(is_active=True)
+        category_id = self.request.query_params.get('category')
+        if category_id:
+            if not category_id.isdigit():
+                raise ValidationError({'category': ['A category id is required.']})
+            queryset = queryset.filter(category_closure__category_id=category_id)
+        return queryset
+
+    def get_queryset(self): # type: ignore
+        return self.select_fields(self.get_base_queryset())
+
+    def get_values_queryset(self):
+        return self.get_base_queryset()
+
+    def get_list_version(self):
+        # محصولی که غیرفعال یا حذف بشه از max بیرون میره ولی تعداد رو عوض می‌کنه
+        return tuple(self.get_base_queryset().aggregate(modified=Max('datetime_modified'), count=Count('id')).values())
+
+    def get_object_version(self):
+        return self.get_base_queryset().filter(pk=self.kwargs['pk']).values_list('datetime_modified', flat=True).first()
+
+    @action(detail=False)
+    def export(self, request):
+        """
+        Every matching product as one streamed JSON array, without pagination
+        """
+        def stream(request):
+            serializer = self.get_values_serializer()
+            queryset = serializer.values(self.get_base_queryset().order_by('id'))
+            return StreamingHttpResponse(stream_json(serializer, queryset), content_type='application/json')
+
+        return self.conditional_response(self.get_list_version(), stream, request)
+
+
+class CategoryViewSet(ContentETagMixin, SparseFieldsetViewMixin, ReadOnlyModelViewSet):
+    """
+    Categories in tree order (parents before their children)
+    """
+    serializer_class = CategorySerializer
+    pagination_class = KeysetPagination
+    lookup_value_regex = '[0-9]+'
+    cursor_ordering = ('tree_id', 'lft', 'id')
+
+    def get_queryset(self): # type: ignore
+        # ETag از خود ردیف‌های سرو‌شده ساخته میشه، پس replica هم مشکلی نداره
+        return self.select_fields(Category.objects.all())
+
@@ -1,80 +1,250 @@
+from functools import cached_property
+
 from django.contrib import messages
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
 from django.utils.translation import gettext_lazy as _
 
 
-from .models import Product
+from . import models, pricing
+
+
+SUMMARY_CACHE_KEY = 'store:cart:summary:{cart_id}'
+# کوتاه، تا اگه invalidate به یک process نرسید (مثلاً کش locmem) خطا زود برطرف بشه
+SUMMARY_CACHE_TIMEOUT = 60 * 5
+
+
+def get_cart_summary(cart_id):
+    """
+    Item count and total price of a cart, from the cache or one aggregate query
+    """
+    key = SUMMARY_CACHE_KEY.format(cart_id=cart_id)
+    summary = cache.get(key)
+    if summary is None:
+        totals = models.CartItem.objects.filter(cart_id=cart_id).aggregate(
+            count=Sum('quantity'),
+            total=Sum(pricing.cart_item_total()),
+        )
+        summary = {'count': totals['count'] or 0, 'total': totals['total'] or 0}
+        cache.set(key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_cart_summary(cart_id):
+    cache.delete(SUMMARY_CACHE_KEY.format(cart_id=cart_id))
+
+
+def merge_lines(lines, replace=False):
+    """
+    Collapse repeated products so one statement never touches a row twice
+    """
+    merged = {}
+    for product_id, quantity in lines:
+        if replace:
+            merged[product_id] = quantity
+        else:
+            merged[product_id] = merged.get(product_id, 0) + quantity
+    return merged
+
+
+def _upsert_on_conflict(cart_id, merged, replace):
+    cart_item_meta = models.CartItem._meta
+    table = connection.ops.quote_name(cart_item_meta.db_table)
+    db_cart_id = cart_item_meta.get_field('cart').get_db_prep_value(cart_id, connection)
+
+    quantity = 'EXCLUDED.quantity' if replace else f'{table}.quantity + EXCLUDED.quantity'
+    values = ', '.join(['(%s, %s, %s)'] * len(merged))
+    params = []
+    for product_id, line_quantity in merged.items():
+        params += [db_cart_id, product_id, line_quantity]
+
+    sql = f'''
+        INSERT INTO {table} (cart_id, product_id, quantity) VALUES {values}
+        ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {quantity}
+        RETURNING id, product_id, quantity
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        models.CartItem(id=item_id, cart_id=cart_id, product_id=product_id, quantity=line_quantity)
+        for item_id, product_id, line_quantity in rows
+    ]
+
+
+def _upsert_with_locks(cart_id, merged, replace):
+    items = []
+    with transaction.atomic():
+        for product_id, line_quantity in merged.items():
+            for attempt in range(3):
+                try:
+                    with transaction.atomic():
+                        item = models.CartItem.objects.select_for_update().filter(
+                            cart_id=cart_id, product_id=product_id,
+                        ).first()
+                        if item is None:
+                            item = models.CartItem.objects.create(
+                                cart_id=cart_id, product_id=product_id, quantity=line_quantity,
+                            )
+                        else:
+                            item.quantity = line_quantity if replace else F('quantity') + line_quantity
+                            item.save(update_fields=['quantity'])
+                            item.refresh_from_db(fields=['quantity'])
+                    break
+                except IntegrityError:
+                    # یه درخواست همزمان همین ردیف رو ساخت؛ دوباره با قفل امتحان می‌کنیم
+                    if attempt == 2:
+                        raise
+            items.append(item)
+    return items
+
+
+def add_cart_items(cart_id, lines, replace=False):
+    """
+    Insert or increment cart lines atomically, in a single statement where the
+    database supports `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`
+    (postgres, sqlite >= 3.35) and with row locks elsewhere.
+    `lines` is an iterable of (product_id, quantity).
+    """
+    merged = merge_lines(lines, replace)
+    if not merged:
+        return []
+
+    features = connection.features
+    if features.supports_update_conflicts_with_target and features.can_return_rows_from_bulk_insert:
+        items = _upsert_on_conflict(cart_id, merged, replace)
+    else:
+        items = _upsert_with_locks(cart_id, merged, replace)
+
+    # SQL خام سیگنال post_save نمی‌فرسته
+    invalidate_cart_summary(cart_id)
+    return items
+
+
+def get_cart(request):
+    """
+    Return the cart of this request, creating it only once per request
+    """
+    if not hasattr(request, '_cart'):
+        request._cart = Cart(request)
+    return request._cart
 
 
 class Cart:
+    """
+    Session-facing cart stored in the `Cart`/`CartItem` models, the same
+    rows the cart API works on. The session only keeps the cart id.
+    Items are loaded lazily, once per request.
+    """
+    session_key = 'cart_id'
+    legacy_session_key = 'cart'
+
     def __init__(self, request):
         """
         initialize the cart
         """
         self.request = request
-        
+
         self.session = request.session
-        
-        cart = self.session.get('cart')
-        if not cart:
-            cart = self.session['cart'] = {}
-        self.cart = cart
-        
+
+        self.cart_id = self.session.get(self.session_key)
+
+        # سبدهای قدیمی که کامل توی session بودن یک بار به دیتابیس منتقل میشن
+        legacy_cart = self.session.get(self.legacy_session_key)
+        if legacy_cart:
+            self._import_legacy_cart(legacy_cart)
+
+    def _import_legacy_cart(self, legacy_cart):
+        product_ids = models.Product.objects.filter(id__in=legacy_cart.keys()).values_list('id', flat=True)
+        cart_id = self._get_or_create_cart_id()
+        models.CartItem.objects.bulk_create([
+            models.CartItem(cart_id=cart_id, product_id=product_id, quantity=legacy_cart[str(product_id)]['quantity'])
+            for product_id in product_ids
+        ], ignore_conflicts=True)
+        del self.session[self.legacy_session_key]
+        self.save()
+
+    def _get_or_create_cart_id(self):
+        if not self.cart_id or not models.Cart.objects.filter(pk=self.cart_id).exists():
+            self.cart_id = str(models.Cart.objects.create().pk)
+            self.session[self.session_key] = self.cart_id
+        return self.cart_id
+
     def add(self, product, quantity=1, replace_current_quantity=False):
         """
         Add the specified product to the cart if it exists
         """
-        product_id = str(product.id)
-        
-        if product_id not in self.cart:
-            self.cart[product_id] = {'quantity': 0}
-        if replace_current_quantity:
-            self.cart[product_id]['quantity'] = quantity
-        else:
-            self.cart[product_id]['quantity'] += quantity
-            
+        cart_id = self._get_or_create_cart_id()
+        add_cart_items(cart_id, [(product.id, quantity)], replace=replace_current_quantity)
+
         messages.success(self.request, _('Product successfully added to cart'))
-            
+
         self.save()
-        
+
     def remove(self, product):
         """
         Remove the specified product from the cart
         """
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        if not self.cart_id:
+            return
+        deleted, _deleted_per_model = models.CartItem.objects.filter(cart_id=self.cart_id, product_id=product.id).delete()
+        if deleted:
             messages.success(self.request, _('Product successfully removed from cart'))
-            
+
             self.save()
-            
+
+    @cached_property
+    def items(self):
+        """
+        Cart lines with their products, loaded with a single query
+        """
+        if not self.cart_id:
+            return []
+        cart_items = pricing.with_item_totals(models.CartItem.objects.filter(cart_id=self.cart_id)).order_by('id')
+        return [
+            {
+                'product_obj': item.product,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price_after_discount,
+                'total_price': item.item_total,
+            }
+            for item in cart_items
+        ]
+
     def __iter__(self):
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        
-        cart = self.cart.copy()
-        
-        for product in products:
-            cart[str(product.id)]['product_obj'] = product # type: ignore
-
-        for item in cart.values():
-            item['total_price'] = item['product_obj'].unit_price * item['quantity']
-            yield item
-            
+        return iter(self.items)
+
     def save(self):
         """
-        Mark the session as modified to save changes
+        Mark the session as modified and drop memoized items and totals
         """
         self.session.modified = True
+        self.__dict__.pop('items', None)
+        if self.cart_id:
+            invalidate_cart_summary(self.cart_id)
+
+    @property
+    def summary(self):
+        """
+        Item count and total for the navbar, without loading products
+        """
+        if 'items' in self.__dict__:
+            return {
+                'count': sum(item['quantity'] for item in self.items),
+                'total': sum(item['total_price'] for item in self.items),
+            }
+        if not self.cart_id:
+            return {'count': 0, 'total': 0}
+        return get_cart_summary(self.cart_id)
 
     def __len__(self):
-        return sum(item['quantity'] for item in self.cart.values())
-    
+        return self.summary['count']
+
     def clear(self):
-        del self.session['cart']
+        if self.cart_id:
+            models.CartItem.objects.filter(cart_id=self.cart_id).delete()
         self.save()
 
     def get_total_price(self):
-        product_ids = self.cart.keys()
-
-        return sum(item['quantity'] * item['product_obj'].unit_price for item in self.cart.values())
-    
\ No newline at end of file
+        return self.summary['total']
@@ -0,0 +1,78 @@
+"""
+Denormalized `Category.full_path` ("a>b>c") and `Category.path_ids`
+("1/5/9", ancestors then self), kept up to date from post_save so
+breadcrumbs never need get_ancestors().
+"""
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat, Substr
+
+from .models import Category
+
+
+PATH_SEPARATOR = '>'
+ID_SEPARATOR = '/'
+
+
+def join_path(parent_path, title):
+    return f'{parent_path}{PATH_SEPARATOR}{title}' if parent_path else title
+
+
+def join_ids(parent_ids, pk):
+    return f'{parent_ids}{ID_SEPARATOR}{pk}' if parent_ids else str(pk)
+
+
+def replace_prefix(field_name, old, new):
+    # مقدار هر نود زیردرخت با همون پیشوند قبلی شروع میشه
+    return Concat(Value(new), Substr(field_name, len(old) + 1), output_field=TextField())
+
+
+def refresh_category_paths(category):
+    """
+    Recompute the paths of `category` from its parent and, if they have
+    changed (new title or parent), rewrite every descendant in one UPDATE
+    """
+    current = Category.objects.filter(pk=category.pk).values(
+        'full_path', 'path_ids', 'tree_id', 'lft', 'rght',
+    ).first()
+    if current is None:
+        return
+
+    parent_path, parent_ids = '', ''
+    if category.parent_id is not None:
+        parent_path, parent_ids = Category.objects.filter(pk=category.parent_id).values_list(
+            'full_path', 'path_ids',
+        ).get()
+    full_path = join_path(parent_path, category.title)
+    path_ids = join_ids(parent_ids, category.pk)
+    category.full_path, category.path_ids = full_path, path_ids
+    if (full_path, path_ids) == (current['full_path'], current['path_ids']):
+        return
+
+    Category.objects.filter(pk=category.pk).update(full_path=full_path, path_ids=path_ids)
+    if current['rght'] - current['lft'] > 1:
+        Category.objects.filter(
+            tree_id=current['tree_id'], lft__gt=current['lft'], rght__lt=current['rght'],
+        ).update(
+            full_path=replace_prefix('full_path', current['full_path'], full_path),
+            path_ids=replace_prefix('path_ids', current['path_ids'], path_ids),
+        )
+
+
+def rebuild_category_paths(queryset=None):
+    """
+    Recompute the paths of every category in tree order (e.g. after
+    `Category.objects.rebuild()` or a raw import)
+    """
+    queryset = queryset if queryset is not None else Category.objects.all()
+    paths = {}
+    changed = []
+    for category in queryset.order_by('tree_id', 'lft').only('id', 'title', 'parent_id', 'full_path', 'path_ids'):
+        parent_path, parent_ids = paths.get(category.parent_id, ('', ''))
+        full_path = join_path(parent_path, category.title)
+        path_ids = join_ids(parent_ids, category.pk)
+        paths[category.pk] = (full_path, path_ids)
+        if (full_path, path_ids) != (category.full_path, category.path_ids):
+            category.full_path, category.path_ids = full_path, path_ids
+            changed.append(category)
+    Category.objects.bulk_update(changed, ['full_path', 'path_ids'], batch_size=500)
+    return len(changed)
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import translation
+
+from core.routers import replica_reads
+
+from .models import Category
+
+
+VERSION_CACHE_KEY = 'store:category_tree:version'
+TREE_CACHE_KEY = 'store:category_tree:tree:{version}'
+MENU_CACHE_KEY = 'store:category_tree:menu:{version}:{language}'
+
+# نسخه‌های قدیمی با بالا رفتن version بی‌استفاده میشن؛ TTL کوتاه برای وقتیه که bump به یک process نرسه
+CACHE_TIMEOUT = 60 * 10
+
+MENU_TEMPLATE = 'store/partials/category_menu.html'
+
+
+_lock = threading.Lock()
+_local_tree = {'version': None, 'tree': None}
+# (tree, nodes) با هم عوض میشن تا threadها هیچ‌وقت نودهای درخت دیگه رو نبینن
+_local_nodes = {'entry': (None, None)}
+
+
+def get_version():
+    """
+    Return the current category tree version from the shared cache
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # a timestamp never collides with a version some worker still holds
+        cache.add(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """
+    Invalidate every cached copy of the tree (shared and per-worker)
+    """
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+
+
+def build_tree():
+    """
+    Build the whole category tree as plain dicts with a single query
+    """
+    rows = Category.objects.order_by('tree_id', 'lft').values('id', 'title', 'slug', 'parent_id')
+
+    nodes = {}
+    roots = []
+    for row in rows:
+        node = {
+            'pk': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'children': [],
+        }
+        nodes[row['id']] = node
+        # ترتیب tree_id/lft تضمین می‌کنه پدر همیشه قبل از فرزند میاد
+        parent = nodes.get(row['parent_id'])
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['children'].append(node)
+    return roots
+
+
+def get_tree():
+    """
+    Return the category tree, rebuilding it only when the version has changed
+    """
+    version = get_version()
+    if _local_tree['version'] == version:
+        return _local_tree['tree']
+
+    with _lock:
+        if _local_tree['version'] == version:
+            return _local_tree['tree']
+
+        tree_key = TREE_CACHE_KEY.format(version=version)
+        tree = cache.get(tree_key)
+        if tree is None:
+            # replica عقب‌افتاده نباید درخت قدیمی رو زیر version جدید کش کنه
+            with replica_reads(False):
+                tree = build_tree()
+            cache.set(tree_key, tree, CACHE_TIMEOUT)
+
+        _local_tree['tree'] = tree
+        _local_tree['version'] = version
+    return tree
+
+
+def get_nodes():
+    """
+    {pk: node} for every node of the cached tree, built once per tree version
+    """
+    tree = get_tree()
+    cached_tree, cached_nodes = _local_nodes['entry']
+    if cached_tree is tree:
+        return cached_nodes
+
+    nodes = {}
+
+    def walk(children):
+        for node in children:
+            nodes[node['pk']] = node
+            walk(node['children'])
+
+    walk(tree)
+    _local_nodes['entry'] = (tree, nodes)
+    return nodes
+
+
+def render_menu(language=None):
+    """
+    Return the rendered menu HTML fragment, cached per tree version and language
+    """
+    language = language or translation.get_language()
+    version = get_version()
+    menu_key = MENU_CACHE_KEY.format(version=version, language=language)
+
+    html = cache.get(menu_key)
+    if html is None:
+        with translation.override(language):
+            html = render_to_string(MENU_TEMPLATE, {'categories': get_tree(), 'level': 0})
+        cache.set(menu_key, html, CACHE_TIMEOUT)
+    return html
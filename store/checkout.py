@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cart, CartItem, Order, OrderItem, Product
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+class OutOfStock(CheckoutError):
+    def __init__(self, product_ids):
+        super().__init__(f'not enough stock for products {product_ids}')
+        self.product_ids = product_ids
+
+
+def reserve_inventory(lines):
+    """
+    Decrement stock with one conditional UPDATE per product. Rows are
+    locked in product id order, so concurrent checkouts never deadlock.
+    Raises OutOfStock (rolling back the caller's transaction) if any
+    product has less stock left than requested.
+    """
+    for product_id, quantity in sorted(lines.items()):
+        reserved = Product.objects.filter(
+            pk=product_id, is_active=True, inventory__gte=quantity,
+        ).update(inventory=F('inventory') - quantity, datetime_modified=timezone.now())
+        if not reserved:
+            raise OutOfStock([product_id])
+
+
+def place_order(cart_id, customer, order_notes=''):
+    """
+    Turn a cart into an order in a single transaction: reserve stock,
+    snapshot discounted unit prices into OrderItems and empty the cart
+    """
+    with transaction.atomic():
+        # دو بار کلیک روی «ثبت سفارش» نباید دو سفارش از یک سبد بسازه
+        list(Cart.objects.select_for_update().filter(pk=cart_id))
+        lines = dict(CartItem.objects.filter(cart_id=cart_id).values_list('product_id', 'quantity'))
+        if not lines:
+            raise EmptyCart()
+
+        reserve_inventory(lines)
+
+        # قیمت بعد از تخفیف، همون لحظه‌ی ثبت سفارش
+        prices = dict(Product.objects.filter(pk__in=lines).values_list('pk', 'effective_price'))
+        order = Order.objects.create(customer=customer, order_notes=order_notes)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+            for product_id, quantity in sorted(lines.items())
+        ])
+        CartItem.objects.filter(cart_id=cart_id).delete()
+    return order
@@ -0,0 +1,88 @@
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Category, Product, ProductCategoryClosure
+
+
+# تعداد محصول در هر دستور، تا از سقف پارامترهای sqlite رد نشیم
+CHUNK_SIZE = 500
+
+
+def get_closure_sql(product_filter=''):
+    """
+    INSERT ... SELECT that links every product to each ancestor (and self)
+    of each of its categories, using the MPTT tree_id/lft/rght ranges
+    """
+    return f'''
+        INSERT INTO {ProductCategoryClosure._meta.db_table} (product_id, category_id)
+        SELECT DISTINCT pc.product_id, ancestor.id
+        FROM {Product.categories.through._meta.db_table} pc
+        INNER JOIN {Category._meta.db_table} c ON c.id = pc.category_id
+        INNER JOIN {Category._meta.db_table} ancestor
+            ON ancestor.tree_id = c.tree_id AND ancestor.lft <= c.lft AND ancestor.rght >= c.rght
+        {product_filter}
+    '''
+
+
+def refresh_product_counts(category_ids=None):
+    """
+    Store the number of active products under each category in `Category.product_count`
+    """
+    counts = ProductCategoryClosure.objects.filter(
+        category=OuterRef('pk'), product__is_active=True,
+    ).order_by().values('category').annotate(count=Count('product')).values('count')
+
+    product_count = Coalesce(Subquery(counts), Value(0))
+    if category_ids is None:
+        Category.objects.update(product_count=product_count)
+        return
+
+    category_ids = list(category_ids)
+    for start in range(0, len(category_ids), CHUNK_SIZE):
+        chunk = category_ids[start:start + CHUNK_SIZE]
+        Category.objects.filter(pk__in=chunk).update(product_count=product_count)
+
+
+def rebuild_closure(product_ids=None):
+    """
+    Recompute closure rows for the given products (or for every product)
+    and refresh the counts of every category they were or are now under
+    """
+    with transaction.atomic():
+        if product_ids is None:
+            ProductCategoryClosure.objects.all().delete()
+            with connection.cursor() as cursor:
+                cursor.execute(get_closure_sql())
+            refresh_product_counts()
+            return
+
+        product_ids = list(product_ids)
+        affected = set()
+        for start in range(0, len(product_ids), CHUNK_SIZE):
+            chunk = product_ids[start:start + CHUNK_SIZE]
+            closure = ProductCategoryClosure.objects.filter(product_id__in=chunk)
+            affected.update(closure.values_list('category_id', flat=True).distinct())
+            closure.delete()
+
+            placeholders = ', '.join(['%s'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(get_closure_sql(f'WHERE pc.product_id IN ({placeholders})'), chunk)
+            affected.update(closure.values_list('category_id', flat=True).distinct())
+
+        if affected:
+            refresh_product_counts(affected)
+
+
+def rebuild_category_subtree(category_id):
+    """
+    Called after a category moves: only products under its subtree change ancestors
+    """
+    category = Category.objects.filter(pk=category_id).first()
+    if category is None:
+        return
+    subtree = category.get_descendants(include_self=True)
+    product_ids = Product.categories.through.objects.filter(
+        category__in=subtree,
+    ).values_list('product_id', flat=True).distinct()
+    rebuild_closure(product_ids)
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.routers import replica_reads
+
+from .models import Comment, Product
+from .pagination import CursorPaginator
+
+
+COMMENTS_PER_PAGE = 10
+COMMENT_ORDERING = ('-datetime_created', '-id')
+
+FIRST_PAGE_CACHE_KEY = 'store:comments:first:{product_id}'
+FIRST_PAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def approved_comments(product_id):
+    """
+    Approved comments of a product, newest first; served by the
+    (product, status, -datetime_created) index
+    """
+    return Comment.objects.filter(
+        product_id=product_id, status=Comment.COMMENT_STATUS_APPROVED,
+    ).select_related('user').order_by(*COMMENT_ORDERING)
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.id,
+        'author': comment.user.username if comment.user else comment.name,
+        'body': comment.body,
+        'datetime_created': comment.datetime_created,
+    }
+
+
+def get_comment_page(product_id, cursor=None):
+    """
+    One keyset page of approved comments: {'comments': [...], 'next_cursor': ...}.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    paginator = CursorPaginator(approved_comments(product_id), COMMENT_ORDERING, COMMENTS_PER_PAGE, exact_count=False)
+    page = paginator.page(cursor)
+    return {
+        'comments': [serialize_comment(comment) for comment in page],
+        'next_cursor': page.next_cursor,
+    }
+
+
+def get_first_page(product_id):
+    """
+    First page of approved comments, cached per product
+    """
+    key = FIRST_PAGE_CACHE_KEY.format(product_id=product_id)
+    page = cache.get(key)
+    if page is None:
+        # بعد از تأیید نظر، replica عقب‌افتاده نباید صفحه‌ی قدیمی رو کش کنه
+        with replica_reads(False):
+            page = get_comment_page(product_id)
+        cache.set(key, page, FIRST_PAGE_CACHE_TIMEOUT)
+    return page
+
+
+def refresh_products(product_ids):
+    """
+    Recount approved comments and drop the cached first pages of these products
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    counts = Comment.objects.filter(
+        product=OuterRef('pk'), status=Comment.COMMENT_STATUS_APPROVED,
+    ).order_by().values('product').annotate(count=Count('id')).values('count')
+    Product.objects.filter(pk__in=product_ids).update(approved_comment_count=Coalesce(Subquery(counts), Value(0)))
+    cache.delete_many([FIRST_PAGE_CACHE_KEY.format(product_id=product_id) for product_id in product_ids])
@@ -1,4 +1,13 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+
+from . import page_cache as store_page_cache
+from .cart import get_cart
 
 def cart(request):
-    return {'cart': Cart(request)}
+    # تا وقتی template به cart دست نزنه، session و دیتابیس خونده نمیشه
+    return {'cart': SimpleLazyObject(lambda: get_cart(request))}
+
+
+def page_cache(request):
+    # نسخه‌ی کش برای کلید {% cache %} ها؛ فقط وقتی template ازش استفاده کنه خونده میشه
+    return {'page_cache_version': SimpleLazyObject(store_page_cache.get_version)}
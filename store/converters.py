@@ -1,7 +1,10 @@
 # converters.py
-import re
 from django.utils.text import slugify
 
+# ی و ک عربی → فارسی؛ همین جدول توی جستجو هم استفاده میشه
+ARABIC_TO_PERSIAN_TABLE = str.maketrans({'ي': 'ی', 'ك': 'ک'})
+
+
 class UnicodeSlugConverter:
     # اجازه: حروف فارسی و انگلیسی + اعداد + خط تیره
     regex = r'[\w\u0600-\u06FF]+(?:-[\w\u0600-\u06FF]+)*'
@@ -14,8 +17,7 @@ class UnicodeSlugConverter:
         # حذف فاصله‌های اضافه
         value = value.strip()
         # نرمال‌سازی یکنواخت (ی فارسی، ک فارسی و ...)
-        value = re.sub(r'[ي]', 'ی', value)
-        value = re.sub(r'[ك]', 'ک', value)
+        value = value.translate(ARABIC_TO_PERSIAN_TABLE)
         return value
 
     def to_url(self, value):
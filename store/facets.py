@@ -0,0 +1,155 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max, Min, Q
+
+from core.routers import replica_reads
+
+from . import category_tree
+from .models import Category, Product
+from .search import normalize
+
+
+FACETS_CACHE_KEY = 'store:facets:{digest}'
+FACETS_CACHE_TIMEOUT = 60
+
+# مرز بازه‌های قیمت (تومان)؛ آخرین بازه باز است
+PRICE_BUCKETS = [0, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000]
+
+# پارامترهایی که روی نتیجه‌ی facet ها اثری ندارن
+IGNORED_PARAMS = {'page', 'cursor', 'sort'}
+
+
+def get_cache_key(params, scope=''):
+    """
+    Build a cache key from the filter params, ignoring order, paging and
+    persian spelling differences in `q`
+    """
+    items = []
+    for key in sorted(params):
+        if key in IGNORED_PARAMS:
+            continue
+        value = params[key].strip()
+        if key == 'q':
+            value = ' '.join(normalize(value).split())
+        if value:
+            items.append((key, value))
+    digest = hashlib.md5(f'{scope}?{urlencode(items)}'.encode()).hexdigest()
+    return FACETS_CACHE_KEY.format(digest=digest)
+
+
+def get_category_counts(queryset):
+    """
+    Count distinct products per category, rolled up the MPTT tree, in one query.
+    A product is counted once for every ancestor of any of its categories.
+    """
+    product_sql, product_params = queryset.order_by().values('pk').query.sql_with_params()
+    through_table = Product.categories.through._meta.db_table
+    category_table = Category._meta.db_table
+
+    sql = f'''
+        SELECT ancestor.id, COUNT(DISTINCT pc.product_id)
+        FROM {through_table} pc
+        INNER JOIN {category_table} c ON c.id = pc.category_id
+        INNER JOIN {category_table} ancestor
+            ON ancestor.tree_id = c.tree_id AND ancestor.lft <= c.lft AND ancestor.rght >= c.rght
+        WHERE pc.product_id IN ({product_sql})
+        GROUP BY ancestor.id
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, product_params)
+        return dict(cursor.fetchall())
+
+
+def get_price_and_stock(queryset):
+    """
+    Total, in-stock count, min/max price and the price histogram in one aggregate
+    """
+    buckets = list(zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None]))
+    aggregates = {
+        'total': Count('pk'),
+        'in_stock': Count('pk', filter=Q(inventory__gt=0)),
+        'min_price': Min('effective_price'),
+        'max_price': Max('effective_price'),
+    }
+    for i, (low, high) in enumerate(buckets):
+        condition = Q(effective_price__gte=low)
+        if high is not None:
+            condition &= Q(effective_price__lt=high)
+        aggregates[f'bucket_{i}'] = Count('pk', filter=condition)
+
+    # distinct() روی join دسته‌بندی‌ها با aggregate جور درنمیاد، پس با زیرکوئری فیلتر می‌کنیم
+    result = Product.objects.filter(pk__in=queryset.order_by().values('pk')).aggregate(**aggregates)
+
+    histogram = [
+        {'min': low, 'max': high, 'count': result.pop(f'bucket_{i}')}
+        for i, (low, high) in enumerate(buckets)
+    ]
+    return result, histogram
+
+
+def flatten_categories(counts):
+    """
+    Walk the cached category tree and keep only categories with results,
+    in tree order, with their full path for display
+    """
+    flat = []
+
+    def walk(nodes, path, level):
+        for node in nodes:
+            count = counts.get(node['pk'])
+            if not count:
+                continue
+            node_path = path + [node['title']]
+            flat.append({
+                'pk': node['pk'],
+                'title': node['title'],
+                'slug': node['slug'],
+                'path': node_path,
+                'level': level,
+                'count': count,
+            })
+            walk(node['children'], node_path, level + 1)
+
+    walk(category_tree.get_tree(), [], 0)
+    return flat
+
+
+def empty_facets():
+    buckets = zip(PRICE_BUCKETS, PRICE_BUCKETS[1:] + [None])
+    return {
+        'total': 0,
+        'in_stock': 0,
+        'min_price': None,
+        'max_price': None,
+        'categories': [],
+        'price_buckets': [{'min': low, 'max': high, 'count': 0} for low, high in buckets],
+    }
+
+
+def compute_facets(queryset):
+    # کوئری‌ست none() (مثلاً جستجوی بی‌نتیجه) SQL نداره و get_category_counts رو می‌شکنه
+    if queryset.query.is_empty():
+        return empty_facets()
+    summary, histogram = get_price_and_stock(queryset)
+    return {
+        **summary,
+        'categories': flatten_categories(get_category_counts(queryset)),
+        'price_buckets': histogram,
+    }
+
+
+def get_facets(queryset, params, scope=''):
+    """
+    Return category counts, price histogram and in-stock count for the
+    filtered queryset, cached per normalized query string
+    """
+    key = get_cache_key(params, scope)
+    facets = cache.get(key)
+    if facets is None:
+        with replica_reads(False):
+            facets = compute_facets(queryset)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
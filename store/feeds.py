@@ -0,0 +1,234 @@
+"""
+sitemap.xml and product feeds, written to STORE_FEED_ROOT by
+`manage.py build_feeds` and served by store.views.feed_file_view.
+
+Rows are streamed with `.iterator()` into gzip files, so memory use does
+not grow with the catalogue. Product sitemaps are sharded by id range
+(SITEMAP_SHARD_SIZE ids, so never more than 50,000 URLs each). A shard is
+only rewritten when the count or newest `datetime_modified` of its active
+products has changed since the last build.
+"""
+import csv
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.urls import reverse
+
+from .models import Category, Product
+
+
+# حداکثر تعداد URL هر فایل sitemap طبق پروتکل
+SITEMAP_SHARD_SIZE = 50_000
+CHUNK_SIZE = 2000
+
+SITEMAP_INDEX = 'sitemap.xml'
+PRODUCT_SHARD = 'sitemap-products-{shard}.xml.gz'
+CATEGORY_SHARD = 'sitemap-categories-{shard}.xml.gz'
+CSV_FEED = 'products.csv.gz'
+XML_FEED = 'products.xml.gz'
+MANIFEST = 'manifest.json'
+
+URLSET_OPEN = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+
+
+def get_root():
+    return Path(settings.STORE_FEED_ROOT)
+
+
+def absolute_url(path):
+    return settings.STORE_SITE_URL.rstrip('/') + path
+
+
+def get_feed_url(name):
+    return absolute_url(reverse('feed_file', kwargs={'name': name}))
+
+
+@contextmanager
+def open_feed(name, compress=True):
+    """
+    Write the file `name` in STORE_FEED_ROOT through a temporary file, so
+    readers only ever see a complete previous or new version
+    """
+    root = get_root()
+    root.mkdir(parents=True, exist_ok=True)
+    temporary = root / f'.{name}.tmp'
+    opener = gzip.open if compress else open
+    try:
+        with opener(temporary, 'wt', encoding='utf-8', newline='') as output:
+            yield output
+        os.replace(temporary, root / name)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def get_product_shards():
+    """
+    {shard number: signature} for every id range with active products,
+    from a single GROUP BY
+    """
+    rows = (
+        Product.objects.filter(is_active=True)
+        .annotate(shard=F('id') / SITEMAP_SHARD_SIZE)
+        .values('shard')
+        .annotate(count=Count('id'), modified=Max('datetime_modified'))
+        .order_by('shard')
+    )
+    return {row['shard']: f'{row["count"]}:{row["modified"].isoformat()}' for row in rows}
+
+
+def in_shard(queryset, shard):
+    return queryset.filter(id__gte=shard * SITEMAP_SHARD_SIZE, id__lt=(shard + 1) * SITEMAP_SHARD_SIZE)
+
+
+def write_product_shard(shard):
+    rows = in_shard(Product.objects.filter(is_active=True), shard).order_by('id').values_list('id', 'slug', 'datetime_modified')
+    with open_feed(PRODUCT_SHARD.format(shard=shard)) as output:
+        output.write(URLSET_OPEN)
+        for pk, slug, modified in rows.iterator(chunk_size=CHUNK_SIZE):
+            url = absolute_url(reverse('product_detail', kwargs={'pk': pk, 'slug': slug}))
+            output.write(f'<url><loc>{escape(url)}</loc><lastmod>{modified.isoformat(timespec="seconds")}</lastmod></url>\n')
+        output.write(URLSET_CLOSE)
+
+
+def write_category_shards():
+    """
+    Categories have no timestamp, so their (small) shards are rewritten on every build
+    """
+    names = []
+    shards = Category.objects.annotate(shard=F('id') / SITEMAP_SHARD_SIZE).values_list('shard', flat=True).distinct().order_by('shard')
+    for shard in shards:
+        name = CATEGORY_SHARD.format(shard=shard)
+        rows = in_shard(Category.objects.all(), shard).order_by('id').values_list('id', 'slug')
+        with open_feed(name) as output:
+            output.write(URLSET_OPEN)
+            for pk, slug in rows.iterator(chunk_size=CHUNK_SIZE):
+                url = absolute_url(reverse('category_detail', kwargs={'pk': pk, 'slug': slug}))
+                output.write(f'<url><loc>{escape(url)}</loc></url>\n')
+            output.write(URLSET_CLOSE)
+        names.append(name)
+    return names
+
+
+def write_sitemap_index(names, lastmods):
+    with open_feed(SITEMAP_INDEX, compress=False) as output:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for name in names:
+            lastmod = f'<lastmod>{lastmods[name]}</lastmod>' if lastmods.get(name) else ''
+            output.write(f'<sitemap><loc>{escape(get_feed_url(name))}</loc>{lastmod}</sitemap>\n')
+        output.write('</sitemapindex>\n')
+
+
+def iter_feed_products():
+    rows = Product.objects.filter(is_active=True).order_by('id').values_list(
+        'id', 'name', 'slug', 'short_description', 'unit_price', 'effective_price', 'inventory', 'cover',
+    )
+    for pk, name, slug, description, unit_price, effective_price, inventory, cover in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'id': pk,
+            'title': name,
+            'description': description,
+            'link': absolute_url(reverse('product_detail', kwargs={'pk': pk, 'slug': slug})),
+            'image_link': absolute_url(settings.MEDIA_URL + cover) if cover else '',
+            'unit_price': unit_price,
+            'effective_price': effective_price,
+            'in_stock': inventory > 0,
+        }
+
+
+def write_csv_feed():
+    """
+    Torob-style CSV: prices in toman, `old_price` only for discounted products
+    """
+    with open_feed(CSV_FEED) as output:
+        writer = csv.writer(output)
+        writer.writerow(['product_id', 'title', 'page_url', 'image_url', 'price', 'old_price', 'availability'])
+        for product in iter_feed_products():
+            discounted = product['effective_price'] < product['unit_price']
+            writer.writerow([
+                product['id'], product['title'], product['link'], product['image_link'],
+                product['effective_price'], product['unit_price'] if discounted else '',
+                'instock' if product['in_stock'] else 'outofstock',
+            ])
+
+
+def write_xml_feed():
+    """
+    Google Merchant RSS feed; prices are converted from toman to IRR (rial)
+    """
+    with open_feed(XML_FEED) as output:
+        output.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>\n'
+            f'<title>{escape(settings.STORE_FEED_TITLE)}</title><link>{escape(absolute_url("/"))}</link>\n'
+        )
+        for product in iter_feed_products():
+            sale_price = ''
+            if product['effective_price'] < product['unit_price']:
+                sale_price = f'<g:sale_price>{product["effective_price"] * 10} IRR</g:sale_price>'
+            image = f'<g:image_link>{escape(product["image_link"])}</g:image_link>' if product['image_link'] else ''
+            output.write(
+                f'<item><g:id>{product["id"]}</g:id><g:title>{escape(product["title"])}</g:title>'
+                f'<g:description>{escape(product["description"])}</g:description>'
+                f'<g:link>{escape(product["link"])}</g:link>{image}'
+                f'<g:availability>{"in_stock" if product["in_stock"] else "out_of_stock"}</g:availability>'
+                f'<g:price>{product["unit_price"] * 10} IRR</g:price>{sale_price}'
+                '<g:condition>new</g:condition></item>\n'
+            )
+        output.write('</channel></rss>\n')
+
+
+def load_manifest():
+    try:
+        with open(get_root() / MANIFEST, encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build(full=False):
+    """
+    Bring every file in STORE_FEED_ROOT up to date and return the names
+    that were (re)written. `full` ignores the previous build's manifest.
+    """
+    previous = {} if full else load_manifest()
+    root = get_root()
+    written = []
+
+    shards = get_product_shards()
+    signatures = {}
+    lastmods = {}
+    for shard, signature in shards.items():
+        name = PRODUCT_SHARD.format(shard=shard)
+        signatures[name] = signature
+        lastmods[name] = signature.split(':', 1)[1]
+        if previous.get('shards', {}).get(name) != signature or not (root / name).exists():
+            write_product_shard(shard)
+            written.append(name)
+    # id range هایی که دیگه محصول فعالی ندارن
+    for name in set(previous.get('shards', {})) - set(signatures):
+        (root / name).unlink(missing_ok=True)
+
+    category_names = write_category_shards()
+    written += category_names
+    for path in root.glob(CATEGORY_SHARD.format(shard='*')):
+        if path.name not in category_names:
+            path.unlink()
+    write_sitemap_index(category_names + list(signatures), lastmods)
+    written.append(SITEMAP_INDEX)
+
+    feed_signature = json.dumps(shards, sort_keys=True)
+    if previous.get('feeds') != feed_signature or not (root / CSV_FEED).exists() or not (root / XML_FEED).exists():
+        write_csv_feed()
+        write_xml_feed()
+        written += [CSV_FEED, XML_FEED]
+
+    with open_feed(MANIFEST, compress=False) as manifest:
+        json.dump({'shards': signatures, 'feeds': feed_signature}, manifest)
+    return written
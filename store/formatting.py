@@ -0,0 +1,105 @@
+"""
+Number, price and date formatting for Persian and English pages, used by
+the persian_translation_tags filters. Translation tables are built once
+and formatted prices are memoized, since listings format the same few
+hundred prices over and over.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+
+import jdatetime
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.utils import translation
+from django.utils.translation import gettext
+
+from .converters import ARABIC_TO_PERSIAN_TABLE
+
+
+ENGLISH_TO_PERSIAN_DIGITS = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
+# ارقام فارسی و عربی → انگلیسی
+TO_ENGLISH_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+PERSIAN_TEXT_TABLE = {**ARABIC_TO_PERSIAN_TABLE, **ENGLISH_TO_PERSIAN_DIGITS}
+
+# زبان‌هایی که ارقام فارسی می‌گیرن
+PERSIAN_DIGIT_LANGUAGES = {'fa'}
+DEFAULT_DATE_FORMAT = '%d %B %Y'
+CACHE_SIZE = 4096
+
+
+def uses_persian_digits(language=None):
+    language = language or translation.get_language() or ''
+    return language.split('-')[0] in PERSIAN_DIGIT_LANGUAGES
+
+
+def to_persian_digits(value):
+    return str(value).translate(ENGLISH_TO_PERSIAN_DIGITS)
+
+
+def to_english_digits(value):
+    return str(value).translate(TO_ENGLISH_DIGITS)
+
+
+def persian_text(value):
+    """
+    Persian ی/ک instead of the Arabic letters, and Persian digits
+    """
+    return str(value).translate(PERSIAN_TEXT_TABLE)
+
+
+def localize_digits(value, language=None):
+    value = str(value)
+    if uses_persian_digits(language):
+        return value.translate(ENGLISH_TO_PERSIAN_DIGITS)
+    return value.translate(TO_ENGLISH_DIGITS)
+
+
+def group_digits(value):
+    # همون خروجی intcomma:False، بدون regex برای int ها
+    if type(value) is int:
+        return f'{value:,}'
+    return intcomma(value, False)
+
+
+@lru_cache(maxsize=CACHE_SIZE, typed=True)
+def _format_price(value, language, currency):
+    text = localize_digits(group_digits(value), language)
+    if currency:
+        # gettext همون زبانی رو می‌بینه که کلید کش باهاش ساخته شده
+        text = f'{text} {gettext("$")}'
+    return text
+
+
+def format_number(value):
+    """
+    Thousands separators and digits of the active language ("۱۲,۵۰۰")
+    """
+    return format_price(value)
+
+
+def format_price(value, currency=False):
+    """
+    Thousands separators and digits of the active language in one pass,
+    optionally followed by the currency ("۱,۲۵۰,۰۰۰ تومان")
+    """
+    if value is None or value == '':
+        return ''
+    return _format_price(value, translation.get_language(), bool(currency))
+
+
+def format_jalali(value, format=DEFAULT_DATE_FORMAT, language=None):
+    """
+    Jalali date (month names and digits in the active language); `value`
+    should already be in local time
+    """
+    if value in (None, ''):
+        return ''
+    persian = uses_persian_digits(language)
+    locale = jdatetime.FA_LOCALE if persian else None
+    if isinstance(value, datetime):
+        value = jdatetime.datetime.fromgregorian(datetime=value, locale=locale)
+    elif isinstance(value, date):
+        value = jdatetime.date.fromgregorian(date=value, locale=locale)
+    else:
+        return ''
+    text = value.strftime(format)
+    return text.translate(ENGLISH_TO_PERSIAN_DIGITS) if persian else text
@@ -19,6 +19,14 @@ class CommentForm(forms.ModelForm):
 
 
 
+class CheckoutForm(forms.Form):
+    first_name = forms.CharField(max_length=150)
+    last_name = forms.CharField(max_length=150)
+    phone_number = forms.CharField(max_length=255)
+    full_address = forms.CharField(widget=forms.Textarea)
+    order_notes = forms.CharField(max_length=700, required=False, widget=forms.Textarea)
+
+
 class AddToCartProductForm(forms.Form):
     QUANTITY_CHOICES = [(i, str(i)) for i in range(1, 31)]
     quantity = forms.TypedChoiceField(choices=QUANTITY_CHOICES, coerce=int)
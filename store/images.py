@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps, features
+
+from core.tasks import task
+
+from . import page_cache
+from .models import Product
+
+
+WIDTHS = (160, 320, 640, 1280)
+# فرمت‌ها به ترتیب اولویت در <picture>؛ jpeg آخرین fallback هست
+FORMATS = {
+    'avif': {'format': 'AVIF', 'mime': 'image/avif', 'options': {'quality': 50}},
+    'webp': {'format': 'WEBP', 'mime': 'image/webp', 'options': {'quality': 75, 'method': 4}},
+    'jpeg': {'format': 'JPEG', 'mime': 'image/jpeg', 'options': {'quality': 80, 'optimize': True, 'progressive': True}},
+}
+DERIVATIVE_PATH = 'store/covers/derived/{digest}/{width}.{extension}'
+PLACEHOLDER_WIDTH = 16
+
+
+def get_formats():
+    # AVIF فقط وقتی Pillow با libavif ساخته شده باشه
+    return [name for name in FORMATS if name != 'avif' or features.check('avif')]
+
+
+def get_placeholder(image):
+    """
+    A tiny blurred JPEG as a data URI, shown while the real image loads
+    """
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    thumbnail = image.convert('RGB').resize((PLACEHOLDER_WIDTH, height)).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def save_derivative(image, path, extension):
+    # اسم فایل از hash محتوای اصلی میاد، پس اگه هست همونه و دوباره ساخته نمیشه
+    if default_storage.exists(path):
+        return path
+    if extension == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, FORMATS[extension]['format'], **FORMATS[extension]['options'])
+    saved = default_storage.save(path, ContentFile(buffer.getvalue()))
+    if saved != path:
+        # یه worker دیگه همزمان همین فایل رو ساخت؛ محتوا یکیه، پس کپی ما اضافه‌ست
+        default_storage.delete(saved)
+    return path
+
+
+def build_variants(name):
+    """
+    Generate every width/format derivative of a stored image.
+    Returns the fields to store on the product.
+    """
+    with default_storage.open(name, 'rb') as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()[:16]
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+
+    widths = [width for width in WIDTHS if width < image.width] + [min(image.width, WIDTHS[-1])]
+    formats = {}
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension in get_formats():
+            path = DERIVATIVE_PATH.format(digest=digest, width=width, extension=extension)
+            formats.setdefault(extension, {})[str(width)] = save_derivative(resized, path, extension)
+
+    return {
+        'cover_width': image.width,
+        'cover_height': image.height,
+        'cover_placeholder': get_placeholder(image),
+        'cover_variants': {'source': name, 'digest': digest, 'formats': formats},
+    }
+
+
+@task(priority=5)
+def process_cover(product_id):
+    """
+    Build the derivatives of a product cover and store them with `update()`,
+    so no save signals (search, caches) fire again
+    """
+    product = Product.objects.filter(pk=product_id).only('cover').first()
+    if product is None:
+        return False
+    if not product.cover:
+        fields = {'cover_width': None, 'cover_height': None, 'cover_placeholder': '', 'cover_variants': {}}
+    else:
+        fields = build_variants(product.cover.name)
+    # اگه همزمان کاور عوض شده باشه، این نتیجه قدیمیه و نوشته نمیشه
+    updated = Product.objects.filter(pk=product_id, cover=product.cover.name or '').update(**fields)
+    if updated:
+        page_cache.bump_version()
+    return bool(updated)
+
+
+def schedule_cover(product_id):
+    """
+    Queue the cover for the background workers (manage.py run_workers)
+    """
+    process_cover.delay(product_id)
+
+
+def needs_processing(product):
+    return (product.cover.name or '') != product.cover_variants.get('source', '')
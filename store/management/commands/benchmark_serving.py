@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.benchmarks import get_environment, write_report
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn (config/gunicorn.py) with each worker class in turn and drive it with '
+        'load_test: storefront pages and the read-only cart API. Reports throughput and latency '
+        'per worker class as JSON. The server uses the same settings and database as this command.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-classes', default='sync,gthread,uvicorn')
+        parser.add_argument('--workers', type=int, help='GUNICORN_WORKERS for every run (default: per class)')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--output', help='write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        cart = Cart.objects.filter(items__isnull=False).first()
+        if cart is None:
+            raise CommandError('No carts with items; run `manage.py seed_catalog` first')
+        scenarios = {
+            'pages': [],
+            'api': [
+                reverse('cart-detail', kwargs={'pk': cart.pk}),
+                reverse('cart-item-list', kwargs={'cart_pk': cart.pk}),
+            ],
+        }
+
+        results = []
+        for worker_class in options['worker_classes'].split(','):
+            server = self.start_server(worker_class.strip(), options)
+            try:
+                for scenario, paths in scenarios.items():
+                    load_options = {
+                        'url': f'http://127.0.0.1:{options["port"]}',
+                        'concurrency': options['concurrency'],
+                        'duration': options['duration'],
+                    }
+                    if paths:
+                        load_options['paths'] = paths
+                    output = io.StringIO()
+                    call_command('load_test', stdout=output, **load_options)
+                    report = json.loads(output.getvalue())
+                    results.append({
+                        'worker_class': worker_class,
+                        'scenario': scenario,
+                        **{key: report[key] for key in ('requests', 'errors', 'statuses', 'requests_per_second', 'latency')},
+                    })
+                    if options['verbosity'] >= 1:
+                        self.stderr.write(
+                            f'{worker_class:8} {scenario:6} {report["requests_per_second"]:>9} req/s '
+                            f'p50={report["latency"].get("p50_ms")}ms p99={report["latency"].get("p99_ms")}ms'
+                        )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        write_report({
+            'environment': get_environment(),
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'results': results,
+        }, options['output'], self.stdout)
+
+    def start_server(self, worker_class, options):
+        env = {
+            **os.environ,
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'GUNICORN_BIND': f'127.0.0.1:{options["port"]}',
+            'GUNICORN_ACCESS_LOG': '',
+            'GUNICORN_LOG_LEVEL': 'warning',
+            'DJANGO_ALLOWED_HOSTS': ','.join({*settings.ALLOWED_HOSTS, '127.0.0.1'}),
+        }
+        if options['workers']:
+            env['GUNICORN_WORKERS'] = str(options['workers'])
+        config = os.path.join(settings.BASE_DIR, 'config', 'gunicorn.py')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', config],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn ({worker_class}) exited with {server.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', options['port']), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'gunicorn ({worker_class}) did not start listening in 30s')
@@ -0,0 +1,189 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F
+from django.template import Context, Template
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmarks import compare_reports, get_environment, measure, write_report
+from store import category_tree, formatting
+from rest_framework.renderers import JSONRenderer
+
+from store.api.renderers import encode
+from store.api.serializers import CartItemSerializer, CartSerializer, ProductSerializer
+from store.api.values import CartItemValuesSerializer, ProductValuesSerializer
+from store.models import Cart, CartItem, Category, Comment, Product
+from store.pricing import with_cart_totals, with_item_totals
+
+
+# قیمت‌های یک لیست ۱۰۰۰ تایی، با زنجیره‌ی قدیمی فیلترها و با فیلتر price
+LISTING_SIZE = 1000
+LISTING_INTCOMMA = Template(
+    '{% load i18n humanize persian_translation_tags %}{% for product in products %}'
+    '{{ product.name }} {{ product.effective_price|intcomma:False|translate_number }} {% trans "$" %} '
+    '{{ product.unit_price|intcomma:False|translate_number }} {% trans "$" %}{% endfor %}'
+)
+LISTING_PRICE = Template(
+    '{% load persian_translation_tags %}{% for product in products %}'
+    '{{ product.name }} {{ product.effective_price|price:True }} {{ product.unit_price|price:True }}{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time storefront views, the cart API, serializers and the category menu in-process '
+        'against the current database (see seed_catalog), with query counts and latency '
+        'percentiles. "cold" runs clear the cache before every call, "warm" runs do not. '
+        'Prints JSON, or writes it to --output.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--modes', default='cold,warm', help='comma separated: cold, warm')
+        parser.add_argument('--only', help='run only benchmarks whose name contains this')
+        parser.add_argument('--output', help='write the JSON report to this file')
+        parser.add_argument('--compare', help='a previous JSON report to compare p50 latencies with')
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            raise CommandError('No products; run `manage.py seed_catalog` first')
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        # آدرسی بیرون از INTERNAL_IPS تا debug toolbar زمان‌ها رو خراب نکنه
+        self.client = Client(REMOTE_ADDR='203.0.113.10')
+        # هشدارهای N+1 هر درخواست، خروجی گزارش رو شلوغ می‌کنن؛ تعداد کوئری‌ها توی گزارش هست
+        query_logger = logging.getLogger('core.queries')
+        level = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+        try:
+            results = self.run_benchmarks(modes, options)
+        finally:
+            query_logger.setLevel(level)
+
+        report = {
+            'environment': get_environment(),
+            'data': {
+                'products': Product.objects.count(),
+                'categories': Category.objects.count(),
+                'comments': Comment.objects.count(),
+                'carts': Cart.objects.count(),
+            },
+            'results': results,
+        }
+        write_report(report, options['output'], self.stdout)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                rows = compare_reports(json.load(previous), report)
+            for name, before, after, ratio in rows:
+                change = f'{ratio:.2f}x' if ratio is not None else '-'
+                self.stderr.write(f'{name:45} {before:>10.3f} -> {after:>10.3f} ms  {change}')
+
+    def run_benchmarks(self, modes, options):
+        results = []
+        # Client با host «testserver» درخواست می‌فرسته
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, func in self.get_benchmarks():
+                if options['only'] and options['only'] not in name:
+                    continue
+                for mode in modes:
+                    setup = self.clear_caches if mode == 'cold' else None
+                    result = measure(func, repeat=options['repeat'], warmup=options['warmup'], setup=setup)
+                    results.append({'name': f'{name}:{mode}', **result})
+                    if options['verbosity'] >= 2:
+                        self.stderr.write(f'{name}:{mode} p50={result["p50_ms"]}ms queries={result["queries"]}')
+        return results
+
+    def clear_caches(self):
+        cache.clear()
+        # کپی درخت دسته‌ها توی حافظه‌ی همین process هم باید خالی بشه
+        category_tree._local_tree.update(version=None, tree=None)
+        formatting._format_price.cache_clear()
+
+    def get(self, path, data=None):
+        def request():
+            response = self.client.get(path, data)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            # پاسخ‌های DRF تا وقتی content خونده نشه render نمیشن
+            response.getvalue()
+        return request
+
+    def get_benchmarks(self):
+        products = Product.objects.filter(is_active=True)
+        product = products.order_by('-approved_comment_count', 'id').first()
+        root = Category.objects.root_nodes().order_by('-product_count').first()
+        leaf = Category.objects.filter(rght=F('lft') + 1).order_by('-product_count').first()
+        cart = Cart.objects.annotate(lines=Count('items')).order_by('-lines').first()
+        word = product.name.split()[0]
+
+        benchmarks = [
+            ('view:home', self.get(reverse('home_page'))),
+            ('view:category_list', self.get(reverse('category_list'))),
+            ('view:product_list', self.get(reverse('product_list'))),
+            ('view:product_list_by_price', self.get(reverse('product_list'), {'sort': 'price'})),
+            ('view:product_detail', self.get(product.get_absolute_url())),
+            ('view:search', self.get(reverse('search_results'), {'q': word})),
+            ('view:search_price_range', self.get(reverse('search_results'), {'min_price': 100000, 'max_price': 1000000, 'sort': '-price'})),
+            ('menu:render', category_tree.render_menu),
+            ('api:product_list', self.get(reverse('product-list'), {'format': 'json'})),
+            ('api:product_export', self.get(reverse('product-export'), {'format': 'json', 'fields': 'id,name,effective_price'})),
+            ('serializer:products_drf', self.serialize_products),
+            ('serializer:products_values', self.serialize_product_values),
+            ('render:drf_json', lambda: JSONRenderer().render(self.product_data)),
+            ('render:fast_json', lambda: encode(self.product_data)),
+            ('render:listing_intcomma', lambda: self.render_listing(LISTING_INTCOMMA)),
+            ('render:listing_price', lambda: self.render_listing(LISTING_PRICE)),
+        ]
+        if root:
+            benchmarks.append(('view:category_detail_root', self.get(root.get_absolute_url())))
+        if leaf:
+            benchmarks.append(('view:category_detail_leaf', self.get(leaf.get_absolute_url())))
+        if cart:
+            benchmarks += [
+                ('api:cart_detail', self.get(reverse('cart-detail', kwargs={'pk': cart.pk}))),
+                ('api:cart_items', self.get(reverse('cart-item-list', kwargs={'cart_pk': cart.pk}))),
+                ('serializer:carts', self.serialize_carts),
+                ('serializer:cart_items_drf', self.serialize_cart_items),
+                ('serializer:cart_items_values', self.serialize_cart_item_values),
+            ]
+        return benchmarks
+
+    def render_listing(self, template):
+        if not hasattr(self, '_listing'):
+            self._listing = list(Product.objects.order_by('id').values('name', 'effective_price', 'unit_price')[:LISTING_SIZE])
+        return template.render(Context({'products': self._listing}))
+
+    def serialize_carts(self):
+        carts = with_cart_totals(Cart.objects.order_by('created_at'))[:50]
+        return CartSerializer(carts, many=True).data
+
+    # همون چند صد ردیفی که یک لیست بزرگ API برمی‌گردونه، با ModelSerializer و با ValuesSerializer
+    LIST_SIZE = 500
+
+    @property
+    def product_data(self):
+        if not hasattr(self, '_product_data'):
+            self._product_data = self.serialize_product_values()
+        return self._product_data
+
+    def serialize_products(self):
+        products = Product.objects.order_by('id').prefetch_related('categories', 'discounts')[:self.LIST_SIZE]
+        return ProductSerializer(products, many=True).data
+
+    def serialize_product_values(self):
+        serializer = ProductValuesSerializer()
+        return serializer.serialize(serializer.values(Product.objects.order_by('id'))[:self.LIST_SIZE])
+
+    def serialize_cart_items(self):
+        items = with_item_totals(CartItem.objects.order_by('id'))[:self.LIST_SIZE]
+        return CartItemSerializer(items, many=True).data
+
+    def serialize_cart_item_values(self):
+        serializer = CartItemValuesSerializer()
+        return serializer.serialize(serializer.values(with_item_totals(CartItem.objects.order_by('id')))[:self.LIST_SIZE])
+
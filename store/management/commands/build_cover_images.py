@@ -0,0 +1,53 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from store import page_cache
+from store.images import process_cover
+from store.models import Product
+
+
+def _process(product_id):
+    try:
+        return product_id, process_cover(product_id), None
+    except Exception as exc:  # noqa: BLE001
+        return product_id, False, str(exc)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Build resized AVIF/WebP/JPEG derivatives and placeholders for product covers, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--all', action='store_true', help='rebuild covers that already have derivatives too')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(cover='')
+        if not options['all']:
+            products = products.filter(cover_width__isnull=True)
+        product_ids = list(products.values_list('pk', flat=True))
+
+        started = time.monotonic()
+        failed = 0
+        # process های فرزند connection خودشون رو باز می‌کنن
+        connections.close_all()
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as executor:
+            futures = [executor.submit(_process, product_id) for product_id in product_ids]
+            for future in as_completed(futures):
+                product_id, _updated, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'product {product_id}: {error}')
+
+        # کش محلی هر process جداست، پس نسخه اینجا هم بالا میره
+        page_cache.bump_version()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(product_ids) - failed} covers processed, {failed} failed, in {elapsed:.1f}s'
+        ))
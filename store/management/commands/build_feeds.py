@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import feeds
+
+
+class Command(BaseCommand):
+    help = (
+        'Write sitemap.xml (sharded, gzipped) and the product feeds to STORE_FEED_ROOT. '
+        'Only sitemap shards whose products changed since the last run are rewritten, '
+        'so it is cheap to run from cron every few minutes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='rewrite every file, ignoring the previous build')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = feeds.build(full=options['full'])
+        if options['verbosity'] >= 2:
+            for name in written:
+                self.stdout.write(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(written)} files written to {feeds.get_root()} in {time.monotonic() - started:.1f}s'
+        ))
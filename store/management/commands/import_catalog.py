@@ -0,0 +1,241 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store import category_tree, page_cache
+from store.category_paths import rebuild_category_paths
+from store.closure import rebuild_closure
+from store.models import Category, Product
+from store.search import get_backend
+
+
+PATH_SEPARATOR = '>'
+CSV_LIST_SEPARATOR = '|'
+
+PRODUCT_FIELDS = ['name', 'slug', 'unit_price', 'description', 'short_description', 'inventory', 'is_active']
+# فیلدهایی که موقع اعتبارسنجی ردیف‌ها بررسی نمیشن (یا خودمون پرشون می‌کنیم)
+VALIDATION_EXCLUDE = ['slug', 'categories', 'discounts', 'cover', 'search_vector']
+
+
+def split_path(path):
+    return tuple(part.strip() for part in path.split(PATH_SEPARATOR) if part.strip())
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a JSON Lines or CSV catalogue feed into categories and products. '
+        'Category trees come from "a > b > c" paths and are built with one MPTT rebuild; '
+        'products are written in batches with bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='feed file (.jsonl/.ndjson or .csv)')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help='checkpoint file, defaults to <path>.checkpoint')
+        parser.add_argument('--resume', action='store_true', help='skip records already imported according to the checkpoint')
+
+    def handle(self, *args, **options):
+        self.path = options['path']
+        if not os.path.exists(self.path):
+            raise CommandError(f'{self.path} does not exist')
+        self.format = options['format'] or ('csv' if self.path.endswith('.csv') else 'jsonl')
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.checkpoint_path = options['checkpoint'] or f'{self.path}.checkpoint'
+
+        start_at = self.read_checkpoint() if options['resume'] else 0
+        self.stats = {'records': 0, 'products': 0, 'categories': 0, 'skipped': 0, 'invalid': 0}
+        started = time.monotonic()
+
+        # مرحله‌ی ۱: همه‌ی مسیرهای دسته‌بندی و ساخت درخت با یک rebuild
+        category_ids = self.import_categories()
+
+        # مرحله‌ی ۲: محصولات به صورت دسته‌ای
+        records = islice(self.read_records(), start_at, None)
+        position = start_at
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            self.import_products(batch, category_ids)
+            position += len(batch)
+            self.write_checkpoint(position)
+            self.report_progress(position, started)
+
+        # bulk_create سیگنال نمی‌فرسته؛ closure هر دسته همون‌جا ساخته شده، کش‌ها یک‌جا باطل میشن
+        category_tree.bump_version()
+        page_cache.bump_version()
+
+        elapsed = time.monotonic() - started
+        self.stats['records'] = position - start_at
+        rate = self.stats['records'] / elapsed if elapsed else 0
+        self.stdout.write(json.dumps({**self.stats, 'seconds': round(elapsed, 2), 'records_per_second': round(rate, 1)}))
+        self.stdout.write(self.style.SUCCESS('Catalogue imported'))
+
+    # ------------------------------------------------------------------ input
+
+    def read_records(self):
+        with open(self.path, encoding='utf-8', newline='') as feed:
+            if self.format == 'csv':
+                for row in csv.DictReader(feed):
+                    if row.get('categories') is not None:
+                        row['categories'] = [path for path in row['categories'].split(CSV_LIST_SEPARATOR) if path.strip()]
+                    yield row
+            else:
+                for line in feed:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        record = None
+                    # خط خراب هم یک رکورد حساب میشه تا موقعیت checkpoint ها عوض نشه
+                    yield record if isinstance(record, dict) else None
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as checkpoint:
+                return json.load(checkpoint)['position']
+        except (FileNotFoundError, KeyError, ValueError):
+            return 0
+
+    def write_checkpoint(self, position):
+        temporary_path = f'{self.checkpoint_path}.tmp'
+        with open(temporary_path, 'w') as checkpoint:
+            json.dump({'path': self.path, 'position': position}, checkpoint)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def report_progress(self, position, started):
+        if self.verbosity < 2:
+            return
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{position} records, {self.stats["products"]} products, {elapsed:.1f}s')
+
+    # ------------------------------------------------------------ categories
+
+    def import_categories(self):
+        """
+        Create every category path mentioned in the feed and return {path: id}
+        """
+        descriptions = {}
+        for record in self.read_records():
+            if record is None:
+                continue
+            if record.get('type') == 'category':
+                path = split_path(record['path'])
+                descriptions[path] = record.get('description', '')
+            for category_path in record.get('categories') or []:
+                descriptions.setdefault(split_path(category_path), '')
+
+        # همه‌ی پدرها هم باید وجود داشته باشن
+        for path in list(descriptions):
+            for depth in range(1, len(path)):
+                descriptions.setdefault(path[:depth], '')
+
+        category_ids = self.get_existing_paths()
+        missing = sorted((path for path in descriptions if path and path not in category_ids), key=len)
+        if not missing:
+            return category_ids
+
+        with transaction.atomic():
+            # هر سطح بعد از سطح پدرش ساخته میشه تا id پدر معلوم باشه
+            for depth in sorted({len(path) for path in missing}):
+                level = [path for path in missing if len(path) == depth]
+                categories = Category.generate_slugs([
+                    Category(
+                        title=path[-1],
+                        description=descriptions[path],
+                        parent_id=category_ids.get(path[:-1]),
+                        # مقادیر درخت بعداً با rebuild درست میشن
+                        tree_id=0, lft=0, rght=0, level=0,
+                    )
+                    for path in level
+                ])
+                created = Category.objects.bulk_create(categories, batch_size=self.batch_size)
+                for path, category in zip(level, created):
+                    category_ids[path] = category.pk
+            Category.objects.rebuild()
+            # rebuild سیگنال post_save نمی‌فرسته
+            rebuild_category_paths()
+
+        self.stats['categories'] = len(missing)
+        return category_ids
+
+    def get_existing_paths(self):
+        paths = {}
+        titles = {}
+        for category_id, parent_id, title in Category.objects.order_by('tree_id', 'lft').values_list('id', 'parent_id', 'title'):
+            path = titles.get(parent_id, ()) + (title,)
+            titles[category_id] = path
+            paths[path] = category_id
+        return paths
+
+    # -------------------------------------------------------------- products
+
+    def build_product(self, record):
+        values = {field: record[field] for field in PRODUCT_FIELDS if record.get(field) not in (None, '')}
+        if isinstance(values.get('is_active'), str):
+            values['is_active'] = values['is_active'].strip().lower() in ('1', 'true', 'yes')
+        product = Product(**values)
+        # محصول‌های واردشده تخفیفی ندارن
+        product.effective_price = product.unit_price
+        product.full_clean(exclude=VALIDATION_EXCLUDE, validate_unique=False, validate_constraints=False)
+        return product
+
+    def import_products(self, batch, category_ids):
+        explicit_slugs = [record['slug'] for record in batch if record and record.get('slug')]
+        seen_slugs = set(Product.objects.filter(slug__in=explicit_slugs).values_list('slug', flat=True))
+        products = []
+        product_categories = []
+        for record in batch:
+            if record is None:
+                # JSON خراب
+                self.stats['invalid'] += 1
+                continue
+            if record.get('type') == 'category':
+                continue
+            try:
+                product = self.build_product(record)
+            except (ValidationError, TypeError, ValueError) as exc:
+                self.stats['invalid'] += 1
+                if self.verbosity >= 2:
+                    self.stderr.write(f'invalid record {record.get("name")!r}: {exc}')
+                continue
+
+            if product.slug:
+                if product.slug in seen_slugs:
+                    # این محصول قبلاً وارد شده (مثلاً اجرای قبلی بدون checkpoint)
+                    self.stats['skipped'] += 1
+                    continue
+                seen_slugs.add(product.slug)
+
+            products.append(product)
+            product_categories.append([
+                category_ids[split_path(path)] for path in record.get('categories') or [] if split_path(path)
+            ])
+
+        if not products:
+            return
+        Product.generate_slugs(products)
+
+        through = Product.categories.through
+        with transaction.atomic():
+            created = Product.objects.bulk_create(products, batch_size=self.batch_size)
+            through.objects.bulk_create([
+                through(product_id=product.pk, category_id=category_id)
+                for product, categories in zip(created, product_categories)
+                for category_id in set(categories)
+            ], batch_size=self.batch_size, ignore_conflicts=True)
+            # فقط closure و تعداد دسته‌های همین محصولات
+            rebuild_closure([product.pk for product in created])
+            get_backend().update_products(created)
+
+        self.stats['products'] += len(created)
@@ -0,0 +1,115 @@
+import http.client
+import itertools
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.benchmarks import get_environment, summarize, write_report
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'HTTP load driver: keep --concurrency connections busy against a running server '
+        '(e.g. `gunicorn -c config/gunicorn.py` on the same database) for --duration seconds and report '
+        'throughput and latency percentiles as JSON. Without --path it requests a mix of '
+        'storefront pages picked from the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='server base URL')
+        parser.add_argument('--path', action='append', dest='paths', help='path to request, repeatable')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+        parser.add_argument('--warmup', type=float, default=1.0, help='seconds of untimed requests first')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        # text/html باعث میشه DRF نسخه‌ی browsable API رو render کنه
+        parser.add_argument('--accept', default='*/*', help='Accept header sent with every request')
+        parser.add_argument('--output', help='write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        target = urlsplit(options['url'])
+        if target.scheme not in ('http', 'https'):
+            raise CommandError('--url must be an http(s) URL')
+        self.target = target
+        self.timeout = options['timeout']
+        self.accept = options['accept']
+        paths = options['paths'] or self.get_default_paths()
+
+        self.run(paths, options['concurrency'], options['warmup'])
+        samples, statuses, errors, elapsed = self.run(paths, options['concurrency'], options['duration'])
+
+        total = sum(len(path_samples) for path_samples in samples.values())
+        report = {
+            'environment': get_environment(),
+            'target': options['url'],
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 3),
+            'requests': total,
+            'errors': errors,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'requests_per_second': round(total / elapsed, 2) if elapsed else 0,
+            'latency': summarize(list(itertools.chain.from_iterable(samples.values()))),
+            'paths': {path: summarize(path_samples) for path, path_samples in sorted(samples.items())},
+        }
+        write_report(report, options['output'], self.stdout)
+
+    def get_default_paths(self):
+        products = Product.objects.filter(is_active=True).order_by('-approved_comment_count', 'id')[:20]
+        categories = Category.objects.order_by('-product_count', 'id')[:5]
+        word = products[0].name.split()[0] if products else 'a'
+        return [
+            reverse('home_page'),
+            reverse('product_list'),
+            f'{reverse("product_list")}?sort=price',
+            f'{reverse("search_results")}?q={word}',
+            *(category.get_absolute_url() for category in categories),
+            *(product.get_absolute_url() for product in products),
+        ]
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.target.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.target.hostname, self.target.port, timeout=self.timeout)
+
+    def run(self, paths, concurrency, duration):
+        samples = defaultdict(list)
+        statuses = Counter()
+        errors = Counter()
+        lock = threading.Lock()
+        prefix = self.target.path.rstrip('/')
+        deadline = time.monotonic() + duration
+
+        def worker(offset):
+            # هر thread یک connection keep-alive و ترتیب مسیر متفاوت
+            connection = self.connect()
+            for path in itertools.islice(itertools.cycle(paths), offset, None):
+                if time.monotonic() >= deadline:
+                    break
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', prefix + path, headers={'Accept': self.accept})
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as exc:
+                    connection.close()
+                    connection = self.connect()
+                    with lock:
+                        errors[type(exc).__name__] += 1
+                    continue
+                latency = time.perf_counter() - started
+                with lock:
+                    samples[path].append(latency)
+                    statuses[response.status] += 1
+            connection.close()
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, statuses, dict(errors), time.monotonic() - started
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.closure import rebuild_closure
+
+
+class Command(BaseCommand):
+    help = 'Recompute the product/category closure table and per-category product counts'
+
+    def handle(self, *args, **options):
+        rebuild_closure()
+        self.stdout.write(self.style.SUCCESS('Category closure rebuilt'))
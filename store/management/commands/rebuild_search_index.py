@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from store.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Re-index every product for the configured search backend'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt ({backend.__class__.__name__})'))
@@ -0,0 +1,159 @@
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store import comments, page_cache, pricing
+from store.models import Cart, CartItem, Comment, Discount, Product
+
+
+WORDS = [
+    'cotton', 'linen', 'silk', 'wool', 'denim', 'leather', 'summer', 'winter', 'classic', 'slim',
+    'shirt', 'dress', 'skirt', 'jacket', 'scarf', 'coat', 'blouse', 'trousers', 'hoodie', 'sweater',
+    'blue', 'black', 'white', 'red', 'green', 'beige', 'striped', 'floral', 'oversized', 'vintage',
+]
+
+
+def chunks(items, size):
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic catalogue for benchmarks: a category tree of the given depth '
+        'and breadth, products (through import_catalog), discounts, comments and carts. '
+        'The same --seed always produces the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--depth', type=int, default=3, help='category tree depth (deep trees: 6-10)')
+        parser.add_argument('--breadth', type=int, default=5, help='children per category (wide trees: 50+)')
+        parser.add_argument('--categories-per-product', type=int, default=2)
+        parser.add_argument('--discounts', type=int, default=10)
+        parser.add_argument('--discounted-share', type=float, default=0.3, help='share of products with a discount')
+        parser.add_argument('--comments', type=int, default=5, help='comments per product, on average')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--carts', type=int, default=100)
+        parser.add_argument('--cart-items', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+        stats = {}
+
+        leaves = self.build_category_paths(options['depth'], options['breadth'])
+        before = set(Product.objects.values_list('pk', flat=True))
+        self.import_products(options['products'], leaves, options['categories_per_product'])
+        product_ids = sorted(set(Product.objects.values_list('pk', flat=True)) - before)
+        stats['categories'] = sum(options['breadth'] ** depth for depth in range(1, options['depth'] + 1))
+        stats['products'] = len(product_ids)
+
+        stats['discounted_products'] = self.create_discounts(product_ids, options['discounts'], options['discounted_share'])
+        stats['comments'] = self.create_comments(product_ids, options['comments'], options['users'], options['seed'])
+        stats['cart_items'] = self.create_carts(product_ids, options['carts'], options['cart_items'])
+        page_cache.bump_version()
+
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        self.stdout.write(json.dumps(stats))
+
+    def build_category_paths(self, depth, breadth):
+        """
+        Leaf paths ("category 1 > category 1.2 > ...") of a full tree
+        """
+        leaves = [()]
+        for _level in range(depth):
+            leaves = [numbers + (child,) for numbers in leaves for child in range(1, breadth + 1)]
+        return [
+            ' > '.join('category ' + '.'.join(map(str, numbers[:level])) for level in range(1, len(numbers) + 1))
+            for numbers in leaves
+        ]
+
+    def import_products(self, count, leaves, categories_per_product):
+        # محصول‌ها از همون مسیر import_catalog ساخته میشن (slug، closure، ایندکس جستجو)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.jsonl')
+            with open(path, 'w', encoding='utf-8') as feed:
+                for i in range(count):
+                    words = self.random.sample(WORDS, 3)
+                    feed.write(json.dumps({
+                        'name': f'{" ".join(words)} {i}',
+                        'unit_price': self.random.randrange(50, 5000) * 1000,
+                        'inventory': self.random.randrange(0, 100),
+                        'short_description': ' '.join(self.random.choices(WORDS, k=12)),
+                        'description': ' '.join(self.random.choices(WORDS, k=80)),
+                        'categories': self.random.sample(leaves, min(categories_per_product, len(leaves))),
+                    }) + '\n')
+            call_command('import_catalog', path, batch_size=self.batch_size, verbosity=0, stdout=io.StringIO())
+
+    def create_discounts(self, product_ids, count, share):
+        if not count or not product_ids:
+            return 0
+        discounts = Discount.objects.bulk_create([
+            Discount(discount=self.random.choice([5, 10, 15, 20, 30, 50]), description=f'benchmark {i}')
+            for i in range(count)
+        ])
+        discounted = self.random.sample(product_ids, int(len(product_ids) * share))
+        through = Product.discounts.through
+        with transaction.atomic():
+            for batch in chunks(discounted, self.batch_size):
+                through.objects.bulk_create([
+                    through(product_id=product_id, discount_id=self.random.choice(discounts).pk)
+                    for product_id in batch
+                ], ignore_conflicts=True)
+                pricing.refresh_effective_prices(batch)
+        return len(discounted)
+
+    def create_comments(self, product_ids, per_product, user_count, seed):
+        if not per_product or not product_ids:
+            return 0
+        User = get_user_model()
+        usernames = [f'bench-{seed}-{i}' for i in range(user_count)]
+        User.objects.bulk_create([User(username=username, password='!') for username in usernames], ignore_conflicts=True)
+        user_ids = list(User.objects.filter(username__in=usernames).values_list('pk', flat=True))
+
+        statuses = [Comment.COMMENT_STATUS_APPROVED] * 7 + [Comment.COMMENT_STATUS_WAITING] * 2 + [Comment.COMMENT_STATUS_NOT_APPROVED]
+        created = 0
+        for batch in chunks(product_ids, self.batch_size):
+            rows = [
+                Comment(
+                    product_id=product_id,
+                    user_id=self.random.choice(user_ids),
+                    name='benchmark',
+                    body=' '.join(self.random.choices(WORDS, k=20)),
+                    status=self.random.choice(statuses),
+                )
+                for product_id in batch
+                for _ in range(self.random.randint(0, 2 * per_product))
+            ]
+            with transaction.atomic():
+                Comment.objects.bulk_create(rows, batch_size=self.batch_size)
+                comments.refresh_products(batch)
+            created += len(rows)
+        return created
+
+    def create_carts(self, product_ids, count, items_per_cart):
+        if not count or not product_ids:
+            return 0
+        with transaction.atomic():
+            carts = Cart.objects.bulk_create([Cart() for _ in range(count)], batch_size=self.batch_size)
+            items = [
+                CartItem(cart=cart, product_id=product_id, quantity=self.random.randint(1, 3))
+                for cart in carts
+                for product_id in self.random.sample(product_ids, min(items_per_cart, len(product_ids)))
+            ]
+            CartItem.objects.bulk_create(items, batch_size=self.batch_size)
+        return len(items)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:55
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_INDEX_NAME = 'store_product_search_vector_gin'
+
+
+def create_search_index(apps, schema_editor):
+    # GIN فقط روی postgres وجود داره؛ روی sqlite جستجو با ایندکس داخل حافظه انجام میشه
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON store_product USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_closure(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+    Product = apps.get_model('store', 'Product')
+    ProductCategoryClosure = apps.get_model('store', 'ProductCategoryClosure')
+
+    closure_table = ProductCategoryClosure._meta.db_table
+    category_table = Category._meta.db_table
+    through_table = Product.categories.through._meta.db_table
+    product_table = Product._meta.db_table
+
+    schema_editor.execute(f'''
+        INSERT INTO {closure_table} (product_id, category_id)
+        SELECT DISTINCT pc.product_id, ancestor.id
+        FROM {through_table} pc
+        INNER JOIN {category_table} c ON c.id = pc.category_id
+        INNER JOIN {category_table} ancestor
+            ON ancestor.tree_id = c.tree_id AND ancestor.lft <= c.lft AND ancestor.rght >= c.rght
+    ''')
+    schema_editor.execute(f'''
+        UPDATE {category_table} SET product_count = (
+            SELECT COUNT(*) FROM {closure_table} pcc
+            INNER JOIN {product_table} p ON p.id = pcc.product_id
+            WHERE pcc.category_id = {category_table}.id AND p.is_active
+        )
+    ''')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ProductCategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_closure', to='store.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_closure', to='store.product')),
+            ],
+            options={
+                'unique_together': {('category', 'product')},
+            },
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
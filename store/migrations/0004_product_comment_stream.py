@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_approved_comment_count(apps, schema_editor):
+    Comment = apps.get_model('store', 'Comment')
+    Product = apps.get_model('store', 'Product')
+
+    counts = Comment.objects.filter(
+        product=OuterRef('pk'), status='a',
+    ).order_by().values('product').annotate(count=Count('id')).values('count')
+    Product.objects.update(approved_comment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_product_category_closure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='store_comme_product_65ca19_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', 'status', '-datetime_created', '-id'], name='store_comment_product_stream'),
+        ),
+        migrations.RunPython(populate_approved_comment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_comment_stream'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover_height',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='cover_placeholder',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='cover_width',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
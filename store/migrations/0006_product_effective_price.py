@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:18
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Least, Round
+
+
+def populate_effective_price(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+
+    discounts = Product.discounts.through.objects.filter(
+        product_id=OuterRef('pk'),
+    ).order_by().values('product_id').annotate(total=Sum('discount__discount')).values('total')
+    percent = Least(Coalesce(Subquery(discounts, output_field=FloatField()), Value(0.0)), Value(100.0))
+    Product.objects.update(effective_price=Cast(
+        Round(F('unit_price') * (Value(100.0) - percent) / Value(100.0)),
+        IntegerField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_product_cover_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'effective_price', 'id'], name='store_product_price'),
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('store', 'Category')
+
+    paths = {}
+    categories = list(Category.objects.order_by('tree_id', 'lft').only('id', 'title', 'parent_id'))
+    for category in categories:
+        parent_path, parent_ids = paths.get(category.parent_id, ('', ''))
+        category.full_path = f'{parent_path}>{category.title}' if parent_path else category.title
+        category.path_ids = f'{parent_ids}/{category.pk}' if parent_ids else str(category.pk)
+        paths[category.pk] = (category.full_path, category.path_ids)
+    Category.objects.bulk_update(categories, ['full_path', 'path_ids'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='full_path',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path_ids',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,8 @@ from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.urls import reverse
 
+from django.contrib.postgres.search import SearchVectorField
+
 from mptt.models import MPTTModel, TreeForeignKey
 from ckeditor.fields import RichTextField
 # from django.utils.text import slugify
@@ -21,6 +23,11 @@ class Category(GenerateSlugMixin, MPTTModel):
     description = models.CharField(max_length=255)
     parent = TreeForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='children', db_index=True)
     top_product = models.ForeignKey('Product', on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    # تعداد محصولات فعال در کل زیردرخت؛ توسط store.closure به‌روز میشه
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    # مسیر کامل و id اجداد (خودش آخر)؛ توسط store.category_paths به‌روز میشن
+    full_path = models.TextField(blank=True, default='', editable=False)
+    path_ids = models.TextField(blank=True, default='', editable=False)
     
     class MPTTMeta:
         order_insertion_by = ['title']
@@ -39,7 +46,11 @@ class Category(GenerateSlugMixin, MPTTModel):
         return self.title
     
     def get_full_path(self):
-        return ">".join(a.title for a in self.get_ancestors(include_self=True))
+        return self.full_path or ">".join(a.title for a in self.get_ancestors(include_self=True))
+    
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path_ids.split('/')[:-1]]
     
     
     def get_absolute_url(self):
@@ -70,11 +81,33 @@ class Product(GenerateSlugMixin, models.Model):
     discounts = models.ManyToManyField(Discount, blank=True)
     is_active = models.BooleanField(default=True)
     cover = models.ImageField(upload_to='store/covers/', blank=True)
+    # با store.images بعد از آپلود پر میشن
+    cover_width = models.PositiveIntegerField(null=True, editable=False)
+    cover_height = models.PositiveIntegerField(null=True, editable=False)
+    cover_placeholder = models.TextField(blank=True, editable=False)
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # فقط روی postgres پر میشه (store.search.PostgresSearchBackend)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # با store.comments.refresh_products به‌روز میشه
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # قیمت نهایی بعد از تخفیف‌ها؛ با store.pricing.refresh_effective_prices به‌روز میشه
+    effective_price = models.PositiveIntegerField(default=0, editable=False)
     
+    class Meta:
+        indexes = [
+            # فیلتر بازه‌ی قیمت و مرتب‌سازی keyset روی قیمت نهایی
+            models.Index(fields=['is_active', 'effective_price', 'id'], name='store_product_price'),
+        ]
     
     def __str__(self) -> str:
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # store.signals فقط وقتی is_active عوض شده تعداد محصولات دسته‌ها رو دوباره حساب می‌کنه
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
     
     def get_absolute_url(self):
         return reverse("product_detail", kwargs={'pk': self.pk, 'slug': self.slug})
@@ -82,7 +115,20 @@ class Product(GenerateSlugMixin, models.Model):
     
     @property
     def approved_comments(self):
-        return list(self.comments.filter(status='a').select_related('user')) # type: ignore
+        return self.comments.filter(status=Comment.COMMENT_STATUS_APPROVED).select_related('user').order_by('-datetime_created', '-id') # type: ignore
+    
+
+class ProductCategoryClosure(models.Model):
+    """
+    One row per product and each ancestor (and self) of its categories,
+    so "products under this subtree" is a single indexed lookup.
+    Maintained by store.closure, never edited by hand.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='category_closure')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='product_closure')
+    
+    class Meta:
+        unique_together = [['category', 'product']]
     
 
 class Customer(models.Model):
@@ -166,7 +212,8 @@ class Comment(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['product']),
+            # صفحه‌بندی keyset نظرهای تأییدشده‌ی یک محصول
+            models.Index(fields=['product', 'status', '-datetime_created', '-id'], name='store_comment_product_stream'),
             models.Index(fields=['status'])
         ]
         
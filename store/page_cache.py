@@ -0,0 +1,185 @@
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+
+from core.routers import replica_reads
+
+from .cart import get_cart
+from .models import CartItem
+
+
+VERSION_CACHE_KEY = 'store:pages:version'
+PAGE_CACHE_KEY = 'store:pages:{version}:{language}:{cart}:{path}'
+LOCK_CACHE_KEY = '{key}:lock'
+
+# بعد از این مدت صفحه کهنه حساب میشه، ولی تا GRACE_PERIOD دیگه هنوز قابل سرو کردنه
+PAGE_TIMEOUT = getattr(settings, 'STORE_PAGE_CACHE_TIMEOUT', 60 * 5)
+GRACE_PERIOD = 60
+# حداکثر زمانی که یک worker برای ساختن دوباره‌ی صفحه قفل رو نگه میداره
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2
+LOCK_POLL_INTERVAL = 0.05
+
+CSRF_PLACEHOLDER = '__store_page_cache_csrf__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_version():
+    """
+    Current page cache version; every cached page and fragment is keyed by it
+    """
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_version():
+    """
+    Invalidate every cached page and fragment at once
+    """
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+
+
+def get_cart_state(request):
+    """
+    Pages include the mini cart, so they vary by the exact cart contents.
+    Anonymous visitors without a cart (the common case) cost no query.
+    """
+    cart = get_cart(request)
+    if not cart.cart_id or not cart.summary['count']:
+        return 'empty'
+    lines = CartItem.objects.filter(cart_id=cart.cart_id).order_by('product_id').values_list('product_id', 'quantity')
+    return hashlib.md5(repr((cart.summary, list(lines))).encode()).hexdigest()
+
+
+def get_cache_key(request):
+    return PAGE_CACHE_KEY.format(
+        version=get_version(),
+        language=translation.get_language(),
+        cart=get_cart_state(request),
+        path=hashlib.md5(request.get_full_path().encode()).hexdigest(),
+    )
+
+
+def is_cacheable_request(request):
+    return request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+
+
+def is_cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # صفحه‌ای که پیام‌های flash همین کاربر رو نشون داده نباید کش بشه
+    return not getattr(messages.get_messages(request), 'used', False)
+
+
+def acquire_lock(key):
+    # فقط با redis/memcached اتمیکه؛ با کش فایلی چند worker ممکنه با هم صفحه رو بسازن
+    return cache.add(LOCK_CACHE_KEY.format(key=key), 1, timeout=LOCK_TIMEOUT)
+
+
+def release_lock(key):
+    cache.delete(LOCK_CACHE_KEY.format(key=key))
+
+
+def wait_for_page(key):
+    """
+    Another worker is rendering this page; wait a little for its result
+    """
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def store_page(key, response):
+    content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+    headers = {name: value for name, value in response.items() if name.lower() != 'content-length'}
+    entry = {
+        'expires': time.time() + PAGE_TIMEOUT,
+        'content': content,
+        'headers': headers,
+    }
+    cache.set(key, entry, PAGE_TIMEOUT + GRACE_PERIOD)
+
+
+def build_response(request, entry):
+    # هر بازدیدکننده توکن CSRF خودش رو می‌گیره
+    content = entry['content'].replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content)
+    for name, value in entry['headers'].items():
+        response[name] = value
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def rows_key(rows, *fields):
+    """
+    Digest of the given fields of the rows a fragment shows, so a fragment
+    rendered from replica rows is never served for fresher rows
+    """
+    values = [tuple(getattr(row, name) for name in fields) for row in rows]
+    return hashlib.md5(repr(values).encode()).hexdigest()
+
+
+def render_response(response):
+    # TemplateResponse کوئری‌های قالب رو موقع render اجرا می‌کنه
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    return response
+
+
+class CachedPageMixin:
+    """
+    Serve rendered pages to anonymous visitors from the cache.
+
+    Pages are keyed by URL, language and cart contents, and invalidated by
+    bumping the version (see store.signals). When a page goes stale one
+    worker re-renders it while the others keep serving the stale copy; when
+    it is missing altogether the others wait briefly for that worker.
+    Pages that are about to be cached are rendered from the primary
+    database, so a lagging replica cannot get stale data cached under a new
+    version; uncached renders (logged-in users) use the router as usual.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            # قطعه‌ها خودشون موقع پر شدن از primary خونده میشن ({% fragment_cache %})
+            return super().dispatch(request, *args, **kwargs)
+
+        key = get_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and entry['expires'] > time.time():
+            return build_response(request, entry)
+
+        locked = acquire_lock(key)
+        if not locked:
+            if entry is None:
+                entry = wait_for_page(key)
+            if entry is not None:
+                return build_response(request, entry)
+
+        try:
+            # صفحه زیر version جدید ذخیره میشه، پس از primary ساخته میشه نه replica عقب‌افتاده
+            with replica_reads(False):
+                response = render_response(super().dispatch(request, *args, **kwargs))
+            if is_cacheable_response(request, response):
+                store_page(key, response)
+        finally:
+            if locked:
+                release_lock(key)
+        return response
@@ -0,0 +1,208 @@
+import base64
+import binascii
+import datetime
+import json
+from functools import cached_property
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.translation import gettext_lazy as _
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder میکروثانیه رو کوتاه می‌کنه و مقایسه‌ی keyset خراب میشه
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate instead of running COUNT(*).
+    Unfiltered querysets read `pg_class.reltuples`, filtered ones use the
+    EXPLAIN estimate. Other databases fall back to an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # reltuples قبل از اولین ANALYZE مقدار -1 داره
+            if row and row[0] >= 0:
+                return row[0]
+            return queryset.count()
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over a fixed ordering such as ('-datetime_created', '-id').
+    The last ordering field must be unique so every row has a distinct position.
+    Cursors are opaque base64 strings holding the boundary row's ordering values.
+    """
+
+    def __init__(self, queryset, ordering, per_page, exact_count=True):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+        self.exact_count = exact_count
+
+    @cached_property
+    def count(self):
+        queryset = self.queryset.order_by()
+        return queryset.count() if self.exact_count else estimate_count(queryset)
+
+    def get_fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, obj, reverse):
+        # ردیف‌های values() دیکشنری هستن
+        values = [obj[field] if isinstance(obj, dict) else getattr(obj, field) for field, _ in self.get_fields()]
+        data = json.dumps([1 if reverse else 0, values], cls=CursorJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            reverse, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise InvalidCursor(cursor)
+
+        fields = self.get_fields()
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise InvalidCursor(cursor)
+
+        # مقدارها از JSON به نوع فیلد (مثلاً datetime) برمی‌گردن
+        model_meta = self.queryset.model._meta
+        position = []
+        for (field, _), value in zip(fields, values):
+            try:
+                position.append(model_meta.get_field(field).to_python(value))
+            except FieldDoesNotExist:
+                # annotation ها (مثل search_rank) فیلد مدل ندارن
+                position.append(value)
+            except ValidationError:
+                raise InvalidCursor(cursor)
+        return bool(reverse), position
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        (a, b) > (x, y)  →  a > x OR (a = x AND b > y), per field direction
+        """
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.get_fields(), position):
+            # در جهت برعکس (صفحه‌ی قبل) مقایسه هم برعکس میشه
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def page(self, cursor=None):
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            reverse, position = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.get_keyset_filter(position, reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+        # یک ردیف اضافه می‌گیریم تا بدون COUNT بفهمیم صفحه‌ی بعد هست یا نه
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], reverse=False)
+            if cursor and (has_more or not reverse):
+                previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Replace ListView's OFFSET pagination with keyset pagination.
+    `?sort=` picks one of `sort_options`, `?cursor=` the page.
+    """
+    cursor_ordering = ('-datetime_created', '-id')
+    sort_options = {
+        'newest': ('-datetime_created', '-id'),
+        'oldest': ('datetime_created', 'id'),
+        'price': ('effective_price', 'id'),
+        '-price': ('-effective_price', '-id'),
+    }
+    exact_count = True
+
+    def get_cursor_ordering(self):
+        return self.sort_options.get(self.request.GET.get('sort'), self.cursor_ordering)
+
+    def get_exact_count(self):
+        return self.exact_count
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(
+            queryset,
+            self.get_cursor_ordering(),
+            page_size,
+            exact_count=self.get_exact_count(),
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404(_('Invalid cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
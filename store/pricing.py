@@ -0,0 +1,71 @@
+from django.db.models import F, FloatField, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Least, Round
+from django.utils import timezone
+
+from .models import CartItem, Product
+
+
+def discount_percent(product_ref='pk'):
+    """
+    Total discount percentage of a product. Discounts stack additively
+    (10% + 15% = 25%, not 23.5%) and are capped at 100%.
+    """
+    discounts = Product.discounts.through.objects.filter(
+        product_id=OuterRef(product_ref),
+    ).order_by().values('product_id').annotate(total=Sum('discount__discount')).values('total')
+    return Least(
+        Coalesce(Subquery(discounts, output_field=FloatField()), Value(0.0)),
+        Value(100.0),
+    )
+
+
+def discounted_price(price_ref='unit_price', product_ref='pk'):
+    """
+    Unit price after discounts, rounded to a whole toman
+    """
+    return Cast(
+        Round(F(price_ref) * (Value(100.0) - discount_percent(product_ref)) / Value(100.0)),
+        IntegerField(),
+    )
+
+
+def refresh_effective_prices(product_ids=None):
+    """
+    Recompute the materialized `Product.effective_price` with one UPDATE,
+    for the given products or the whole catalog. Only rows whose price
+    actually changes are written (and get a new `datetime_modified`).
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    price = discounted_price()
+    return products.exclude(effective_price=price).update(effective_price=price, datetime_modified=timezone.now())
+
+
+def cart_item_total():
+    return F('quantity') * F('product__effective_price')
+
+
+def with_item_totals(queryset):
+    """
+    Annotate CartItems with `unit_price_after_discount` and `item_total`
+    """
+    return queryset.select_related('product').annotate(
+        unit_price_after_discount=F('product__effective_price'),
+        item_total=F('quantity') * F('unit_price_after_discount'),
+    )
+
+
+def with_cart_totals(queryset):
+    """
+    Annotate Carts with `total_price` and prefetch annotated items:
+    one query for the carts and one for all their items
+    """
+    totals = CartItem.objects.filter(
+        cart_id=OuterRef('pk'),
+    ).order_by().values('cart_id').annotate(total=Sum(cart_item_total())).values('total')
+    return queryset.annotate(
+        total_price=Coalesce(Subquery(totals, output_field=IntegerField()), Value(0)),
+    ).prefetch_related(
+        Prefetch('items', queryset=with_item_totals(CartItem.objects.order_by('id'))),
+    )
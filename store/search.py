@@ -0,0 +1,375 @@
+import bisect
+import heapq
+import html
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from core.routers import replica_reads
+
+from .converters import ARABIC_TO_PERSIAN_TABLE
+from .models import Product
+
+
+# ارقام فارسی و عربی → انگلیسی، نیم‌فاصله → فاصله
+SEARCH_NORMALIZE_TABLE = {
+    **ARABIC_TO_PERSIAN_TABLE,
+    **str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789'),
+    **str.maketrans({'\u200c': ' ', '\u200f': None, '\u200e': None, '\u0640': None}),
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+# وزن فیلدها در رتبه‌بندی: نام > توضیح کوتاه > توضیحات
+FIELD_WEIGHTS = (
+    ('name', 'A', 1.0),
+    ('short_description', 'B', 0.4),
+    ('description', 'C', 0.1),
+)
+
+
+def normalize(text):
+    """
+    Normalize persian text the same way for documents and queries
+    """
+    return (text or '').translate(SEARCH_NORMALIZE_TABLE).lower().strip()
+
+
+def strip_html(text):
+    """
+    Remove CKEditor markup and entities from a rich text field
+    """
+    return html.unescape(strip_tags(text or ''))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def get_document(name, short_description, description):
+    """
+    Return the normalized searchable text of a product, per field
+    """
+    return {
+        'name': normalize(name),
+        'short_description': normalize(short_description),
+        'description': normalize(strip_html(description)),
+    }
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        """
+        Filter the queryset down to products matching the query,
+        annotated with `search_rank` and ordered by it
+        """
+        raise NotImplementedError
+
+    def update_product(self, product):
+        """
+        Called after a product is saved
+        """
+
+    def update_products(self, products):
+        """
+        Index many products at once (bulk imports skip post_save)
+        """
+        for product in products:
+            self.update_product(product)
+
+    def remove_product(self, product):
+        """
+        Called after a product is deleted
+        """
+
+    def rebuild(self):
+        """
+        Re-index every product
+        """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Stored `Product.search_vector` column with a GIN index.
+    The `simple` config is used because postgres has no persian dictionary;
+    normalization happens in python before the text reaches the database.
+    """
+    config = 'simple'
+    batch_size = 500
+
+    def get_vector(self, document):
+        vector = None
+        for field, weight, _ in FIELD_WEIGHTS:
+            part = SearchVector(Value(document[field]), weight=weight, config=self.config)
+            vector = part if vector is None else vector + part
+        return vector
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(normalize(query), config=self.config, search_type='websearch')
+        # ts_rank یک float4 برمی‌گردونه؛ cursor اون رو به صورت float8 برمی‌گردونه و مقایسه‌ی دقیق خراب میشه
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        ).order_by('-search_rank', '-id')
+
+    def update_product(self, product):
+        document = get_document(product.name, product.short_description, product.description)
+        Product.objects.filter(pk=product.pk).update(search_vector=self.get_vector(document))
+
+    def update_products(self, products):
+        products = list(products)
+        for product in products:
+            document = get_document(product.name, product.short_description, product.description)
+            product.search_vector = self.get_vector(document)
+        Product.objects.bulk_update(products, ['search_vector'], batch_size=self.batch_size)
+
+    def rebuild(self):
+        products = Product.objects.only('id', 'name', 'short_description', 'description')
+        batch = []
+        for product in products.iterator(chunk_size=self.batch_size):
+            batch.append(product)
+            if len(batch) == self.batch_size:
+                self.update_products(batch)
+                batch = []
+        if batch:
+            self.update_products(batch)
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Inverted index kept in process memory, for SQLite and tests.
+    Saved and deleted products are logged per version in the shared cache;
+    each worker re-reads only those products when the version changes, and
+    rebuilds the whole index when it is too far behind or the log expired.
+    Only the best `max_results` hits are returned.
+    """
+    version_cache_key = 'store:search_index:version'
+    changes_cache_key = 'store:search_index:changes:{version}'
+    # worker ای که بیشتر از این عقب باشه کل index رو از نو می‌سازه
+    changes_timeout = 60 * 60
+    max_pending_versions = 1000
+    # زیر سقف ۹۹۹ پارامتر نسخه‌های قدیمی sqlite
+    max_results = 400
+    chunk_size = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        # (index, documents, terms) با هم عوض میشن تا جستجوهای همزمان نیمه‌کاره نبینن
+        self._state = ({}, {}, [])
+
+    def get_version(self):
+        version = cache.get(self.version_cache_key)
+        if version is None:
+            cache.add(self.version_cache_key, int(time.time() * 1000), timeout=None)
+            version = cache.get(self.version_cache_key)
+        return version
+
+    def bump_version(self):
+        try:
+            cache.incr(self.version_cache_key)
+        except ValueError:
+            cache.set(self.version_cache_key, int(time.time() * 1000), timeout=None)
+
+    def log_changes(self, product_ids):
+        """
+        Bump the version and record which products it changed
+        """
+        try:
+            version = cache.incr(self.version_cache_key)
+        except ValueError:
+            # بدون version قبلی همه‌ی worker ها index رو از نو می‌سازن
+            cache.set(self.version_cache_key, int(time.time() * 1000), timeout=None)
+            return
+        cache.set(self.changes_cache_key.format(version=version), product_ids, self.changes_timeout)
+
+    def get_changes(self, version):
+        """
+        Ids of the products changed since the local index, or None when
+        some of the log is missing and the index has to be rebuilt
+        """
+        if self._version is None or not 0 < version - self._version <= self.max_pending_versions:
+            return None
+        keys = [self.changes_cache_key.format(version=v) for v in range(self._version + 1, version + 1)]
+        logged = cache.get_many(keys)
+        if len(logged) != len(keys):
+            return None
+        return {product_id for product_ids in logged.values() for product_id in product_ids}
+
+    def get_documents(self, product_ids=None):
+        """
+        {product id: {token: weight}} for the given (or every) product
+        """
+        rows = Product.objects.values_list('id', 'name', 'short_description', 'description')
+        if product_ids is None:
+            chunks = [rows]
+        else:
+            product_ids = sorted(product_ids)
+            chunks = [
+                rows.filter(pk__in=product_ids[start:start + self.chunk_size])
+                for start in range(0, len(product_ids), self.chunk_size)
+            ]
+        documents = {}
+        for chunk in chunks:
+            for product_id, name, short_description, description in chunk.iterator():
+                document = get_document(name, short_description, description)
+                weights = defaultdict(float)
+                for field, _, weight in FIELD_WEIGHTS:
+                    for token in TOKEN_RE.findall(document[field]):
+                        weights[token] += weight
+                documents[product_id] = dict(weights)
+        return documents
+
+    def build_index(self):
+        documents = self.get_documents()
+        index = defaultdict(dict)
+        for product_id, weights in documents.items():
+            for token, weight in weights.items():
+                index[token][product_id] = weight
+        return dict(index), documents
+
+    def apply_changes(self, product_ids):
+        """
+        Re-index only the changed products, copying just the postings they touch
+        """
+        index, documents, terms = self._state
+        fresh = self.get_documents(product_ids)
+        index, documents = dict(index), dict(documents)
+        copied = set()
+        new_terms = False
+
+        def postings(token):
+            nonlocal new_terms
+            if token not in copied:
+                new_terms = new_terms or token not in index
+                index[token] = dict(index.get(token, ()))
+                copied.add(token)
+            return index[token]
+
+        for product_id in product_ids:
+            for token in documents.pop(product_id, {}):
+                postings(token).pop(product_id, None)
+            weights = fresh.get(product_id)
+            if weights is not None:
+                documents[product_id] = weights
+                for token, weight in weights.items():
+                    postings(token)[product_id] = weight
+
+        empty = [token for token in copied if not index[token]]
+        for token in empty:
+            del index[token]
+        # فهرست مرتب کلمات فقط وقتی کلمه‌ای اضافه یا حذف شده دوباره ساخته میشه
+        if new_terms or empty:
+            terms = sorted(index)
+        return index, documents, terms
+
+    def get_index(self):
+        version = self.get_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    changes = self.get_changes(version)
+                    with replica_reads(False):
+                        if changes is None:
+                            index, documents = self.build_index()
+                            self._state = (index, documents, sorted(index))
+                        else:
+                            self._state = self.apply_changes(changes)
+                    self._version = version
+        index, _documents, terms = self._state
+        return index, terms
+
+    def get_token_scores(self, index, terms, token):
+        scores = defaultdict(float)
+        # کلمه‌ی ناقص (مثلاً «گوش» برای «گوشی») هم پیدا بشه، با امتیاز کمتر
+        position = bisect.bisect_left(terms, token)
+        while position < len(terms) and terms[position].startswith(token):
+            term = terms[position]
+            factor = 1.0 if term == token else 0.5
+            for product_id, weight in index[term].items():
+                scores[product_id] += weight * factor
+            position += 1
+        return scores
+
+    def get_scores(self, query):
+        index, terms = self.get_index()
+        scores = None
+        for token in tokenize(query):
+            token_scores = self.get_token_scores(index, terms, token)
+            if scores is None:
+                scores = token_scores
+            else:
+                # همه‌ی کلمات باید پیدا بشن، مثل websearch در postgres
+                scores = {
+                    product_id: score + token_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in token_scores
+                }
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(self, queryset, query):
+        scores = self.get_scores(query)
+        if not scores:
+            # ترتیب cursor ها روی search_rank هست، حتی برای نتیجه‌ی خالی
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        # هر نتیجه دو پارامتر SQL داره؛ فقط بهترین‌ها، به همون ترتیب (-search_rank, -id)
+        hits = heapq.nlargest(self.max_results, scores.items(), key=lambda hit: (hit[1], hit[0]))
+        rank = Case(
+            *[When(pk=product_id, then=Value(score)) for product_id, score in hits],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=[product_id for product_id, _ in hits]).annotate(
+            search_rank=rank,
+        ).order_by('-search_rank', '-id')
+
+    def update_products(self, products):
+        product_ids = [product.pk for product in products]
+        # بعد از commit، تا worker های دیگه ردیف‌های ذخیره‌شده رو بخونن
+        transaction.on_commit(lambda: self.log_changes(product_ids))
+
+    def update_product(self, product):
+        self.update_products([product])
+
+    def remove_product(self, product):
+        self.update_products([product])
+
+    def rebuild(self):
+        self.bump_version()
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Return the configured search backend (`STORE_SEARCH_BACKEND`),
+    falling back to postgres full-text search or the in-memory index
+    """
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'STORE_SEARCH_BACKEND', '')
+        if backend_path:
+            _backend = import_string(backend_path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = InMemorySearchBackend()
+    return _backend
+
+
+def search_products(queryset, query):
+    return get_backend().search(queryset, query)
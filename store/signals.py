@@ -0,0 +1,194 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from mptt.signals import node_moved
+
+from django.core.cache import cache
+
+from . import category_paths, category_tree, closure, comments, images, page_cache, pricing, search
+from .cart import SUMMARY_CACHE_KEY, invalidate_cart_summary
+from .models import CartItem, Category, Comment, Discount, Product, ProductCategoryClosure
+
+
+@receiver(post_save, sender=Category)
+def update_category_paths(sender, instance, raw=False, **kwargs):
+    # جابه‌جایی با move_node هم save رو صدا می‌زنه؛ زیردرخت با یک UPDATE درست میشه
+    if not raw:
+        category_paths.refresh_category_paths(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    category_tree.bump_version()
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    search.get_backend().update_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def process_product_cover(sender, instance, **kwargs):
+    if images.needs_processing(instance):
+        images.schedule_cover(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.get_backend().remove_product(instance)
+
+
+def touch_products(product_ids):
+    # update() و جدول‌های واسط datetime_modified رو عوض نمی‌کنن؛ ETag های API از روی اون ساخته میشن
+    Product.objects.filter(pk__in=list(product_ids)).update(datetime_modified=timezone.now())
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def update_category_closure(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # بعد از clear دیگه نمی‌دونیم کدوم محصول‌ها توی این دسته بودن
+        instance._closure_product_ids = list(instance.products.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = instance.__dict__.pop('_closure_product_ids', [])
+    else:
+        product_ids = pk_set
+    closure.rebuild_closure(product_ids)
+    touch_products(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_category_product_counts(sender, instance, created, update_fields, **kwargs):
+    # فقط is_active روی تعداد محصولات دسته‌ها اثر داره؛ تغییر دسته‌ها با m2m_changed حساب میشه
+    if created or (update_fields is not None and 'is_active' not in update_fields):
+        return
+    loaded = instance.__dict__.get('_loaded_is_active')
+    instance._loaded_is_active = instance.is_active
+    # نمونه‌ای که از دیتابیس خونده نشده، مقدار قبلیش معلوم نیست
+    if loaded is not None and loaded == instance.is_active:
+        return
+    category_ids = ProductCategoryClosure.objects.filter(product=instance).values_list('category_id', flat=True)
+    closure.refresh_product_counts(category_ids)
+
+
+@receiver(pre_delete, sender=Product)
+def refresh_deleted_product_counts(sender, instance, **kwargs):
+    # ردیف‌های closure با محصول حذف میشن، پس دسته‌ها قبل از حذف خونده میشن
+    category_ids = list(ProductCategoryClosure.objects.filter(product=instance).values_list('category_id', flat=True))
+    if category_ids:
+        transaction.on_commit(lambda: closure.refresh_product_counts(category_ids))
+
+
+@receiver(node_moved, sender=Category)
+def rebuild_moved_subtree_closure(sender, instance, **kwargs):
+    # mptt این سیگنال رو وسط save می‌فرسته؛ بعد از commit درخت کامل ذخیره شده
+    transaction.on_commit(lambda: closure.rebuild_category_subtree(instance.pk))
+
+
+@receiver(pre_delete, sender=Category)
+def rebuild_deleted_category_closure(sender, instance, **kwargs):
+    product_ids = list(instance.product_closure.values_list('product_id', flat=True))
+    if product_ids:
+        transaction.on_commit(lambda: closure.rebuild_closure(product_ids))
+        transaction.on_commit(lambda: touch_products(product_ids))
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_item_summary(sender, instance, **kwargs):
+    # تغییرات API هم شمارنده‌ی navbar رو باطل می‌کنن
+    invalidate_cart_summary(instance.cart_id)
+
+
+def invalidate_cart_summaries(product_ids):
+    cart_ids = CartItem.objects.filter(product_id__in=product_ids).values_list('cart_id', flat=True).distinct()
+    cache.delete_many([SUMMARY_CACHE_KEY.format(cart_id=cart_id) for cart_id in cart_ids])
+
+
+def refresh_prices(product_ids):
+    # اول قیمت نهایی، بعد خلاصه‌ی سبدهایی که از روی اون حساب شدن
+    pricing.refresh_effective_prices(product_ids)
+    invalidate_cart_summaries(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_price(sender, instance, created, update_fields, **kwargs):
+    if update_fields is not None and 'unit_price' not in update_fields:
+        return
+    if created:
+        # محصول تازه هنوز تخفیف و سبدی نداره
+        if instance.effective_price != instance.unit_price:
+            instance.effective_price = instance.unit_price
+            Product.objects.filter(pk=instance.pk).update(effective_price=instance.unit_price)
+        return
+    refresh_prices([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.discounts.through)
+def refresh_discounted_prices(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._price_product_ids = list(instance.product_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = instance.__dict__.pop('_price_product_ids', [])
+    else:
+        product_ids = pk_set
+    touch_products(product_ids)
+    refresh_prices(product_ids)
+
+
+@receiver(post_save, sender=Discount)
+def refresh_discount_prices(sender, instance, **kwargs):
+    refresh_prices(list(instance.product_set.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=Discount)
+def remember_discount_products(sender, instance, **kwargs):
+    # بعد از حذف، ردیف‌های جدول واسط هم رفتن
+    instance._price_product_ids = list(instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Discount)
+def refresh_deleted_discount_prices(sender, instance, **kwargs):
+    refresh_prices(instance.__dict__.pop('_price_product_ids', []))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def refresh_product_comments(sender, instance, **kwargs):
+    # تأیید یا ویرایش نظر در ادمین، شمارنده و صفحه‌ی اول کش‌شده رو به‌روز می‌کنه
+    comments.refresh_products([instance.product_id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_cached_pages(sender, **kwargs):
+    page_cache.bump_version()
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.discounts.through)
+def invalidate_cached_pages_on_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        page_cache.bump_version()
@@ -17,17 +17,49 @@
 
 
 from django import template
-from store.models import Category
-from mptt.utils import get_cached_trees
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from store import category_tree
 
 register = template.Library()
 
-@register.inclusion_tag('store/partials/category_menu.html', takes_context=True)
-def show_category_tree(context):
-    categories = Category.objects.all().select_related('parent').order_by('tree_id','lft')
-    tree = get_cached_trees(categories)
-    return {
-        'categories': tree,
-        'request': context['request'],
-        'level': 0,
-    }
+@register.simple_tag
+def show_category_tree():
+    # درخت و HTML منو بر اساس version کش میشن؛ فقط بعد از تغییر دسته‌بندی‌ها دوباره ساخته میشن
+    return mark_safe(category_tree.render_menu())
+
+
+def get_crumbs(category):
+    """
+    (title, url) of each ancestor and `category`, from its stored path_ids
+    and the cached tree, without touching the database
+    """
+    nodes = category_tree.get_nodes()
+    crumbs = []
+    for pk in category.path_ids.split('/') if category.path_ids else [category.pk]:
+        node = nodes.get(int(pk))
+        if node is None:
+            # درخت کش‌شده هنوز این دسته رو نداره
+            return [(category.full_path or category.title, category.get_absolute_url())]
+        crumbs.append((node['title'], reverse('category_detail', kwargs={'pk': node['pk'], 'slug': node['slug']})))
+    return crumbs
+
+
+def get_primary_category(product):
+    # عمیق‌ترین دسته‌ی محصول؛ product.categories باید prefetch شده باشه
+    categories = list(product.categories.all())
+    if not categories:
+        return None
+    return max(categories, key=lambda category: category.path_ids.count('/'))
+
+
+@register.inclusion_tag('store/partials/breadcrumbs.html')
+def category_breadcrumbs(category):
+    return {'crumbs': get_crumbs(category)}
+
+
+@register.inclusion_tag('store/partials/breadcrumbs.html')
+def product_breadcrumbs(product):
+    category = get_primary_category(product)
+    return {'crumbs': get_crumbs(category) if category is not None else []}
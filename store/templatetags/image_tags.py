@@ -0,0 +1,45 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from store.images import FORMATS
+
+register = template.Library()
+
+
+def get_srcset(variants):
+    return ', '.join(
+        f'{default_storage.url(path)} {width}w'
+        for width, path in sorted(variants.items(), key=lambda item: int(item[0]))
+    )
+
+
+@register.simple_tag
+def cover_image(product, sizes='100vw', css_class='', style=''):
+    """
+    <picture> with AVIF/WebP/JPEG srcsets of a product cover,
+    or a plain <img> until its derivatives are ready
+    """
+    if not product.cover:
+        return ''
+    formats = product.cover_variants.get('formats')
+    if not formats:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">',
+            product.cover.url, product.name, css_class, style,
+        )
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((FORMATS[extension]['mime'], get_srcset(formats[extension]), sizes)
+         for extension in FORMATS if extension != 'jpeg' and extension in formats),
+    )
+    fallback = formats['jpeg']
+    largest = max(fallback, key=int)
+    # placeholder تار تا وقتی عکس اصلی لود بشه پس‌زمینه‌ست
+    placeholder = f'background: center / cover no-repeat url({product.cover_placeholder});' if product.cover_placeholder else ''
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" style="{}{}" loading="lazy" decoding="async"></picture>',
+        sources, default_storage.url(fallback[largest]), get_srcset(fallback), sizes,
+        product.cover_width, product.cover_height, product.name, css_class, placeholder, style,
+    )
@@ -0,0 +1,43 @@
+from django import template
+from django.template.base import NodeList
+from django.templatetags.cache import CacheNode
+
+from core.routers import replica_reads
+
+register = template.Library()
+
+
+class PrimaryNodeList(NodeList):
+    def render(self, context):
+        # فقط وقتی قطعه در کش نیست رندر میشه
+        with replica_reads(False):
+            return super().render(context)
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    `{% cache %}` for fragments keyed by `page_cache_version`. A missing
+    fragment is rendered from the primary database, so a lagging replica
+    cannot get old data stored under a new version; the rest of the page
+    and cached fragments still read from the replica.
+
+        {% fragment_cache 300 product_categories product.pk page_cache_version %}
+            ...
+        {% endfragment_cache %}
+    """
+    nodelist = PrimaryNodeList(parser.parse(('endfragment_cache',)))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(f'{tokens[0]!r} tag requires at least 2 arguments.')
+    cache_name = None
+    if len(tokens) > 3 and tokens[-1].startswith('using='):
+        cache_name = parser.compile_filter(tokens.pop().removeprefix('using='))
+    return CacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(t) for t in tokens[3:]],
+        cache_name,
+    )
@@ -1,9 +1,45 @@
 from django import template
 
+from store import formatting
+
 register = template.Library()
 
 @register.filter
 def translate_number(value):
-    value = str(value)
-    english_to_persian_table = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
-    return value.translate(english_to_persian_table)
+    # جدول ترجمه یک بار ساخته میشه، نه برای هر عدد
+    return formatting.to_persian_digits(value)
+
+
+@register.filter
+def english_number(value):
+    return formatting.to_english_digits(value)
+
+
+@register.filter
+def localize_number(value):
+    # ارقام فارسی یا انگلیسی، بسته به زبان فعال
+    return formatting.localize_digits(value)
+
+
+@register.filter
+def persian_text(value):
+    return formatting.persian_text(value)
+
+
+@register.filter
+def number(value):
+    return formatting.format_number(value)
+
+
+@register.filter
+def price(value, currency=False):
+    """
+    `{{ product.effective_price|price }}` instead of
+    `|intcomma:False|translate_number`; `|price:True` adds the currency
+    """
+    return formatting.format_price(value, currency)
+
+
+@register.filter(expects_localtime=True)
+def jdate(value, format=formatting.DEFAULT_DATE_FORMAT):
+    return formatting.format_jalali(value, format)
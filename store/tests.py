@@ -1,3 +1,1026 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import FloatField, Sum
+from django.db.models.functions import Cast
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import translation
+from django.utils.connection import ConnectionDoesNotExist
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from core.routers import replica_reads
+from core.testing import QueryBudgetMixin
+
+from .api import async_views
+from .api import urls as api_urls
+from .api.renderers import encode
+from .api.serializers import CartItemSerializer, ProductSerializer
+from .api.values import CartItemValuesSerializer, ProductValuesSerializer
+from .cart import add_cart_items, get_cart
+from .checkout import OutOfStock, place_order, reserve_inventory
+from . import category_tree, facets, feeds, formatting, images, page_cache, search
+from .comments import get_comment_page, get_first_page
+from .models import Cart, CartItem, Category, Comment, Customer, Discount, Order, OrderItem, Product
+from .pricing import with_item_totals
+
+
+class AddCartItemsConcurrencyTests(TransactionTestCase):
+    threads = 8
+    adds_per_thread = 25
+
+    def setUp(self):
+        self.cart = Cart.objects.create()
+        self.products = [
+            Product.objects.create(name=f'product {i}', description='-', short_description='-', inventory=10)
+            for i in range(3)
+        ]
+
+    def hammer(self, lines, errors):
+        try:
+            for _ in range(self.adds_per_thread):
+                add_cart_items(self.cart.pk, lines)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_concurrent_adds_do_not_lose_increments(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared in-memory sqlite locks whole tables; set DJANGO_TEST_DATABASE_NAME')
+        errors = []
+        lines = [(product.pk, 1) for product in self.products]
+        workers = [threading.Thread(target=self.hammer, args=(lines, errors)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        expected = self.threads * self.adds_per_thread
+        quantities = list(CartItem.objects.filter(cart=self.cart).values_list('quantity', flat=True))
+        self.assertEqual(quantities, [expected] * len(self.products))
+
+    def test_bulk_add_merges_repeated_products(self):
+        first, second, _ = self.products
+        items = add_cart_items(self.cart.pk, [(first.pk, 2), (second.pk, 1), (first.pk, 3)])
+
+        self.assertEqual(sorted((item.product_id, item.quantity) for item in items), [(first.pk, 5), (second.pk, 1)])
+        add_cart_items(self.cart.pk, [(first.pk, 4)], replace=True)
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=first).quantity, 4)
+
+
+class SessionCartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirt = Product.objects.create(name='shirt', description='-', short_description='-', inventory=10, unit_price=1000)
+        self.hat = Product.objects.create(name='hat', description='-', short_description='-', inventory=10, unit_price=500)
+        self.session = SessionStore()
+
+    def get_cart(self):
+        # هر بار یک درخواست تازه با همون session
+        request = RequestFactory().get('/')
+        request.session = self.session
+        request._messages = FallbackStorage(request)
+        return get_cart(request)
+
+    def assertSummary(self, count, total, queries):
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.get_cart().summary, {'count': count, 'total': total})
+
+    def test_summary_is_cached_until_the_cart_changes(self):
+        self.assertSummary(0, 0, queries=0)
+
+        self.get_cart().add(self.shirt, 2)
+        self.assertSummary(2, 2000, queries=1)
+        self.assertSummary(2, 2000, queries=0)
+
+        self.get_cart().add(self.hat)
+        self.assertSummary(3, 2500, queries=1)
+
+        self.get_cart().remove(self.shirt)
+        self.assertSummary(1, 500, queries=1)
+        self.assertSummary(1, 500, queries=0)
+
+        self.get_cart().clear()
+        self.assertSummary(0, 0, queries=1)
+
+    def test_anonymous_cart_is_kept_between_requests(self):
+        self.client.post(reverse('cart_add', args=[self.shirt.pk]), {'quantity': 2})
+        self.client.post(reverse('cart_add', args=[self.shirt.pk]), {'quantity': 1})
+        self.client.post(reverse('cart_add', args=[self.hat.pk]), {'quantity': 3, 'inplace': True})
+
+        cart = self.client.get(reverse('cart_detail')).context['cart']
+        self.assertEqual([(item['product_obj'], item['quantity']) for item in cart], [(self.shirt, 3), (self.hat, 3)])
+        self.assertEqual(CartItem.objects.filter(cart_id=self.client.session['cart_id']).count(), 2)
+
+    def test_legacy_session_cart_moves_to_the_database(self):
+        session = self.client.session
+        session['cart'] = {str(self.shirt.pk): {'quantity': 4}, '0': {'quantity': 1}}
+        session.save()
+
+        cart = self.client.get(reverse('cart_detail')).context['cart']
+        self.assertEqual([(item['product_obj'], item['quantity']) for item in cart], [(self.shirt, 4)])
+        self.assertNotIn('cart', self.client.session)
+
+
+class GenerateSlugsTests(TestCase):
+    def make_product(self, name, **kwargs):
+        return Product(name=name, description='-', short_description='-', inventory=1, **kwargs)
+
+    def test_batch_gets_unique_slugs_with_one_query_per_base_slug(self):
+        Product.objects.create(name='mug', description='-', short_description='-', inventory=1)
+        products = [self.make_product('mug'), self.make_product('mug'), self.make_product('plate'),
+                    self.make_product('x', slug='mug-2')]
+
+        with self.assertNumQueries(2):
+            Product.generate_slugs(products)
+        Product.objects.bulk_create(products)
+
+        self.assertEqual([product.slug for product in products], ['mug-1', 'mug-3', 'plate', 'mug-2'])
+
+    def test_category_slugs_are_unique_per_parent(self):
+        root = Category.objects.create(title='tools')
+        Category.objects.create(title='tools', parent=root)
+        categories = Category.generate_slugs([Category(title='tools'), Category(title='tools', parent=root)])
+
+        self.assertEqual([category.slug for category in categories], ['tools-1', 'tools-1'])
+
+    def test_save_retries_when_generated_slug_is_taken(self):
+        Product.objects.create(name='mug', description='-', short_description='-', inventory=1)
+        product = self.make_product('mug')
+        generate_slugs = Product.generate_slugs
+
+        def stale_first_attempt(objs):
+            # انگار یه درخواست همزمان همین اسلاگ رو بعد از خوندن ما ثبت کرده
+            if stale_first_attempt.calls == 0:
+                objs[0].slug = 'mug'
+            else:
+                generate_slugs(objs)
+            stale_first_attempt.calls += 1
+            return objs
+        stale_first_attempt.calls = 0
+
+        with mock.patch.object(Product, 'generate_slugs', side_effect=stale_first_attempt):
+            product.save()
+
+        self.assertEqual(stale_first_attempt.calls, 2)
+        self.assertEqual(Product.objects.get(pk=product.pk).slug, 'mug-1')
+
+    def test_other_integrity_errors_are_not_retried(self):
+        product = self.make_product('mug')
+        product.description = None
+        with mock.patch.object(Product, 'generate_slugs', wraps=Product.generate_slugs) as generate_slugs:
+            with self.assertRaises(IntegrityError):
+                product.save()
+        self.assertEqual(generate_slugs.call_count, 1)
+
+    def test_names_without_slug_characters_fall_back(self):
+        products = Product.generate_slugs([self.make_product('!!!'), self.make_product('???')])
+        self.assertEqual([product.slug for product in products], ['item', 'item-1'])
+
+
+class ApprovedCommentStreamTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='mug', description='-', short_description='-', inventory=1)
+        for i in range(18):
+            status = Comment.COMMENT_STATUS_APPROVED if i % 3 else Comment.COMMENT_STATUS_WAITING
+            Comment.objects.create(product=self.product, name=f'user {i}', body='-', status=status)
+
+    def test_keyset_pages_hold_only_approved_comments(self):
+        first = get_comment_page(self.product.pk)
+        second = get_comment_page(self.product.pk, first['next_cursor'])
+
+        self.assertEqual(len(first['comments']) + len(second['comments']), 12)
+        self.assertIsNone(second['next_cursor'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.approved_comment_count, 12)
+
+    def test_admin_approval_refreshes_count_and_cached_first_page(self):
+        from django.contrib.admin.sites import site
+
+        from .admin import CommentAdmin
+
+        get_first_page(self.product.pk)
+        comment_admin = CommentAdmin(Comment, site)
+        with mock.patch.object(comment_admin, 'message_user'):
+            comment_admin.approve_comments(None, Comment.objects.filter(status=Comment.COMMENT_STATUS_WAITING))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.approved_comment_count, 18)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_first_page(self.product.pk)['comments']), 10)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='mug', description='-', short_description='-', inventory=1)
+        self.url = self.product.get_absolute_url()
+
+    def test_second_visit_is_served_from_cache_until_a_product_changes(self):
+        self.assertIsNone(self.client.get(self.url).get('X-Page-Cache'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url)['X-Page-Cache'], 'hit')
+
+        self.product.unit_price = 10
+        self.product.save()
+        self.assertIsNone(self.client.get(self.url).get('X-Page-Cache'))
+
+    def test_stale_page_is_served_while_another_worker_rebuilds_it(self):
+        self.client.get(self.url)
+        key = page_cache.get_cache_key(self.client.get(self.url).wsgi_request)
+        entry = cache.get(key)
+        cache.set(key, {**entry, 'expires': 0})
+        self.assertTrue(page_cache.acquire_lock(key))
+
+        with mock.patch('store.views.ProductDetailView.get_context_data') as get_context_data:
+            response = self.client.get(self.url)
+        get_context_data.assert_not_called()
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+
+class CoverImagePipelineTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_cover_gets_hash_named_derivatives_and_srcset(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'PNG')
+        product = Product(name='mug', description='-', short_description='-', inventory=1)
+        product.cover.save('mug.png', ContentFile(buffer.getvalue()), save=False)
+        with self.captureOnCommitCallbacks(execute=False):
+            product.save()
+
+        self.assertTrue(images.process_cover(product.pk))
+        product.refresh_from_db()
+        self.assertEqual((product.cover_width, product.cover_height), (800, 600))
+        self.assertTrue(product.cover_placeholder.startswith('data:image/jpeg;base64,'))
+        digest = product.cover_variants['digest']
+        self.assertEqual(product.cover_variants['formats']['webp']['640'], f'store/covers/derived/{digest}/640.webp')
+
+        html = Template('{% load image_tags %}{% cover_image product %}').render(Context({'product': product}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f'/media/store/covers/derived/{digest}/800.jpeg 800w', html)
+        self.assertIn('width="800" height="600"', html)
+
+
+class EffectivePriceTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'priced {i}', description='-', short_description='-', inventory=5, unit_price=price)
+            for i, price in enumerate([1000, 2000, 3000])
+        ]
+
+    def prices(self):
+        return dict(Product.objects.values_list('name', 'effective_price'))
+
+    def test_discounts_stack_and_drive_price_filters(self):
+        self.assertEqual(self.prices(), {'priced 0': 1000, 'priced 1': 2000, 'priced 2': 3000})
+
+        sale, extra = Discount.objects.create(discount=40), Discount.objects.create(discount=30)
+        sale.product_set.add(self.products[1], self.products[2])
+        self.products[2].discounts.add(extra)
+        # ۴۰٪ + ۳۰٪ = ۷۰٪
+        self.assertEqual(self.prices(), {'priced 0': 1000, 'priced 1': 1200, 'priced 2': 900})
+
+        response = self.client.get('/store/search/', {'min_price': 950, 'max_price': 1500, 'sort': 'price'})
+        self.assertEqual([product.name for product in response.context['products']], ['priced 0', 'priced 1'])
+        self.assertEqual((response.context['facets']['min_price'], response.context['facets']['max_price']), (1000, 1200))
+
+        extra.discount = 70
+        extra.save()
+        self.assertEqual(self.prices()['priced 2'], 0)
+        sale.delete()
+        self.assertEqual(self.prices(), {'priced 0': 1000, 'priced 1': 2000, 'priced 2': 900})
+
+
+class FlashSaleCheckoutTests(TransactionTestCase):
+    shoppers = 24
+    stock = 10
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'limited {i}', description='-', short_description='-', inventory=self.stock, unit_price=1000)
+            for i in range(2)
+        ]
+        user = get_user_model().objects.create_user('buyer')
+        self.customer = Customer.objects.create(user=user, phone_number='-')
+
+    def checkout(self, cart_id, outcomes):
+        try:
+            for _ in range(50):
+                try:
+                    place_order(cart_id, self.customer)
+                    outcomes.append('ordered')
+                    return
+                except OutOfStock:
+                    outcomes.append('sold out')
+                    return
+                except OperationalError:
+                    # sqlite کل دیتابیس رو قفل می‌کنه؛ postgres به این نمی‌رسه
+                    time.sleep(0.01)
+            outcomes.append('gave up')
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared in-memory sqlite locks whole tables; set DJANGO_TEST_DATABASE_NAME')
+        first, second = self.products
+        carts = []
+        for index in range(self.shoppers):
+            cart = Cart.objects.create()
+            # نصف سبدها محصول‌ها رو برعکس اضافه می‌کنن تا ترتیب قفل‌ها امتحان بشه
+            lines = [(first.pk, 1), (second.pk, 1)] if index % 2 else [(second.pk, 1), (first.pk, 1)]
+            add_cart_items(cart.pk, lines)
+            carts.append(cart.pk)
+
+        outcomes = []
+        workers = [threading.Thread(target=self.checkout, args=(cart_id, outcomes)) for cart_id in carts]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(outcomes.count('ordered'), self.stock)
+        self.assertEqual(outcomes.count('sold out'), self.shoppers - self.stock)
+        for product in self.products:
+            product.refresh_from_db()
+            self.assertEqual(product.inventory, 0)
+            self.assertEqual(OrderItem.objects.filter(product=product).aggregate(sold=Sum('quantity'))['sold'], self.stock)
+
+    def test_order_snapshots_discounted_price(self):
+        product = self.products[0]
+        product.discounts.add(Discount.objects.create(discount=25))
+        cart = Cart.objects.create()
+        add_cart_items(cart.pk, [(product.pk, 3)])
+
+        order = place_order(cart.pk, self.customer)
+
+        self.assertEqual(list(order.items.values_list('quantity', 'unit_price')), [(3, 750)])
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, self.stock - 3)
+        with self.assertRaises(OutOfStock):
+            add_cart_items(cart.pk, [(product.pk, self.stock)])
+            place_order(cart.pk, self.customer)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Page query counts must not grow with the number of rows shown
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(title='root', slug='root')
+        cls.children = [Category.objects.create(title=f'child {i}', slug=f'child-{i}', parent=cls.root) for i in range(6)]
+        discount = Discount.objects.create(discount=10)
+        cls.products = []
+        for i in range(12):
+            product = Product.objects.create(name=f'budget {i}', description='-', short_description='-', inventory=5, unit_price=1000)
+            product.categories.add(cls.children[i % 6])
+            product.discounts.add(discount)
+            cls.products.append(product)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        for i in range(6):
+            user = get_user_model().objects.create_user(f'buyer{i}')
+            order = Order.objects.create(customer=Customer.objects.create(user=user, phone_number='0912'))
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, unit_price=900) for product in cls.products[:3]
+            ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_store_pages(self):
+        product = self.products[0]
+        cart = Cart.objects.create()
+        add_cart_items(cart.pk, [(product.pk, 1) for product in self.products])
+        session = self.client.session
+        session['cart_id'] = str(cart.pk)
+        session.save()
+
+        self.assertQueryBudget('home_page')
+        self.assertQueryBudget('category_list')
+        self.assertQueryBudget('category_detail', kwargs={'pk': self.root.pk, 'slug': self.root.slug})
+        self.assertQueryBudget('product_list')
+        self.assertQueryBudget('product_detail', kwargs={'pk': product.pk, 'slug': product.slug})
+        self.assertQueryBudget('search_results', data={'q': 'budget', 'sort': 'price'})
+        self.assertQueryBudget('cart_detail')
+
+    def test_catalogue_api(self):
+        json = {'format': 'json'}
+        self.assertQueryBudget('product-list', data=json)
+        self.assertQueryBudget('product-detail', kwargs={'pk': self.products[0].pk}, data=json)
+        self.assertQueryBudget('category-list', data=json)
+        self.assertQueryBudget('category-detail', kwargs={'pk': self.root.pk}, data=json)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin)
+
+        self.assertQueryBudget('admin:store_category_changelist')
+        self.assertQueryBudget('admin:store_order_changelist')
+        self.assertQueryBudget('admin:store_orderitem_changelist')
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seeded_catalog_is_benchmarked_as_json(self):
+        call_command('seed_catalog', products=12, depth=2, breadth=2, comments=1, carts=2, cart_items=2, stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), 12)
+        self.assertEqual(Category.objects.count(), 6)
+
+        output = io.StringIO()
+        call_command('benchmark_store', repeat=2, warmup=0, modes='cold', stdout=output)
+        report = json.loads(output.getvalue())
+
+        results = {result['name']: result for result in report['results']}
+        self.assertIn('view:product_list:cold', results)
+        self.assertIn('api:cart_detail:cold', results)
+        self.assertEqual(results['menu:render:cold']['queries'], 1)
+        self.assertEqual(report['data']['products'], 12)
+
+
+class AsyncCartApiTests(TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create()
+        products = [
+            Product.objects.create(name=f'async {i}', description='-', short_description='-', inventory=5, unit_price=1000 * (i + 1))
+            for i in range(3)
+        ]
+        add_cart_items(self.cart.pk, [(product.pk, 2) for product in products])
+        self.item = CartItem.objects.filter(cart=self.cart).first()
+
+    async def test_async_reads_match_drf(self):
+        factory = AsyncRequestFactory()
+        views = {
+            reverse('cart-detail', kwargs={'pk': self.cart.pk}): (async_views.cart_detail, {'pk': str(self.cart.pk)}),
+            reverse('cart-item-list', kwargs={'cart_pk': self.cart.pk}): (async_views.cart_item_list, {'cart_pk': str(self.cart.pk)}),
+            reverse('cart-item-detail', kwargs={'cart_pk': self.cart.pk, 'pk': self.item.pk}): (
+                async_views.cart_item_detail, {'cart_pk': str(self.cart.pk), 'pk': str(self.item.pk)},
+            ),
+        }
+        for path, (view, kwargs) in views.items():
+            expected = await self.async_client.get(path, headers={'accept': 'application/json'})
+            response = await view(factory.get(path), **kwargs)
+            self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content), path)
+
+        missing = await async_views.cart_item_detail(factory.get('/'), cart_pk=str(self.cart.pk), pk='nope')
+        self.assertEqual(missing.status_code, 404)
+
+
+class AsyncCartApiRoutingTests(TestCase):
+    """
+    The routes as production builds them under STORE_ASYNC_API
+    """
+
+    def setUp(self):
+        self.cart = Cart.objects.create()
+        self.products = [
+            Product.objects.create(name=f'route {i}', description='-', short_description='-', inventory=5, unit_price=1000)
+            for i in range(2)
+        ]
+        add_cart_items(self.cart.pk, [(self.products[0].pk, 1)])
+        self.item = CartItem.objects.get(cart=self.cart)
+        self.paths = [
+            reverse('cart-detail', kwargs={'pk': self.cart.pk}),
+            reverse('cart-item-list', kwargs={'cart_pk': self.cart.pk}),
+            reverse('cart-item-detail', kwargs={'cart_pk': self.cart.pk, 'pk': self.item.pk}),
+        ]
+        self.expected = [self.client.get(path, headers={'accept': 'application/json'}).content for path in self.paths]
+
+        with override_settings(STORE_ASYNC_API=True):
+            async_patterns = importlib.reload(api_urls).urlpatterns
+        self.addCleanup(importlib.reload, api_urls)
+        urlconf = type('AsyncUrls', (), {'urlpatterns': [path('store/api/', include(async_patterns))]})
+        self.enterContext(override_settings(ROOT_URLCONF=urlconf))
+
+    async def test_reads_are_async_and_writes_fall_back_to_drf(self):
+        for url, expected in zip(self.paths, self.expected):
+            self.assertEqual(resolve(url).func.__name__, 'dispatch')
+            response = await self.async_client.get(url, headers={'accept': 'application/json'})
+            self.assertEqual((response.status_code, response.content), (200, expected), url)
+
+            self.assertEqual((await self.async_client.head(url)).status_code, 200)
+            # test client خودش بدنه‌ی HEAD رو حذف می‌کنه، پس view مستقیم صدا زده میشه
+            head = await resolve(url).func(AsyncRequestFactory().head(url), **resolve(url).kwargs)
+            self.assertEqual((head.status_code, head.content), (200, b''), url)
+            self.assertEqual(head['Content-Length'], str(len(expected)))
+
+        response = await self.async_client.post(
+            self.paths[1], {'product': self.products[1].pk, 'quantity': 2}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(await CartItem.objects.filter(cart=self.cart).acount(), 2)
+
+
+class CatalogueApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(title='api', slug='api')
+        self.product = Product.objects.create(name='api', description='<p>long</p>', short_description='-', inventory=5, unit_price=1000)
+        self.product.categories.add(self.category)
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers={'accept': 'application/json', **headers})
+
+    def test_sparse_fieldsets(self):
+        url = reverse('product-list')
+        [product] = self.get(url).json()['results']
+        self.assertNotIn('description', product)
+        self.assertEqual(product['categories'], [self.category.pk])
+
+        [product] = self.get(f'{url}?fields=id,description').json()['results']
+        self.assertEqual(product, {'id': self.product.pk, 'description': '<p>long</p>'})
+        self.assertEqual(self.get(f'{url}?fields=id,nope').status_code, 400)
+
+    def test_etags(self):
+        url = reverse('product-detail', kwargs={'pk': self.product.pk})
+        etag = self.get(url)['ETag']
+        not_modified = self.get(url, if_none_match=etag)
+        self.assertEqual((not_modified.status_code, not_modified['ETag']), (304, etag))
+
+        # خرید (UPDATE شرطی موجودی) و اضافه شدن تخفیف هم ETag رو عوض می‌کنن
+        reserve_inventory({self.product.pk: 1})
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 200)
+        etag = self.get(url)['ETag']
+        self.product.discounts.add(Discount.objects.create(discount=0))
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 200)
+
+        list_url = reverse('category-list')
+        etag = self.get(list_url)['ETag']
+        self.assertEqual(self.get(list_url, if_none_match=etag).status_code, 304)
+        Category.objects.create(title='new', slug='new')
+        self.assertEqual(self.get(list_url, if_none_match=etag).status_code, 200)
+        # ETag از خود داده‌هاست، حتی بدون signal
+        etag = self.get(list_url)['ETag']
+        Category.objects.filter(slug='new').update(title='renamed')
+        self.assertEqual(self.get(list_url, if_none_match=etag).status_code, 200)
+
+    def test_values_serializers_match_model_serializers(self):
+        other = Category.objects.create(title='other', slug='other')
+        self.product.categories.add(other)
+        self.product.discounts.add(Discount.objects.create(discount=10))
+        Product.objects.create(name='plain', description='-', short_description='\u2028', inventory=0, unit_price=5)
+        products = Product.objects.order_by('id')
+        serializer = ProductValuesSerializer()
+        self.assertEqual(
+            encode(serializer.serialize(serializer.values(products))),
+            JSONRenderer().render(ProductSerializer(products, many=True).data),
+        )
+
+        cart = Cart.objects.create()
+        add_cart_items(cart.pk, [(self.product.pk, 2)])
+        items = with_item_totals(CartItem.objects.filter(cart=cart))
+        serializer = CartItemValuesSerializer()
+        self.assertEqual(serializer.serialize(serializer.values(items)), CartItemSerializer(items, many=True).data)
+
+        response = self.get(reverse('product-export'))
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), json.loads(encode(ProductSerializer(products, many=True).data)))
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.enterContext(override_settings(STORE_FEED_ROOT=root))
+        self.enterContext(mock.patch.object(feeds, 'SITEMAP_SHARD_SIZE', 3))
+        Category.objects.create(title='feeds', slug='feeds')
+        self.products = [
+            Product.objects.create(name=f'کفش {i}', description='-', short_description='<b>&</b>', inventory=i, unit_price=1000)
+            for i in range(5)
+        ]
+
+    def test_incremental_build(self):
+        shards = {feeds.PRODUCT_SHARD.format(shard=product.pk // 3) for product in self.products}
+        self.assertTrue(shards <= set(feeds.build()))
+        # بدون تغییر فقط دسته‌ها و index دوباره نوشته میشن
+        self.assertFalse(shards & set(feeds.build()))
+
+        product = self.products[0]
+        product.name = 'کفش تازه'
+        product.save()
+        written = feeds.build()
+        self.assertIn(feeds.PRODUCT_SHARD.format(shard=product.pk // 3), written)
+        self.assertIn(feeds.CSV_FEED, written)
+        self.assertEqual(len(shards & set(written)), 1)
+
+        with gzip.open(feeds.get_root() / feeds.PRODUCT_SHARD.format(shard=product.pk // 3), 'rt') as shard:
+            self.assertIn(product.get_absolute_url(), shard.read())
+        response = self.client.get(reverse('sitemap'))
+        self.assertIn(feeds.get_feed_url(feeds.PRODUCT_SHARD.format(shard=product.pk // 3)), response.getvalue().decode())
+        response = self.client.get(reverse('feed_file', kwargs={'name': feeds.CSV_FEED}))
+        rows = gzip.decompress(response.getvalue()).decode().splitlines()
+        self.assertEqual(len(rows), len(self.products) + 1)
+        self.assertEqual(self.client.get(reverse('feed_file', kwargs={'name': feeds.MANIFEST})).status_code, 404)
+
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # درخت محلی worker از تست‌های قبلی
+        category_tree._local_tree.update(version=None, tree=None)
+        self.men = Category.objects.create(title='men', slug='men')
+        self.shirts = Category.objects.create(title='shirts', slug='shirts', parent=self.men)
+        self.women = Category.objects.create(title='women', slug='women')
+
+    def assertMenuRebuilt(self):
+        # یک کوئری برای ساختن دوباره‌ی درخت، بعد همه از کش
+        with self.assertNumQueries(1):
+            html = category_tree.render_menu()
+        with self.assertNumQueries(0):
+            self.assertEqual(category_tree.render_menu(), html)
+        return html
+
+    def test_menu_is_built_once_and_served_from_the_cache(self):
+        html = self.assertMenuRebuilt()
+        self.assertIn(self.shirts.get_absolute_url(), html)
+
+        with self.assertNumQueries(0):
+            nodes = category_tree.get_nodes()
+        self.assertEqual([node['pk'] for node in nodes[self.men.pk]['children']], [self.shirts.pk])
+
+        # worker دیگه درخت رو از کش مشترک می‌گیره
+        category_tree._local_tree.update(version=None, tree=None)
+        with self.assertNumQueries(0):
+            self.assertEqual(category_tree.get_tree()[0]['title'], 'men')
+
+    def test_menu_is_rebuilt_after_save_move_and_delete(self):
+        self.assertMenuRebuilt()
+
+        self.shirts.title = 'tops'
+        self.shirts.save()
+        self.assertIn('tops', self.assertMenuRebuilt())
+
+        self.shirts.move_to(self.women)
+        self.assertMenuRebuilt()
+        nodes = category_tree.get_nodes()
+        self.assertEqual([node['pk'] for node in nodes[self.women.pk]['children']], [self.shirts.pk])
+        self.assertEqual(nodes[self.men.pk]['children'], [])
+
+        self.shirts.delete()
+        self.assertNotIn('tops', self.assertMenuRebuilt())
+        self.assertNotIn(self.shirts.pk, category_tree.get_nodes())
+
+
+class CategoryPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.men = Category.objects.create(title='men', slug='men')
+        self.women = Category.objects.create(title='women', slug='women')
+        self.clothes = Category.objects.create(title='clothes', slug='clothes', parent=self.men)
+        self.shirts = Category.objects.create(title='shirts', slug='shirts', parent=self.clothes)
+
+    def test_move_rewrites_subtree_paths(self):
+        self.assertEqual(self.shirts.full_path, 'men>clothes>shirts')
+        self.assertEqual(self.shirts.ancestor_ids, [self.men.pk, self.clothes.pk])
+
+        self.clothes.parent = self.women
+        with CaptureQueriesContext(connection) as queries:
+            self.clothes.save()
+        # کل زیردرخت با یک UPDATE
+        self.assertEqual(sum('SUBSTR' in query['sql'].upper() for query in queries), 1)
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.full_path, 'women>clothes>shirts')
+        self.assertEqual(self.shirts.path_ids, f'{self.women.pk}/{self.clothes.pk}/{self.shirts.pk}')
+
+        self.women.title = 'ladies'
+        self.women.save()
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.get_full_path(), 'ladies>clothes>shirts')
+
+    def test_imported_categories_get_paths(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'feed.jsonl')
+        with open(path, 'w', encoding='utf-8') as feed:
+            feed.write(json.dumps({'name': 'jacket', 'unit_price': 1000, 'inventory': 1,
+                                   'categories': ['men > clothes > jackets', 'kids > toys > cars']}))
+        call_command('import_catalog', path, verbosity=0, stdout=io.StringIO())
+
+        jackets = Category.objects.get(title='jackets')
+        self.assertEqual(jackets.full_path, 'men>clothes>jackets')
+        self.assertEqual(jackets.ancestor_ids, [self.men.pk, self.clothes.pk])
+        cars = Category.objects.get(title='cars')
+        self.assertEqual(cars.full_path, 'kids>toys>cars')
+        self.assertEqual(len(cars.ancestor_ids), 2)
+
+    def test_product_breadcrumbs_need_no_queries(self):
+        product = Product.objects.create(name='shirt', description='-', short_description='-', inventory=1, unit_price=1000)
+        product.categories.add(self.men, self.shirts)
+        product = Product.objects.prefetch_related('categories').get(pk=product.pk)
+        template = Template('{% load category_tags %}{% product_breadcrumbs product %}')
+        template.render(Context({'product': product}))
+
+        with self.assertNumQueries(0):
+            html = template.render(Context({'product': product}))
+        self.assertEqual(html.count('<a '), 3)
+        self.assertIn(self.clothes.get_absolute_url(), html)
+
+
+class FormattingTests(TestCase):
+    def test_price_matches_filter_chain(self):
+        chain = Template('{% load i18n humanize persian_translation_tags %}{{ value|intcomma:False|translate_number }} {% trans "$" %}')
+        fast = Template('{% load persian_translation_tags %}{{ value|price:True }}')
+        for value in (0, 999, 1000, 1250000, -42000, 12.5):
+            context = Context({'value': value})
+            self.assertEqual(fast.render(context), chain.render(context))
+        self.assertEqual(formatting.format_price(None), '')
+
+        with translation.override('en'):
+            self.assertEqual(formatting.format_price(1250000), '1,250,000')
+        self.assertEqual(formatting.format_price(1250000), '۱,۲۵۰,۰۰۰')
+
+    def test_jalali_dates(self):
+        value = datetime.datetime(2026, 10, 18, 12, 0)
+        self.assertEqual(formatting.format_jalali(value), '۲۶ مهر ۱۴۰۵')
+        with translation.override('en'):
+            self.assertEqual(formatting.format_jalali(value.date(), '%Y/%m/%d'), '1405/07/26')
+
+
+@override_settings(CORE_REPLICA_DATABASE='replica')
+class ReplicaCacheFillTests(TransactionTestCase):
+    """
+    There is no 'replica' connection in tests, so any read routed to it fails
+    """
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(title='replica', slug='replica')
+        self.product = Product.objects.create(name='replica', description='-', short_description='-', inventory=1, unit_price=1000)
+        self.product.categories.add(category)
+
+    def test_cached_pages_are_built_from_the_primary(self):
+        with replica_reads():
+            with self.assertRaises(ConnectionDoesNotExist):
+                list(Category.objects.all())
+
+        for path in (self.product.get_absolute_url(), reverse('product_list'), reverse('category_list')):
+            self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_uncached_reads_use_the_replica(self):
+        self.client.force_login(get_user_model().objects.create_user('replica'))
+        for path in (reverse('product_list'), reverse('category-list')):
+            with self.assertRaises(ConnectionDoesNotExist):
+                self.client.get(path)
+
+    def test_fragments_are_filled_from_the_primary(self):
+        template = Template(
+            '{% load page_cache_tags %}{% fragment_cache 60 titles %}'
+            '{% for category in categories %}{{ category.title }}{% endfor %}{% endfragment_cache %}'
+        )
+        context = Context({'categories': Category.objects.all()})
+        with replica_reads():
+            self.assertEqual(template.render(context), 'replica')
+            # از کش، بدون کوئری
+            context = Context({'categories': Category.objects.none()})
+            self.assertEqual(template.render(context), 'replica')
+
+
+class CategoryProductCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = Category.objects.create(title='root', slug='root')
+        self.child = Category.objects.create(title='child', slug='child', parent=self.root)
+        self.products = [
+            Product.objects.create(name=f'count {i}', description='-', short_description='-', inventory=1, unit_price=1000)
+            for i in range(2)
+        ]
+        for product in self.products:
+            product.categories.add(self.child)
+
+    def test_delete_refreshes_counts_and_children_are_listed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].delete()
+        self.root.refresh_from_db()
+        self.child.refresh_from_db()
+        self.assertEqual((self.root.product_count, self.child.product_count), (1, 1))
+
+        response = self.client.get(self.root.get_absolute_url())
+        self.assertContains(response, f'<a href="{self.child.get_absolute_url()}">child</a>')
+        self.assertContains(response, '(۱)')
+        self.assertContains(response, self.products[1].name)
+
+    def test_counts_change_only_with_is_active(self):
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.unit_price = 2000
+        product.inventory = 0
+        with CaptureQueriesContext(connection) as queries:
+            product.save()
+        self.assertFalse([query for query in queries if 'UPDATE "store_category"' in query['sql']])
+
+        product.is_active = False
+        product.save()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.product_count, 1)
+
+        product.is_active = True
+        product.save(update_fields=['is_active'])
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.product_count, 2)
+
+
+class SearchPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(name='tie shirt', description='-', short_description='-', inventory=1, unit_price=1000)
+            for _ in range(7)
+        ]
+
+    def test_pages_across_equal_ranks(self):
+        seen = []
+        data = {'q': 'tie'}
+        while True:
+            response = self.client.get(reverse('search_results'), data)
+            seen += [product.pk for product in response.context['products']]
+            page = response.context['page_obj']
+            if not page.has_next():
+                break
+            data['cursor'] = page.next_cursor
+        self.assertEqual(seen, sorted((product.pk for product in self.products), reverse=True))
+
+    def test_in_memory_hits_are_capped(self):
+        best = Product.objects.create(name='tie tie', description='-', short_description='tie', inventory=1, unit_price=1000)
+        with mock.patch.object(search.InMemorySearchBackend, 'max_results', 3):
+            results = list(search.InMemorySearchBackend().search(Product.objects.all(), 'tie'))
+        self.assertEqual([product.pk for product in results], [best.pk, self.products[-1].pk, self.products[-2].pk])
+
+    def test_search_without_hits_has_no_results(self):
+        response = self.client.get(reverse('search_results'), {'q': 'nothing-matches-this'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['no_results'])
+        self.assertEqual(response.context['facets']['total'], 0)
+
+    def test_no_results_follows_the_rendered_page(self):
+        # facet های کش‌شده قبل از اضافه شدن محصولات
+        with mock.patch.object(facets, 'compute_facets', return_value=facets.empty_facets()):
+            response = self.client.get(reverse('search_results'), {'q': 'tie'})
+        self.assertEqual(response.context['facets']['total'], 0)
+        self.assertFalse(response.context['no_results'])
+
+    def test_postgres_rank_is_double_precision(self):
+        queryset = search.PostgresSearchBackend().search(Product.objects.all(), 'tie')
+        rank = queryset.query.annotations['search_rank']
+        self.assertIsInstance(rank, Cast)
+        self.assertIsInstance(rank.output_field, FloatField)
+
+
+class InMemorySearchIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.backend = search.InMemorySearchBackend()
+        # روی postgres هم signal ها همین backend رو ببینن
+        self.enterContext(mock.patch.object(search, 'get_backend', return_value=self.backend))
+        self.shirt = Product.objects.create(name='red shirt', description='-', short_description='-', inventory=1, unit_price=1000)
+        self.other = Product.objects.create(name='blue shirt', description='-', short_description='-', inventory=1, unit_price=1000)
+
+    def find(self, query):
+        return sorted(product.name for product in self.backend.search(Product.objects.all(), query))
+
+    def test_saves_and_deletes_update_only_those_products(self):
+        self.assertEqual(self.find('shirt'), ['blue shirt', 'red shirt'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirt.name = 'green hat'
+            self.shirt.save()
+        with mock.patch.object(self.backend, 'build_index', wraps=self.backend.build_index) as build_index:
+            self.assertEqual(self.find('hat'), ['green hat'])
+            self.assertEqual(self.find('red'), [])
+            self.assertEqual(self.find('shirt'), ['blue shirt'])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.other.delete()
+            self.assertEqual(self.find('shirt'), [])
+            self.assertEqual(self.find('gre'), ['green hat'])
+        build_index.assert_not_called()
+
+    def test_missing_changes_rebuild_the_index(self):
+        self.find('shirt')
+        # تغییری که در لاگ ثبت نشده (مثلاً update() یا لاگ منقضی‌شده)
+        Product.objects.filter(pk=self.shirt.pk).update(name='green hat')
+        self.backend.rebuild()
+        with mock.patch.object(self.backend, 'build_index', wraps=self.backend.build_index) as build_index:
+            self.assertEqual(self.find('hat'), ['green hat'])
+        build_index.assert_called_once()
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def write_feed(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as feed:
+            feed.write('\n'.join(lines) + '\n')
+        return path
+
+    def import_feed(self, path, **options):
+        output = io.StringIO()
+        call_command('import_catalog', path, verbosity=0, stdout=output, **options)
+        return json.loads(output.getvalue().splitlines()[0])
+
+    def product_line(self, name, **fields):
+        return json.dumps({'name': name, 'description': '-', 'short_description': '-', 'unit_price': 1000, 'inventory': 1, **fields})
+
+    def test_jsonl_in_batches(self):
+        path = self.write_feed('feed.jsonl', [
+            json.dumps({'type': 'category', 'path': 'men > shirts', 'description': 'shirts'}),
+            *(self.product_line(f'shirt {i}', categories=['men > shirts']) for i in range(5)),
+        ])
+        stats = self.import_feed(path, batch_size=2)
+
+        self.assertEqual((stats['records'], stats['products'], stats['categories']), (6, 5, 2))
+        shirts = Category.objects.get(title='shirts')
+        self.assertEqual(shirts.description, 'shirts')
+        # closure و تعداد محصولات هر دسته بدون rebuild کامل
+        self.assertEqual(Category.objects.get(title='men').product_count, 5)
+        self.assertEqual(Product.objects.filter(category_closure__category=shirts).count(), 5)
+        with open(f'{path}.checkpoint') as checkpoint:
+            self.assertEqual(json.load(checkpoint)['position'], 6)
+
+    def test_csv(self):
+        path = os.path.join(self.directory, 'feed.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as feed:
+            writer = csv.writer(feed)
+            writer.writerow(['name', 'slug', 'description', 'short_description', 'unit_price', 'inventory', 'is_active', 'categories'])
+            writer.writerow(['boots', 'boots', '-', '-', '2500', '3', 'yes', 'men > shoes|sale'])
+            writer.writerow(['scarf', '', '-', '-', '900', '0', 'no', ''])
+        stats = self.import_feed(path)
+
+        self.assertEqual(stats['products'], 2)
+        boots = Product.objects.get(slug='boots')
+        self.assertEqual((boots.unit_price, boots.effective_price, boots.is_active), (2500, 2500, True))
+        self.assertEqual(sorted(boots.categories.values_list('title', flat=True)), ['sale', 'shoes'])
+        scarf = Product.objects.get(name='scarf')
+        self.assertFalse(scarf.is_active)
+        self.assertEqual(scarf.slug, 'scarf')
+
+    def test_invalid_records_are_counted(self):
+        path = self.write_feed('feed.jsonl', [
+            self.product_line('good'),
+            '{"name": "broken",',
+            '[1, 2]',
+            self.product_line('bad price', unit_price='cheap'),
+            self.product_line('also good'),
+        ])
+        stats = self.import_feed(path)
+
+        self.assertEqual((stats['records'], stats['products'], stats['invalid']), (5, 2, 3))
+        self.assertEqual(sorted(Product.objects.values_list('name', flat=True)), ['also good', 'good'])
+
+    def test_duplicate_slugs_are_skipped(self):
+        Product.objects.create(name='existing', slug='taken', description='-', short_description='-', inventory=1, unit_price=1000)
+        path = self.write_feed('feed.jsonl', [
+            self.product_line('again', slug='taken'),
+            self.product_line('first', slug='twice'),
+            self.product_line('second', slug='twice'),
+        ])
+        stats = self.import_feed(path)
+
+        self.assertEqual((stats['products'], stats['skipped']), (1, 2))
+        self.assertEqual(Product.objects.get(slug='taken').name, 'existing')
+        self.assertEqual(Product.objects.get(slug='twice').name, 'first')
+
+    def test_resume_from_checkpoint(self):
+        path = self.write_feed('feed.jsonl', [
+            self.product_line('one'),
+            'not json',
+            self.product_line('three'),
+            self.product_line('four'),
+        ])
+        checkpoint = os.path.join(self.directory, 'progress.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'path': path, 'position': 2}, file)
+
+        stats = self.import_feed(path, checkpoint=checkpoint, resume=True)
+
+        self.assertEqual((stats['records'], stats['products'], stats['invalid']), (2, 2, 0))
+        self.assertEqual(sorted(Product.objects.values_list('name', flat=True)), ['four', 'three'])
+        with open(checkpoint) as file:
+            self.assertEqual(json.load(file)['position'], 4)
@@ -11,6 +11,8 @@ urlpatterns = [
     path('categories/', views.CategoryListView.as_view(), name='category_list'),
     path('categories/<int:pk>/<uslug:slug>/', views.CategoryDetailView.as_view(), name='category_detail'),
     path('products/', views.ProductListView.as_view(), name='product_list'),
+    # باید قبل از product_detail بیاد، وگرنه comments به عنوان slug گرفته میشه
+    path('products/<int:product_id>/comments/', views.product_comments_view, name='product_comments'),
     path('products/<int:pk>/<uslug:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('search/', views.ProductSearchView.as_view(), name='search_results'),
     path('comment/<int:product_id>/', views.CommentCreateView.as_view(), name='comment_create'),
@@ -1,22 +1,40 @@
+import mimetypes
+import re
+
+from django.conf import settings
 from django.views import generic
 from django.urls import reverse_lazy
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from django.utils.translation import gettext_lazy as _
-from django.views.decorators.http import require_POST
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET, require_POST
+from django.views.static import was_modified_since
 from django.db.models import Prefetch
-from django.db.models import Q
 
-from .cart import Cart
-from .forms import ProductForm, CommentForm, AddToCartProductForm
-from .models import Category, Customer, Order, Product, Comment
+from . import feeds
+from .cart import get_cart
+from .checkout import EmptyCart, OutOfStock, place_order
+from .comments import get_comment_page, get_first_page
+from .facets import get_facets
+from .forms import ProductForm, CommentForm, AddToCartProductForm, CheckoutForm
+from .models import Address, Category, Customer, Order, Product, Comment
+from .page_cache import CachedPageMixin, rows_key
+from .pagination import CursorPaginationMixin, InvalidCursor
+from .search import search_products
+
 
+# فقط اسم فایل، بدون مسیر یا فایل‌های موقت
+FEED_FILE_RE = re.compile(r'[\w-]+(\.[\w-]+)+')
 
-class HomeView(generic.TemplateView):
+
+class HomeView(CachedPageMixin, generic.TemplateView):
     template_name = 'store/home_page.html'
 
 
-class CategoryListView(generic.ListView):
+class CategoryListView(CachedPageMixin, generic.ListView):
     model = Category
     template_name = 'store/category_list.html'
     context_object_name = 'categories'
@@ -25,37 +43,52 @@ class CategoryListView(generic.ListView):
         return Category.objects.root_nodes().prefetch_related('children') # type: ignore
 
 
-class CategoryDetailView(generic.DetailView):
+class CategoryDetailView(CachedPageMixin, CursorPaginationMixin, generic.DetailView):
     model = Category
     template_name = 'store/category_detail.html'
     context_object_name = 'category'
     slug_field = 'slug'
     source_url_kwarg = 'slug'
-
-    def get_queryset(self):
-        return super().get_queryset().prefetch_related('products', 'children')
+    paginate_by = 12
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        categories = self.object.get_descendants(include_self=True) # type: ignore
-        products = Product.objects.filter(categories__in=categories).prefetch_related('categories')
-        context['products'] = products.distinct()
-        context["descendants"] = self.object.get_descendants(include_self=False).prefetch_related("parent")  # type: ignore
+        # محصولات کل زیردرخت با یک join روی جدول closure، بدون distinct
+        products = Product.objects.filter(
+            is_active=True, category_closure__category=self.object,
+        ).prefetch_related('categories')
+        paginator, page, object_list, is_paginated = self.paginate_queryset(products, self.paginate_by)
+        context.update({
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'products': object_list,
+            'product_count': self.object.product_count,
+            # product_count هر فرزند از قبل حساب شده
+            'children': self.object.get_children(),
+        })
         return context
 
 
-class ProductListView(generic.ListView):
+class ProductListView(CachedPageMixin, CursorPaginationMixin, generic.ListView):
     model = Product
     template_name = 'store/product_list.html'
     context_object_name = 'products'
     paginate_by = 4
+    exact_count = False
     
     def get_queryset(self):
         return Product.objects.filter(is_active=True).prefetch_related('categories')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # ردیف‌ها شاید از replica اومده باشن؛ قطعه‌ی grid با خود همین ردیف‌ها کلید می‌خوره
+        context['grid_key'] = rows_key(context['products'], 'pk', 'datetime_modified')
+        return context
     
 
 
-class ProductDetailView(generic.DetailView):
+class ProductDetailView(CachedPageMixin, generic.DetailView):
     model = Product
     template_name = 'store/product_detail.html'
     slug_field = 'slug'
@@ -65,18 +98,27 @@ class ProductDetailView(generic.DetailView):
     
     
     def get_queryset(self):
-        return Product.objects.prefetch_related('categories').prefetch_related(
-            Prefetch(
-                'comments',
-                queryset=Comment.objects.select_related('user').order_by('-datetime_created')
-            )
-        )
+        return Product.objects.prefetch_related('categories')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['comment_form'] = CommentForm()
+        context['categories_key'] = rows_key(self.object.categories.all(), 'pk', 'path_ids')
+        # فقط صفحه‌ی اول نظرهای تأییدشده، از کش؛ بقیه با «نظرات بیشتر»
+        context['comment_page'] = get_first_page(self.object.pk)
         return context
     
+
+def product_comments_view(request, product_id):
+    """
+    Next page of approved comments for the "load more" button
+    """
+    try:
+        comment_page = get_comment_page(product_id, request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404(_('Invalid cursor'))
+    return render(request, 'store/partials/comment_list.html', {'comment_page': comment_page, 'product_id': product_id})
+    
 class CommentCreateView(generic.CreateView):
     model = Comment
     form_class = CommentForm
@@ -95,26 +137,25 @@ class CommentCreateView(generic.CreateView):
     
     
     
-class ProductSearchView(generic.ListView):
+class ProductSearchView(CursorPaginationMixin, generic.ListView):
     model = Product
     template_name = "store/search_results.html"
     context_object_name = 'products'
     paginate_by = 3
+    # تعداد کل از facets میاد، پس COUNT جداگانه لازم نیست
+    exact_count = False
+    
+    def get_cursor_ordering(self):
+        if self.request.GET.get("q", "").strip() and not self.request.GET.get('sort'):
+            return ('-search_rank', '-id')
+        return super().get_cursor_ordering()
 
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True).prefetch_related(
-            Prefetch(
-            'categories', 
-            queryset=Category.objects.all().prefetch_related('parent')
-            )
+            # مسیرها روی خود دسته ذخیره شدن؛ دیگه parent لازم نیست
+            Prefetch('categories', queryset=Category.objects.only('id', 'title', 'slug', 'full_path', 'path_ids'))
         ) 
         
-        search_query = self.request.GET.get("q", "").strip()
-        if search_query:
-            queryset =  queryset.filter(
-                Q(name__icontains=search_query) | Q(description__icontains=search_query) | Q(short_description__icontains=search_query)
-            )
-        
         category_id = self.request.GET.get('category')
         if category_id:
             queryset = queryset.filter(categories__id=category_id)
@@ -123,36 +164,37 @@ class ProductSearchView(generic.ListView):
         max_price = self.request.GET.get('max_price')
         
         if min_price:
-            queryset = queryset.filter(unit_price__gte=min_price)
+            queryset = queryset.filter(effective_price__gte=min_price)
         if max_price:
-            queryset = queryset.filter(unit_price__lte=max_price)
+            queryset = queryset.filter(effective_price__lte=max_price)
             
-        return queryset.distinct()
+        queryset = queryset.distinct()
+        
+        search_query = self.request.GET.get("q", "").strip()
+        if search_query:
+            queryset = search_products(queryset, search_query)
+            
+        return queryset
         
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        products = context['products']
-        
-        product_ids = [product.id for product in products]
-        product_ids = [p.id for p in products]
-        category_ids = (Category.objects.filter(products__id__in=product_ids).values_list("id", flat=True).distinct())
-        categories = Category.objects.filter(id__in=list(category_ids))
-        # categories = Category.objects.filter(products__in=products).distinct()
-        # if not hasattr(self, '_all_categories'):
-        #     self._all_categories = Category.objects.all()
-        context['categories'] = categories
+        # facet ها روی کل نتیجه‌ی فیلتر حساب میشن، نه فقط صفحه‌ی فعلی
+        facets = get_facets(self.object_list, self.request.GET, scope='search')
+        context['facets'] = facets
+        context['categories'] = facets['categories']
         context['search_query'] = self.request.GET.get("q", "").strip()
         context['current_category'] = self.request.GET.get('category', '')
         context['min_price'] = self.request.GET.get('min_price', '')
         context['max_price'] = self.request.GET.get('max_price', '')
-        context['no_results'] = not context['products'].exists()
+        # facet ها تا یک دقیقه کش میشن؛ «نتیجه‌ای نیست» باید از همین صفحه‌ی رندرشده بیاد
+        context['no_results'] = not context['page_obj'].object_list
         return context
 
 
 def cart_detail_view(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     for item in cart:
         item['product_update_quantity_form'] = AddToCartProductForm(initial={
             'quantity': item['quantity'],
@@ -164,7 +206,7 @@ def cart_detail_view(request):
  
 @require_POST    
 def add_to_cart_view(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     form = AddToCartProductForm(request.POST)
     
@@ -176,7 +218,7 @@ def add_to_cart_view(request, product_id):
     return redirect('cart_detail')
 
 def remove_from_cart(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     
     cart.remove(product)
@@ -189,5 +231,63 @@ def remove_from_cart(request, product_id):
 #     model = Order
 #     template_name = 'store/order_create.html'
     
+@login_required
 def order_create_view(request):
-    return render(request, 'store/order_create.html')
+    cart = get_cart(request)
+    customer = Customer.objects.filter(user=request.user).select_related('address').first()
+    initial = {'first_name': request.user.first_name, 'last_name': request.user.last_name}
+    if customer:
+        initial['phone_number'] = customer.phone_number
+        if hasattr(customer, 'address'):
+            initial['full_address'] = customer.address.full_address
+    form = CheckoutForm(request.POST or None, initial=initial)
+
+    if request.method == 'POST' and form.is_valid():
+        data = form.cleaned_data
+        request.user.first_name, request.user.last_name = data['first_name'], data['last_name']
+        request.user.save(update_fields=['first_name', 'last_name'])
+        customer, _created = Customer.objects.update_or_create(
+            user=request.user, defaults={'phone_number': data['phone_number']},
+        )
+        Address.objects.update_or_create(customer=customer, defaults={'full_address': data['full_address']})
+        try:
+            order = place_order(cart.cart_id, customer, data['order_notes'])
+        except EmptyCart:
+            messages.error(request, _('Your cart is empty'))
+            return redirect('cart_detail')
+        except OutOfStock:
+            messages.error(request, _('Some products in your cart are out of stock'))
+            return redirect('cart_detail')
+        cart.save()
+        messages.success(request, _('Order #%(id)s successfully placed') % {'id': order.pk})
+        return redirect('product_list')
+
+    return render(request, 'store/order_create.html', {'form': form})
+
+
+@require_GET
+def feed_file_view(request, name):
+    """
+    sitemap.xml, its shards and the product feeds, as built by `manage.py build_feeds`
+    """
+    if not FEED_FILE_RE.fullmatch(name) or name == feeds.MANIFEST:
+        raise Http404
+    path = feeds.get_root() / name
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise Http404
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), int(stat.st_mtime)):
+        return HttpResponseNotModified()
+
+    header = settings.STORE_FEED_SENDFILE_HEADER
+    if header:
+        # فایل رو خود nginx/apache می‌فرسته و worker آزاد میشه
+        content_type, encoding = mimetypes.guess_type(name)
+        response = HttpResponse(content_type='application/gzip' if encoding == 'gzip' else content_type)
+        response[header] = str(path) if header == 'X-Sendfile' else settings.STORE_FEED_SENDFILE_PREFIX + name
+    else:
+        # زیر gunicorn با sendfile فرستاده میشه
+        response = FileResponse(open(path, 'rb'))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response